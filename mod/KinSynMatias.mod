@@ -0,0 +1,69 @@
+COMMENT
+
+Kinetic synapse with graded transmitter release, as in the motifs of Matias et al. (2011) and
+ASDS_matias2011/ (see src/dmsi.py):
+
+  r' = alpha*T*(1 - r) - beta*r,   T = Tmax/(1 + exp(-(vpre - Vp)/Kp))
+  i = weight*r*B(v)*(v - e),        B(v) = 1/(1 + exp(-0.062*v)*mg/3.57)
+
+vpre is the presynaptic membrane potential, set every time step through ParallelContext
+source_var/target_var (in NetPyNE: synMechParams 'pointerParams': {'target_var': 'vpre'}).
+mg = 0 gives AMPA and GABA_A synapses, mg = 1 (mM) the Mg2+ block of NMDA.
+
+Example usage (in Python):
+  syn = h.KinSynMatias(post(0.5))
+  syn.alpha, syn.beta, syn.e, syn.weight = 1.1, 0.19, 60, 0.01  # AMPA, 10 nS
+  h.setpointer(pre(0.5)._ref_v, 'vpre', syn)  # single process alternative to target_var
+
+ENDCOMMENT
+
+NEURON {
+  POINT_PROCESS KinSynMatias
+  RANGE alpha, beta, e, weight, Tmax, Vp, Kp, mg, vpre, g, i
+  NONSPECIFIC_CURRENT i
+}
+
+UNITS {
+  (nA) = (nanoamp)
+  (mV) = (millivolt)
+  (uS) = (microsiemens)
+  (mM) = (milli/liter)
+}
+
+PARAMETER {
+  alpha = 1.1 (/ms)   : binding rate (AMPA)
+  beta = 0.19 (/ms)   : unbinding rate (AMPA)
+  e = 60 (mV)         : reversal potential, shifted convention (rest near 0 mV)
+  weight = 0 (uS)     : maximal conductance
+  Tmax = 1            : maximal transmitter concentration
+  Vp = 62 (mV)        : half-activation of release
+  Kp = 5 (mV)         : slope of release
+  mg = 0 (mM)         : extracellular Mg2+ (NMDA block)
+}
+
+ASSIGNED {
+  v (mV)
+  vpre (mV)
+  g (uS)
+  i (nA)
+}
+
+STATE {
+  r
+}
+
+INITIAL {
+  r = 0
+}
+
+BREAKPOINT {
+  SOLVE kinetics METHOD cnexp
+  g = weight*r/(1 + exp(-0.062*v)*mg/3.57)
+  i = g*(v - e)
+}
+
+DERIVATIVE kinetics {
+  LOCAL T
+  T = Tmax/(1 + exp(-(vpre - Vp)/Kp))
+  r' = alpha*T*(1 - r) - beta*r
+}
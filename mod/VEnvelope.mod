@@ -0,0 +1,59 @@
+COMMENT
+
+Min/max envelope of the membrane potential over consecutive windows of length window.
+
+The running minimum and maximum of v are updated every time step; every window ms they are latched
+into lo and hi and reset, so recording lo and hi with a Vector at the same step keeps spikes and
+troughs that plain decimation of v would miss, at a fraction of the memory of recording v at dt.
+
+Example usage (in Python):
+  env = h.VEnvelope(sec(0.5))
+  env.window = 1
+  vlo = h.Vector().record(env._ref_lo, env.window)
+  vhi = h.Vector().record(env._ref_hi, env.window)
+
+ENDCOMMENT
+
+NEURON {
+  POINT_PROCESS VEnvelope
+  RANGE window, vmin, vmax, lo, hi
+}
+
+UNITS {
+  (mV) = (millivolt)
+}
+
+PARAMETER {
+  window = 1 (ms) : Length of each envelope window ('step' is reserved in NMODL)
+}
+
+ASSIGNED {
+  v (mV)
+  vmin (mV) : Running minimum in the current window
+  vmax (mV) : Running maximum in the current window
+  lo (mV) : Minimum of the last completed window
+  hi (mV) : Maximum of the last completed window
+}
+
+INITIAL {
+  vmin = v
+  vmax = v
+  lo = v
+  hi = v
+  net_send(window, 1)
+}
+
+BREAKPOINT {
+  if (v < vmin) { vmin = v }
+  if (v > vmax) { vmax = v }
+}
+
+NET_RECEIVE (w) {
+  if (flag == 1) { : End of a window
+    lo = vmin
+    hi = vmax
+    vmin = v
+    vmax = v
+    net_send(window, 1)
+  }
+}
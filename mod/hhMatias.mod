@@ -0,0 +1,104 @@
+COMMENT
+
+Hodgkin-Huxley sodium, potassium and leak channels of the neuron model of
+  Matias FS, Carelli PV, Mirasso CR, Copelli M (2011).
+  "Anticipated synchronization in a biologically plausible model of neuronal motifs."
+  Phys Rev E 84, 021922.
+
+Voltages are in the shifted convention of the original HH equations (rest near 0 mV), as in
+ASDS_matias2011/ and src/dmsi.py, so sections using this mechanism are initialized with v_init = 0.
+Densities are the paper's conductances divided by C = 9*pi pF (cm = 1 uF/cm2).
+
+Example usage (in Python):
+  soma = h.Section(name='soma')
+  soma.L = soma.diam = 30  # area 900*pi um2, C = 9*pi pF
+  soma.insert('hhMatias')
+  h.finitialize(0)
+
+ENDCOMMENT
+
+NEURON {
+  SUFFIX hhMatias
+  NONSPECIFIC_CURRENT i
+  RANGE gNa, gK, gL, eNa, eK, eL
+}
+
+UNITS {
+  (mA) = (milliamp)
+  (mV) = (millivolt)
+  (S) = (siemens)
+}
+
+PARAMETER {
+  gNa = 0.12 (S/cm2)   : 1080*pi nS / 9*pi pF
+  gK = 0.036 (S/cm2)   : 324*pi nS / 9*pi pF
+  gL = 0.0003 (S/cm2)  : 2.7*pi nS / 9*pi pF
+  eNa = 115 (mV)
+  eK = -12 (mV)
+  eL = 10.6 (mV)
+}
+
+ASSIGNED {
+  v (mV)
+  i (mA/cm2)
+  minf
+  hinf
+  ninf
+  mtau (ms)
+  htau (ms)
+  ntau (ms)
+}
+
+STATE {
+  m
+  h
+  n
+}
+
+BREAKPOINT {
+  SOLVE states METHOD cnexp
+  i = gNa*m*m*m*h*(v - eNa) + gK*n*n*n*n*(v - eK) + gL*(v - eL)
+}
+
+INITIAL {
+  rates(v)
+  m = minf
+  h = hinf
+  n = ninf
+}
+
+DERIVATIVE states {
+  rates(v)
+  m' = (minf - m)/mtau
+  h' = (hinf - h)/htau
+  n' = (ninf - n)/ntau
+}
+
+PROCEDURE rates(v (mV)) {
+  LOCAL alpha, beta
+  UNITSOFF
+  alpha = 0.1*vtrap(25 - v, 10)
+  beta = 4*exp(-v/18)
+  mtau = 1/(alpha + beta)
+  minf = alpha*mtau
+
+  alpha = 0.07*exp(-v/20)
+  beta = 1/(exp((30 - v)/10) + 1)
+  htau = 1/(alpha + beta)
+  hinf = alpha*htau
+
+  alpha = 0.01*vtrap(10 - v, 10)
+  beta = 0.125*exp(-v/80)
+  ntau = 1/(alpha + beta)
+  ninf = alpha*ntau
+  UNITSON
+}
+
+: x/(exp(x/y) - 1), with its limit y at x = 0
+FUNCTION vtrap(x, y) {
+  if (fabs(x/y) < 1e-6) {
+    vtrap = y*(1 - x/y/2)
+  } else {
+    vtrap = x/(exp(x/y) - 1)
+  }
+}
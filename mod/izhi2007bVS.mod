@@ -0,0 +1,149 @@
+COMMENT
+
+Izhi2007b (izhi2007b.mod) for variable time step integration: the recovery variable u is a STATE
+integrated in a DERIVATIVE block instead of by explicit Euler inside BREAKPOINT, so the mechanism
+works with the fixed step (cnexp, exact for u since u' is linear in u), global CVODE and local
+variable time step (cvode.use_local_dt). Spike detection and resets are the WATCH/NET_RECEIVE logic
+of Izhi2007b; every discontinuity of u' (the FS nonlinearity, the TC/RTN b switch) happens at a
+WATCH event, so the integrator sees a smooth right-hand side between events.
+
+Equations and parameter values are taken from
+  Izhikevich EM (2007).
+  "Dynamical systems in neuroscience"
+  MIT Press
+
+Example usage (in Python):
+  from neuron import h
+  sec = h.Section(name='soma')
+  izh = h.Izhi2007bVS(sec(0.5))
+  izh.Iin = 70  # current clamp
+  cvode = h.CVode()
+  cvode.active(1)
+  cvode.use_local_dt(1)  # optional
+
+Cell types (celltype) are those of Izhi2007b:
+    1. RS  2. IB  3. CH  4. LTS  5. FS  6. TC  7. RTN
+
+ENDCOMMENT
+
+: Declare name of object and variables
+NEURON {
+  POINT_PROCESS Izhi2007bVS
+  RANGE C, k, vr, vt, vpeak, u, a, b, c, d, Iin, celltype, alive, cellid, verbose, derivtype
+  NONSPECIFIC_CURRENT i
+}
+
+: Specify units that have physiological interpretations (NB: ms is already declared)
+UNITS {
+  (mV) = (millivolt)
+  (uM) = (micrometer)
+}
+
+: Parameters from Izhikevich 2007, MIT Press for regular spiking pyramidal cell
+PARAMETER {
+  C = 1 : Capacitance
+  k = 0.7
+  vr = -60 (mV) : Resting membrane potential
+  vt = -40 (mV) : Membrane threhsold
+  vpeak = 35 (mV) : Peak voltage
+  a = 0.03
+  b = -2
+  c = -50
+  d = 100
+  Iin = 0
+  celltype = 1 : A flag for indicating what kind of cell it is (see list of cell types in initial comment)
+  alive = 1 : A flag for deciding whether or not the cell is alive -- if it's dead, acts normally except it doesn't fire spikes
+  cellid = -1 : A parameter for storing the cell ID, if required (useful for diagnostic information)
+  verbose = 0
+}
+
+: Variables used for internal calculations
+ASSIGNED {
+  v (mV)
+  i (nA)
+  derivtype
+}
+
+STATE {
+  u (mV) : Slow current/recovery variable
+}
+
+: Initial conditions
+INITIAL {
+  u = 0.0
+  derivtype = 2
+  net_send(0,1) : Required for the WATCH statement to be active; v=vr initialization done there
+}
+
+: Define neuron dynamics
+BREAKPOINT {
+  SOLVE states METHOD cnexp
+  i = -(k*(v-vr)*(v-vt) - u + Iin)/C/1000
+}
+
+DERIVATIVE states {
+  if (celltype == 5 && derivtype == 1) { : For FS neurons, U(v) = 0.025(v-vb)^3 when v>=vb (d=vb=-55)
+    u' = a*((0.025*(v-d)*(v-d)*(v-d))-u)
+  } else if (celltype == 5) { : U(v) = 0 when v<vb
+    u' = a*(0-u)
+  } else { : b is switched by the WATCH events of TC and RTN neurons
+    u' = a*(b*(v-vr)-u)
+  }
+}
+
+: Input received
+NET_RECEIVE (w) {
+  : Check if spike occurred
+  if (flag == 1) { : Fake event from INITIAL block
+    if (celltype == 4) { : LTS cell
+      WATCH (v>(vpeak-0.1*u)) 2 : Check if threshold has been crossed, and if so, set flag=2
+    } else if (celltype == 6) { : TC cell
+      WATCH (v>(vpeak+0.1*u)) 2
+    } else { : default for all other types
+      WATCH (v>vpeak) 2
+    }
+    : additional WATCHfulness
+    if (celltype==6 || celltype==7) {
+      WATCH (v> -65) 3 : change b param
+      WATCH (v< -65) 4 : change b param
+    }
+    if (celltype==5) {
+      WATCH (v> d) 3  : going up
+      WATCH (v< d) 4  : coming down
+    }
+    v = vr  : initialization can be done here
+  : FLAG 2 Event created by WATCH statement -- threshold crossed for spiking
+  } else if (flag == 2) {
+    if (alive) {net_event(t)} : Send spike event if the cell is alive
+    : For LTS neurons
+    if (celltype == 4) {
+      v = c+0.04*u : Reset voltage
+      if ((u+d)<670) {u=u+d} : Reset recovery variable
+      else {u=670}
+     }
+    : For FS neurons (only update v)
+    else if (celltype == 5) {
+      v = c : Reset voltage
+     }
+    : For TC neurons (only update v)
+    else if (celltype == 6) {
+      v = c-0.1*u : Reset voltage
+      u = u+d : Reset recovery variable
+     }  else {: For RS, IB and CH neurons, and RTN
+      v = c : Reset voltage
+      u = u+d : Reset recovery variable
+     }
+  : FLAG 3 Event created by WATCH statement -- v exceeding set point for param reset
+  } else if (flag == 3) {
+    if (celltype == 5)        { derivtype = 1 : if (v>d) u'=a*((0.025*(v-d)*(v-d)*(v-d))-u)
+    } else if (celltype == 6) { b=0
+    } else if (celltype == 7) { b=2
+    }
+  : FLAG 4 Event created by WATCH statement -- v dropping below a setpoint for param reset
+  } else if (flag == 4) {
+    if (celltype == 5)        { derivtype = 2  : if (v<d) u'=a*(0-u)
+    } else if (celltype == 6) { b=15
+    } else if (celltype == 7) { b=10
+    }
+  }
+}
@@ -1,7 +1,9 @@
+import sys
+
 from netpyne import specs
 from netpyne.batch import Batch
 
-def batch():
+def batchParams():
         # Create variable of type ordered dictionary (NetPyNE's customized version)
         params = specs.ODict()
 
@@ -21,6 +23,39 @@ def batch():
         params['weightII'] = [0.01]
         params['delay'] = [1e-3]
 
+        # AS/DS is decided from the population lag computed during the run (simData['popLag']),
+        # so jobs do not record or save per-cell voltage traces
+        params['recordTraces'] = [{}]
+        params['recordProfile'] = [{'cellsPerPop': 0, 'step': 1.0, 'envelope': False, 'popMean': True}]
+        params['saveJson'] = [False]
+        params['saveBinary'] = [True]
+        params['deferPlots'] = [True]  # figures on demand: python src/deferredPlots.py ASDS_batch --jobs ...
+        params['instrumentation'] = [{'enabled': True, 'countEvents': True}]  # aggregate with src/instrumentation.py
+
+        return params
+
+def batchParamsDMSI():
+        params = specs.ODict()
+
+        # DMSI motif populations (src/cfgDMSI.py, src/netParamsDMSI.py): Master->Slave lag over the
+        # excitatory and inhibitory conductances (nS), as in the g_AMPA x g_GABA map of ASDS_matias2011
+        params['gAMPA'] = [5.0, 10.0, 20.0]
+        params['gGABA'] = [10.0, 20.0, 40.0, 60.0, 80.0]
+        params['popSize'] = [50]
+        params['convergence'] = [10]
+        params['bkgRate'] = [100]
+        params['bkgWeight'] = [0.0005]
+
+        params['recordTraces'] = [{}]
+        params['recordProfile'] = [{'cellsPerPop': 0, 'step': 1.0, 'envelope': False, 'popMean': True}]
+        params['saveJson'] = [False]
+        params['saveBinary'] = [True]
+        params['deferPlots'] = [True]
+
+        return params
+
+def batch():
+        params = batchParams()
 
         # create Batch object with parameters to modify, and specifying files to use
         b = Batch(params=params, cfgFile='src/cfg.py', netParamsFile='src/netParams.py',)
@@ -38,6 +73,60 @@ def batch():
         # Run batch simulations
         b.run()
 
+def runLocal(threads=1, prescreen=None):
+        import localBatch
+
+        # Same grid, run in a local process pool (no MPI launcher needed), longest jobs first;
+        # prescreen='skip' or 'deprioritize' acts on points the rate model predicts silent or runaway
+        localBatch.runBatch(batchParams(), cfgFile='src/cfg.py', netParamsFile='src/netParams.py',
+                            batchLabel='ASDS', saveFolder='ASDS_batch', script='src/init.py',
+                            threads=threads, retries=1, skip=True, prescreen=prescreen)
+
+def runInProcess():
+        import inprocessBatch
+
+        # Same grid, one network build per convergence value; weights, delays and bkg inputs changed in place
+        inprocessBatch.runBatch(batchParams(), cfgFile='src/cfg.py', netParamsFile='src/netParams.py',
+                                batchLabel='ASDS', saveFolder='ASDS_batch')
+
+def runWorkers(workers=None):
+        import worker
+
+        # Same grid, on a pool of persistent workers that import NEURON and execute cfg.py only once
+        worker.runBatch(batchParams(), cfgFile='src/cfg.py', netParamsFile='src/netParams.py',
+                        batchLabel='ASDS', saveFolder='ASDS_batch', workers=workers, retries=1, skip=True)
+
+def runDMSI(threads=1):
+        import localBatch
+
+        # DMSI motif grid on the same local backend (compiled HH channels and kinetic synapses from mod/)
+        localBatch.runBatch(batchParamsDMSI(), cfgFile='src/cfgDMSI.py', netParamsFile='src/netParamsDMSI.py',
+                            batchLabel='DMSI', saveFolder='DMSI_batch', script='src/init.py',
+                            threads=threads, retries=1, skip=True)
+
+def runSearch(xName, xRange, yName=None, yRange=None):
+        import transitionSearch
+
+        # Adaptive search of the AS/DS transition along xName (and yName), guided by the measured popLag;
+        # the other parameters take the first value of the grid
+        baseParams = {name: values[0] for name, values in batchParams().items() if name not in [xName, yName]}
+        transitionSearch.runSearch(baseParams, xName, xRange, yName, yRange, batchLabel='ASDS_search',
+                                   saveFolder='ASDS_search', retries=1)
+
 # Main code
 if __name__ == '__main__':
-        batch()
\ No newline at end of file
+        if len(sys.argv) > 1 and sys.argv[1] == 'local':
+                runLocal(threads=int(sys.argv[2]) if len(sys.argv) > 2 else 1,
+                         prescreen=sys.argv[3] if len(sys.argv) > 3 else None)  # local [threads] [skip|deprioritize]
+        elif len(sys.argv) > 1 and sys.argv[1] == 'inprocess':
+                runInProcess()
+        elif len(sys.argv) > 1 and sys.argv[1] == 'search':
+                args = sys.argv[2:]  # search <param> <lo> <hi> [<param> <lo> <hi>]
+                runSearch(args[0], [float(args[1]), float(args[2])],
+                          *([args[3], [float(args[4]), float(args[5])]] if len(args) > 3 else []))
+        elif len(sys.argv) > 1 and sys.argv[1] == 'dmsi':
+                runDMSI(threads=int(sys.argv[2]) if len(sys.argv) > 2 else 1)
+        elif len(sys.argv) > 1 and sys.argv[1] == 'workers':
+                runWorkers(workers=int(sys.argv[2]) if len(sys.argv) > 2 else None)
+        else:
+                batch()
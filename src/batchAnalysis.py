@@ -0,0 +1,172 @@
+"""
+batchAnalysis.py
+
+Summarize every job of a batch folder (e.g. ASDS_batch/) into one table and an AS/DS phase diagram.
+
+Jobs are found by scanning the folder for binary outputs (<label>_data/meta.json, see binaryOutput.py)
+and NetPyNE JSON outputs (<label>.json) whose label is a grid job label (<batchLabel>_<i>_<j>..., with
+an optional replica suffix _r<k>), and are analyzed in parallel worker processes. Each worker
+loads one job, computes per-population firing rates, the SenderE->ReceiverE lag and a synchrony index
+with vectorized spike binning, and returns one row; rows are appended to the CSV as they arrive, so
+memory does not grow with the number of jobs.
+
+Usage (from the repository root):
+    python src/batchAnalysis.py ASDS_batch --workers 8 --x convergence --y bkgRate
+"""
+
+import os
+import re
+import csv
+import json
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+
+import popLag
+from binaryOutput import SimOutput
+
+pops = ['SenderE', 'SenderI', 'ReceiverE', 'ReceiverI']
+paramNames = ['convergence', 'bkgRate', 'bkgNoise', 'weightEE', 'weightEI', 'weightIE', 'weightII', 'delay']
+jobLabelPattern = re.compile(r'.+_\d+(_r\d+)?$')  # <batchLabel>_<i>_<j>..., replica outputs <label>_r<k>
+
+
+def findJobs(folder):
+    """Paths of all job outputs in folder, binary outputs preferred over JSON for the same job"""
+    jobs = {}
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if name.endswith('_data') and os.path.exists(os.path.join(path, 'meta.json')):
+            label = name[:-len('_data')]
+            if jobLabelPattern.match(label):
+                jobs[label] = path
+        elif name.endswith('.json') and jobLabelPattern.match(name[:-len('.json')]):
+            jobs.setdefault(name[:-len('.json')], path)  # not <label>_cfg.json, <batchLabel>_status.json, ...
+    return jobs
+
+
+def loadJob(path):
+    """Return (cfg dict, spkt, spkid, {pop: gids}) for a binary or JSON job output"""
+    if os.path.isdir(path):
+        out = SimOutput(path)
+        spkt, spkid = out.spikes()
+        return out.meta['cfg'], spkt, spkid, out.pops
+    with open(path) as fileObj:
+        data = json.load(fileObj)
+    popGids = {label: pop['cellGids'] for label, pop in data['net']['pops'].items()}
+    return data['simConfig'], data['simData']['spkt'], data['simData']['spkid'], popGids
+
+
+def synchronyIndex(spkt, spkid, gids, timeRange, binSize):
+    """Golomb's chi: std of the population rate over the rms std of the single-cell binned trains. The variances
+    come from sums over the non-empty (cell, bin) counts, so memory grows with the spikes, not cells x bins"""
+    gids = np.sort(np.asarray(gids))
+    if len(gids) == 0:
+        return float('nan')
+    numBins = int(np.ceil((timeRange[1] - timeRange[0]) / binSize))
+    row = np.searchsorted(gids, spkid)
+    valid = (gids[np.minimum(row, len(gids) - 1)] == spkid) & (spkt >= timeRange[0]) & (spkt < timeRange[1])
+    row = row[valid].astype(np.int64)
+    col = np.minimum(((spkt[valid] - timeRange[0]) / binSize).astype(np.int64), numBins - 1)
+
+    # per cell: sum of counts and sum of squared counts over bins
+    cells, counts = np.unique(row * numBins + col, return_counts=True)
+    cellSum = np.bincount(row, minlength=len(gids)).astype(float)
+    cellSumSq = np.bincount(cells // numBins, weights=counts.astype(float) ** 2, minlength=len(gids))
+    cellVar = np.mean(cellSumSq / numBins - (cellSum / numBins) ** 2)
+    # population: mean count over cells in each bin
+    popMean = np.bincount(col, minlength=numBins) / float(len(gids))
+    popVar = popMean.var()
+    return float(np.sqrt(popVar / cellVar)) if cellVar > 0 else float('nan')
+
+
+def analyzeJob(args):
+    label, path, binSize, maxLag = args
+    try:
+        cfg, spkt, spkid, popGids = loadJob(path)
+    except (OSError, ValueError, KeyError) as e:
+        return {'label': label, 'error': str(e)}
+    spkt, spkid = np.asarray(spkt, dtype=float), np.asarray(spkid, dtype=int)
+    timeRange = [cfg.get('transient', 0), cfg['duration']]
+    window = (timeRange[1] - timeRange[0]) / 1000.0
+
+    row = {'label': label}
+    row.update({name: cfg.get(name) for name in paramNames})
+    inWindow = (spkt >= timeRange[0]) & (spkt < timeRange[1])
+    for pop in pops:
+        gids = popGids.get(pop, [])
+        numSpikes = np.count_nonzero(np.isin(spkid[inWindow], gids))
+        row['rate' + pop] = numSpikes / max(len(gids), 1) / window if window > 0 else float('nan')
+    lag = popLag.computeLag(spkt, spkid, popGids['SenderE'], popGids['ReceiverE'], timeRange, binSize, maxLag)
+    row.update({'lag': lag['lag'], 'sign': lag['sign'], 'lagPeak': lag['peak'], 'lagConfidence': lag['confidence']})
+    allGids = np.concatenate([np.asarray(popGids[pop]) for pop in pops if pop in popGids])
+    row['synchrony'] = synchronyIndex(spkt, spkid, allGids, timeRange, binSize)
+    row['error'] = ''
+    return row
+
+
+def plotPhaseDiagram(csvFile, x, y, filename):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    with open(csvFile) as fileObj:
+        rows = [row for row in csv.DictReader(fileObj) if not row['error'] and row[x] and row[y]]
+    xs = sorted(set(float(row[x]) for row in rows))
+    ys = sorted(set(float(row[y]) for row in rows))
+    lagSum, count = np.zeros((len(ys), len(xs))), np.zeros((len(ys), len(xs)))
+    for row in rows:  # jobs sharing (x, y), e.g. seeds or other grid parameters, are averaged
+        i, j = ys.index(float(row[y])), xs.index(float(row[x]))
+        lagSum[i, j] += float(row['lag'])
+        count[i, j] += 1
+    lagMap = np.where(count > 0, lagSum / np.maximum(count, 1), np.nan)
+
+    limit = np.nanmax(np.abs(lagMap)) if np.isfinite(lagMap).any() else 1.0
+    plt.figure(figsize=(8, 6))
+    plt.imshow(lagMap, aspect='auto', cmap='coolwarm', origin='lower', vmin=-limit, vmax=limit)
+    plt.colorbar(label='SenderE -> ReceiverE lag (ms)  (<0 AS, >0 DS)')
+    plt.xticks(range(len(xs)), ['%g' % v for v in xs])
+    plt.yticks(range(len(ys)), ['%g' % v for v in ys])
+    plt.xlabel(x)
+    plt.ylabel(y)
+    plt.title('AS/DS phase diagram')
+    plt.savefig(filename, dpi=150)
+    plt.close()
+
+
+def analyzeBatch(folder, workers=None, binSize=1.0, maxLag=50.0, out=None, x='convergence', y='bkgRate', parquet=False):
+    jobs = findJobs(folder)
+    out = out or os.path.join(folder, 'summary.csv')
+    fields = ['label'] + paramNames + ['rate' + pop for pop in pops] + \
+             ['lag', 'sign', 'lagPeak', 'lagConfidence', 'synchrony', 'error']
+    tasks = [(label, path, binSize, maxLag) for label, path in jobs.items()]
+
+    with open(out, 'w', newline='') as fileObj, Pool(workers) as pool:
+        writer = csv.DictWriter(fileObj, fieldnames=fields, restval='')
+        writer.writeheader()
+        for i, row in enumerate(pool.imap_unordered(analyzeJob, tasks, chunksize=4)):
+            writer.writerow(row)
+            if (i + 1) % 100 == 0:
+                print('  %d / %d jobs analyzed' % (i + 1, len(tasks)))
+    print('Summary of %d jobs saved to %s' % (len(tasks), out))
+
+    if parquet:
+        import pandas as pd
+        pd.read_csv(out).to_parquet(os.path.splitext(out)[0] + '.parquet')
+    if tasks:
+        plotPhaseDiagram(out, x, y, os.path.splitext(out)[0] + '_phase.png')
+    return out
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Summarize the jobs of a batch folder')
+    parser.add_argument('folder', nargs='?', default='ASDS_batch')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--binSize', type=float, default=1.0, help='spike bin size (ms)')
+    parser.add_argument('--maxLag', type=float, default=50.0, help='maximum lag searched (ms)')
+    parser.add_argument('--out', default=None, help='summary CSV (default: <folder>/summary.csv)')
+    parser.add_argument('--x', default='convergence', help='phase diagram x parameter')
+    parser.add_argument('--y', default='bkgRate', help='phase diagram y parameter')
+    parser.add_argument('--parquet', action='store_true', help='also write a Parquet copy (needs pandas)')
+    args = parser.parse_args()
+    analyzeBatch(args.folder, args.workers, args.binSize, args.maxLag, args.out, args.x, args.y, args.parquet)
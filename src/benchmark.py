@@ -0,0 +1,162 @@
+"""
+benchmark.py
+
+Repeatable single-process benchmark of src/cfg.py + src/netParams.py over a matrix of model knobs
+(convergence, bkgRate, cfg.scale, duration). Every point runs src/init.py headless (no plots, traces
+or saved output) with instrumentation on (see instrumentation.py), and records
+
+    buildTime       network build (initialize ... setupRecording), s
+    runTime         psolve, s
+    simMsPerSecond  simulated ms per wall-clock second of psolve
+    events          NetCon + NetStim events delivered
+    peakRSS         peak resident memory, MB
+
+Times are the minimum over --repeats runs. Results are saved as JSON and, given a baseline file, every
+metric is compared against it: slower build/run, lower throughput or more memory than the threshold
+(relative) is reported as a regression, and so is any change in the event count, which means the
+simulated network itself changed. The exit status is 1 if there are regressions.
+
+--integrators also runs every point with other integration schemes (see integrators below): the fixed step
+with the STATE-based Izhi2007bVS, global CVODE and local variable time step. With 'fixed' listed first,
+their speedup and spike count change are reported against the fixed-step run of the same point.
+
+Usage (from the repository root):
+    python src/benchmark.py --save data/benchmark/baseline.json
+    python src/benchmark.py --baseline data/benchmark/baseline.json --threshold 0.1
+    python src/benchmark.py --convergence 50 --bkgRate 2000 --scale 1 4 --duration 1000 --params '{"leanMode": true}'
+    python src/benchmark.py --convergence 20 --bkgRate 2000 --scale 1 --duration 50 --integrators fixed fixedVS cvode localdt
+"""
+
+import os
+import sys
+import json
+import itertools
+import argparse
+import subprocess
+
+from localBatch import writeJobCfg
+import instrumentation
+
+headless = {'analysis': {}, 'recordTraces': {}, 'saveJson': False, 'saveBinary': False, 'popLag': {'enabled': False},
+            'instrumentation': {'enabled': True, 'countEvents': True}}
+
+matrixDefault = {'convergence': [5, 20, 100], 'bkgRate': [20, 2000], 'scale': [1, 4], 'duration': [1000]}
+
+# integration schemes: cfg overrides; the variable step ones need the Izhikevich mechanism with u as a STATE
+integrators = {'fixed': {},
+               'fixedVS': {'izhiMod': 'Izhi2007bVS'},
+               'cvode': {'izhiMod': 'Izhi2007bVS', 'cvode_active': True},
+               'localdt': {'izhiMod': 'Izhi2007bVS', 'cvode_active': True, 'use_local_dt': True}}
+
+buildPhases = ['initialize', 'createPops', 'createCells', 'connectCells', 'addStims', 'setupRecording']
+
+# metric -> +1 if higher is better, -1 if lower is better, 0 if it must not change
+metrics = {'buildTime': -1, 'runTime': -1, 'simMsPerSecond': 1, 'peakRSS': -1, 'events': 0}
+
+
+def pointLabel(point, integrator='fixed'):
+    label = 'bench_' + '_'.join('%s%g' % (name, value) for name, value in sorted(point.items()))
+    return label if integrator == 'fixed' else label + '_' + integrator
+
+
+def matrixPoints(matrix):
+    names = list(matrix)
+    for values in itertools.product(*[matrix[name] for name in names]):
+        yield dict(zip(names, values))
+
+
+def runPoint(point, params, folder, repeats, script='src/init.py', netParamsFile='src/netParams.py', integrator='fixed'):
+    """Run one matrix point repeats times; return its metrics (best times, max memory)"""
+    label = pointLabel(point, integrator)
+    overrides = dict(headless, **dict(params, **dict(integrators[integrator], **point)))
+    cfg, cfgFile = writeJobCfg('src/cfg.py', overrides, label, folder, 1)
+    runs = []
+    for _ in range(repeats):
+        with open(os.path.join(folder, label + '.run'), 'w') as log:
+            subprocess.check_call([sys.executable, script, 'simConfig=' + cfgFile, 'netParams=' + netParamsFile],
+                                  stdout=log, stderr=subprocess.STDOUT)
+        with open(instrumentation.reportFile(cfg)) as fileObj:
+            runs.append(json.load(fileObj))
+
+    def phaseTime(run, names):
+        return sum(run['phases'][name]['max'] for name in names if name in run['phases'])
+
+    events = runs[0]['events']
+    return {'label': label, 'point': point, 'params': params, 'integrator': integrator,
+            'buildTime': min(phaseTime(run, buildPhases) for run in runs),
+            'runTime': min(phaseTime(run, ['psolve']) for run in runs),
+            'simMsPerSecond': max(run['simMsPerSecond'] for run in runs),
+            'peakRSS': max(run['peakRSS']['max'] for run in runs),
+            'events': sum(events['conns'].values()) + sum(stim['delivered'] for stim in events['stims'].values()),
+            'spikes': events['spikes']}
+
+
+def compare(results, baseline, threshold):
+    """Regressions of results against baseline: list of (label, metric, baseline value, value, relative change)"""
+    reference = {result['label']: result for result in baseline}
+    regressions = []
+    for result in results:
+        base = reference.get(result['label'])
+        if base is None:
+            continue
+        for metric, direction in metrics.items():
+            old, new = base[metric], result[metric]
+            change = (new - old) / old if old else 0.0
+            if (direction == 0 and new != old) or (direction != 0 and -direction * change > threshold):
+                regressions.append((result['label'], metric, old, new, change))
+    return regressions
+
+
+def benchmark(matrix, params=None, folder='data/benchmark', repeats=1, out=None, baseline=None, threshold=0.1,
+              integratorNames=('fixed',)):
+    os.makedirs(folder, exist_ok=True)
+    params = params or {}
+    results = []
+    for point in matrixPoints(matrix):
+        fixed = None
+        for integrator in integratorNames:
+            result = runPoint(point, params, folder, repeats, integrator=integrator)
+            results.append(result)
+            line = '%-56s build=%7.2f s run=%7.2f s %8.1f ms/s events=%10d rss=%7.1f MB' % (
+                result['label'], result['buildTime'], result['runTime'], result['simMsPerSecond'],
+                result['events'], result['peakRSS'])
+            if integrator == 'fixed':
+                fixed = result
+            elif fixed:
+                result['speedup'] = fixed['runTime'] / result['runTime'] if result['runTime'] else float('nan')
+                result['spikeChange'] = (result['spikes'] - fixed['spikes']) / fixed['spikes'] if fixed['spikes'] else 0.0
+                line += ' speedup=%5.2fx spikes %+.1f%%' % (result['speedup'], 100 * result['spikeChange'])
+            print(line)
+
+    out = out or os.path.join(folder, 'results.json')
+    with open(out, 'w') as fileObj:
+        json.dump(results, fileObj, indent=2)
+    print('Results saved to %s' % out)
+
+    regressions = []
+    if baseline:
+        with open(baseline) as fileObj:
+            regressions = compare(results, json.load(fileObj), threshold)
+        for label, metric, old, new, change in regressions:
+            print('  REGRESSION %-48s %-14s %12.4g -> %12.4g (%+.1f%%)' % (label, metric, old, new, 100 * change))
+        print('%d regressions against %s (threshold %.0f%%)' % (len(regressions), baseline, 100 * threshold))
+    return results, regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the Sender/Receiver model over a matrix of parameters')
+    for name, values in matrixDefault.items():
+        parser.add_argument('--' + name, type=float, nargs='+', default=values)
+    parser.add_argument('--params', default='{}', help='extra cfg overrides for every point (JSON)')
+    parser.add_argument('--integrators', nargs='+', default=['fixed'], choices=list(integrators),
+                        help='integration schemes run at every point (fixed first, to compare against it)')
+    parser.add_argument('--repeats', type=int, default=1, help='runs per point (best time is kept)')
+    parser.add_argument('--folder', default='data/benchmark')
+    parser.add_argument('--save', default=None, help='results JSON (default: <folder>/results.json)')
+    parser.add_argument('--baseline', default=None, help='baseline results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative change reported as a regression')
+    args = parser.parse_args()
+    matrix = {name: [int(v) if v == int(v) else v for v in getattr(args, name)] for name in matrixDefault}
+    _, regressions = benchmark(matrix, json.loads(args.params), args.folder, args.repeats, args.save,
+                               args.baseline, args.threshold, args.integrators)
+    sys.exit(1 if regressions else 0)
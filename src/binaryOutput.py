@@ -0,0 +1,142 @@
+"""
+binaryOutput.py
+
+Columnar binary output: one .npy file per field in <saveFolder>/<simLabel>_data/, plus meta.json with
+cfg, netParams and the population gids. Spikes are stored sorted by time, so a time window can be read
+from the memory-mapped arrays without loading the rest of the file.
+
+    spkt.npy               float64 spike times (ms), sorted
+    spkid.npy              int32 spiking gids
+    t.npy                  float32 time vector of the traces
+    <trace>.npy            float32 array (cells x samples) for each recorded trace, e.g. V_izhi.npy
+    <trace>_gids.npy       int32 gid of each row of <trace>.npy
+    V_popMean.npy          float32 array (pops x samples) of population-mean V, rows in meta['popMean'],
+                           sampled every meta['popMeanTime']['step'] ms from meta['popMeanTime']['t0']
+    meta.json              cfg, netParams, pops (gids per population) and scalar results (popLag, popRates)
+
+Usage:
+    from binaryOutput import SimOutput
+    out = SimOutput('data/TwoPops_sync_data')
+    spkt, spkid = out.spikes(timeRange=[500, 1000], pops=['SenderE'])
+"""
+
+import os
+import json
+
+import numpy as np
+
+import popLag
+import recordingProfiles
+import spikeStream
+
+
+def outputFolder(cfg):
+    return os.path.join(cfg.saveFolder, cfg.simLabel + '_data')
+
+
+def _traceArrays(traces):
+    """Convert a {'cell_<gid>': vector} dict to (gids, float32 cells x samples array)"""
+    labels = sorted(traces, key=lambda label: int(label.split('_')[1]))
+    gids = np.array([int(label.split('_')[1]) for label in labels], dtype=np.int32)
+    data = np.array([np.asarray(traces[label], dtype=np.float32) for label in labels], dtype=np.float32)
+    return gids, data
+
+
+def saveSpikes(folder, spkt, spkid):
+    """Write spkt.npy and spkid.npy, sorted by spike time"""
+    os.makedirs(folder, exist_ok=True)
+    spkt = np.asarray(spkt, dtype=np.float64)
+    spkid = np.asarray(spkid, dtype=np.int32)
+    order = np.argsort(spkt, kind='stable')
+    np.save(os.path.join(folder, 'spkt.npy'), spkt[order])
+    np.save(os.path.join(folder, 'spkid.npy'), spkid[order])
+
+
+def saveMeta(folder, meta):
+    with open(os.path.join(folder, 'meta.json'), 'w') as fileObj:
+        json.dump(meta, fileObj, default=str)
+
+
+def saveData(sim, folder=None):
+    """Save the gathered output of sim (rank 0 only) in the columnar binary format"""
+    if sim.rank != 0:
+        return
+    folder = folder or outputFolder(sim.cfg)
+    simData = sim.allSimData
+    saveSpikes(folder, *spikeStream.simSpikes(sim))
+
+    traces = [name for name in list(sim.cfg.recordTraces) + ['V_min', 'V_max'] if simData.get(name)]
+    if traces and 't' in simData:
+        np.save(os.path.join(folder, 't.npy'), np.asarray(simData['t'], dtype=np.float32))
+    for name in traces:
+        gids, data = _traceArrays(simData[name])
+        np.save(os.path.join(folder, name + '.npy'), data)
+        np.save(os.path.join(folder, name + '_gids.npy'), gids)
+
+    popMeanPops = list(simData.get('V_popMean', {}))
+    popMeanTime = None
+    if popMeanPops:
+        np.save(os.path.join(folder, 'V_popMean.npy'),
+                np.array([np.asarray(simData['V_popMean'][pop], dtype=np.float32) for pop in popMeanPops]))
+        t0, step = recordingProfiles.popMeanTimes(sim)
+        popMeanTime = {'t0': t0, 'step': step}
+
+    scalars = {key: simData[key] for key in ('popLag', 'popRates', 'avgRate') if key in simData}
+    meta = {'cfg': sim.cfg.__dict__,
+            'netParams': sim.net.params.todict(),
+            'pops': {label: list(popLag.popGids(sim, label)) for label in sim.net.params.popParams},
+            'traces': traces,
+            'popMean': popMeanPops,
+            'popMeanTime': popMeanTime,
+            'simData': scalars}
+    saveMeta(folder, meta)
+    print('  Saved binary output to %s' % folder)
+
+
+class SimOutput(object):
+    """Lazy, memory-mapped reader for a folder written by saveData()"""
+
+    def __init__(self, folder):
+        self.folder = folder
+        with open(os.path.join(folder, 'meta.json')) as fileObj:
+            self.meta = json.load(fileObj)
+        self.pops = self.meta['pops']
+
+    def _load(self, name):
+        return np.load(os.path.join(self.folder, name + '.npy'), mmap_mode='r')
+
+    def gids(self, pops=None):
+        """Gids of the given populations (all cells if pops is None)"""
+        pops = pops or list(self.pops)
+        return np.concatenate([np.asarray(self.pops[pop], dtype=np.int32) for pop in pops])
+
+    def spikes(self, timeRange=None, pops=None):
+        """Spike times and gids within timeRange (ms), optionally restricted to some populations"""
+        spkt, spkid = self._load('spkt'), self._load('spkid')
+        start, stop = 0, len(spkt)
+        if timeRange is not None:
+            start, stop = np.searchsorted(spkt, timeRange[0], 'left'), np.searchsorted(spkt, timeRange[1], 'left')
+        spkt, spkid = np.asarray(spkt[start:stop]), np.asarray(spkid[start:stop])
+        if pops is not None:
+            mask = np.isin(spkid, self.gids(pops))
+            spkt, spkid = spkt[mask], spkid[mask]
+        return spkt, spkid
+
+    def trace(self, name='V_izhi', timeRange=None, pops=None):
+        """Time vector, gids and (cells x samples) trace data within timeRange, for some populations"""
+        t, data, gids = self._load('t'), self._load(name), self._load(name + '_gids')
+        start, stop = 0, len(t)
+        if timeRange is not None:
+            start, stop = np.searchsorted(t, timeRange[0], 'left'), np.searchsorted(t, timeRange[1], 'left')
+        rows = np.arange(len(gids)) if pops is None else np.flatnonzero(np.isin(gids, self.gids(pops)))
+        return np.asarray(t[start:stop]), np.asarray(gids[rows]), np.asarray(data[rows, start:stop])
+
+    def popMean(self, timeRange=None):
+        """Sample times, populations and (pops x samples) population-mean V within timeRange"""
+        data = self._load('V_popMean')
+        timing = self.meta['popMeanTime']
+        t = timing['t0'] + np.arange(data.shape[1]) * timing['step']
+        start, stop = 0, len(t)
+        if timeRange is not None:
+            start, stop = np.searchsorted(t, timeRange[0], 'left'), np.searchsorted(t, timeRange[1], 'left')
+        return t[start:stop], list(self.meta['popMean']), np.asarray(data[:, start:stop])
@@ -0,0 +1,112 @@
+"""
+build.py
+
+Network instantiation and run steps shared by init.py, the in-process batch backend and the workers.
+"""
+
+from netpyne import sim
+
+import connCache
+import checkpoint
+import crossRankDelay
+import cellDists
+import instrumentation
+import binaryOutput
+import leanNet
+import loadBalance
+import popLag
+import recordingProfiles
+import replicas
+import spikeStream
+from instrumentation import phase
+
+
+def prepareNetParams(cfg, netParams, filename=None):
+    """netParams to build for cfg (transient values, merged replicas) and the post-transient values, or None"""
+    postTransient = None
+    if cfg.transientCheckpoint['enabled']:
+        netParams, postTransient = checkpoint.transientNetParams(cfg, filename)
+    if cfg.replicas:
+        netParams = replicas.replicaNetParams(cfg, filename)  # K network copies with their own overrides and seeds
+    return netParams, postTransient
+
+
+def createNetwork(cfg, netParams):
+    """Instantiate cells, connections, stims and recordings for cfg and netParams, timing each step"""
+    recordingProfiles.applyToCfg(cfg, netParams)  # sampled cells and recording step from cfg.recordProfile
+
+    with phase('initialize'):
+        sim.initialize(simConfig=cfg, netParams=netParams)  # create network object and set cfg and net params
+    with loadBalance.distribution(netParams, cfg.loadBalance):  # cost-based cell distribution across ranks
+        with phase('createPops'):
+            sim.net.createPops()            # instantiate network populations
+        with phase('createCells'):
+            sim.net.createCells()           # instantiate network cells based on defined populations
+            cellDists.applyDistributions(sim)  # heterogeneous cell parameters, one vectorized draw per population
+    with phase('connectCells'):
+        if cfg.connCache['enabled']:
+            connCache.connectCells()        # connections from the cache, or create and cache them
+        else:
+            sim.net.connectCells()          # create connections between cells based on params
+        if cfg.minCrossRankDelay:
+            crossRankDelay.enforce(cfg.minCrossRankDelay)  # bound the spike exchange interval from below
+    with phase('addStims'):
+        sim.net.addStims()                  # add external stimulation to cells (IClamps etc)
+    if cfg.instrumentation['enabled'] and cfg.instrumentation['countEvents']:
+        instrumentation.countStims(sim)     # NetStim event counters
+    with phase('setupRecording'):
+        sim.setupRecording()                # setup variables to record for each cell (spikes, V traces, etc)
+        recordingProfiles.setup(sim)        # V envelope and population-mean recordings
+    if sim.nhosts > 1:
+        crossRankDelay.exchangeInterval()  # report the min cross-rank delay NEURON will use
+    if cfg.nThreads > 1:
+        sim.pc.nthread(cfg.nThreads)    # multithreaded integration within this process
+    if getattr(cfg, 'use_local_dt', False):
+        sim.cvode.use_local_dt(1)       # sim.runSim sets it too, but not the spikeStream/checkpoint runs
+    if cfg.leanMode:
+        with phase('leanMode'):
+            leanNet.compact(sim)            # replace connection dicts by a compact array table
+
+
+def runNetwork(postTransient=None, filename=None):
+    """Simulate the instantiated network, then gather, analyze, save and plot its output (filename: netParams
+    file, for the post-transient values of a checkpointed run)"""
+    cfg = sim.cfg
+    if cfg.spikeStream['enabled']:
+        spikeStream.start(sim)          # append-only spike files, written chunk by chunk during the run
+
+    if cfg.transientCheckpoint['enabled']:
+        checkpoint.runSim(postTransient, filename)  # run the transient once, or restore it, then the measured window
+    else:
+        with phase('init'):
+            sim.preRun()                # NetStim seeds, recording vectors, cvode settings
+        with phase('psolve'):
+            if cfg.spikeStream['enabled']:
+                spikeStream.runSim(sim)     # run in chunks, flushing spikes to disk after each one
+            else:
+                sim.runSim(skipPreRun=True) # run parallel Neuron simulation
+
+    events = None
+    if cfg.instrumentation['enabled'] and cfg.instrumentation['countEvents']:
+        events = instrumentation.countEvents(sim)  # NetCon/NetStim events per rule, from the local spikes
+    with phase('gather'):
+        recordingProfiles.gatherPopMean(sim)
+        sim.gatherData()                # gather spiking data and cell info from each node
+        if cfg.spikeStream['enabled']:
+            if spikeStream.gathered(cfg):
+                spikeStream.gatherToSimData(sim)  # streamed spikes back in simData, for NetPyNE's saving and plots
+            spikeStream.addRates(sim)     # NetPyNE's summary counted the emptied spike vectors
+    with phase('analysis'):
+        if cfg.replicas:
+            replicas.splitResults(sim)  # rates, lag and output of each replica
+        elif cfg.popLag['enabled']:
+            popLag.addToSimData(sim)    # AS/DS lag between populations, added to simData
+    with phase('save'):
+        sim.saveData()                  # save params, cell info and sim output to file (pickle,mat,txt,etc)
+        if (cfg.saveBinary or cfg.deferPlots) and not cfg.replicas:
+            binaryOutput.saveData(sim)  # columnar .npy output for fast, windowed loading
+    if not cfg.deferPlots:
+        with phase('plot'):
+            sim.analysis.plotData()     # plot spike raster etc (deferred: see deferredPlots.py)
+    if cfg.instrumentation['enabled']:
+        instrumentation.report(sim, events)  # <simLabel>_instrumentation.json next to the output
@@ -0,0 +1,52 @@
+"""
+cellDists.py
+
+Vectorized sampling of heterogeneous point process parameters. netParams.cellParamDists declares, per
+population and point process, a multiplicative jitter around the mean given in cellParams:
+
+    netParams.cellParamDists = {'SenderE': {'Izhi': {'a': ('uniform', 0.9, 1.1), ...}}, ...}
+
+    ('uniform', lo, hi)     value = mean * U(lo, hi)
+    ('normal', sd)          value = mean * (1 + sd * N(0, 1))
+
+All local cells of a population are sampled in one draw per parameter and assigned in bulk. Random
+numbers are a hash of (cell seed, population, parameter, gid), so every cell gets the same value
+regardless of the number of ranks.
+"""
+
+import numpy as np
+
+from connectivity import hashUniform, ruleStream
+
+
+def sample(dist, mean, gids, seed, stream):
+    """Values of one parameter for the cells in gids"""
+    u = hashUniform(seed, stream, gids, 0)
+    if dist[0] == 'uniform':
+        return mean * (dist[1] + (dist[2] - dist[1]) * u)
+    if dist[0] == 'normal':
+        u2 = hashUniform(seed, stream, gids, 1)
+        z = np.sqrt(-2.0 * np.log1p(-u)) * np.cos(2.0 * np.pi * u2)  # Box-Muller
+        return mean * (1.0 + dist[1] * z)
+    raise ValueError('Unknown cell parameter distribution: %s' % (dist,))
+
+
+def applyDistributions(sim):
+    """Sample and assign netParams.cellParamDists to the local cells (call after sim.net.createCells())"""
+    dists = getattr(sim.net.params, 'cellParamDists', {})
+    seed = sim.cfg.seeds['loc']
+    for pop, pointps in dists.items():
+        cells = sorted([cell for cell in sim.net.cells if cell.tags['pop'] == pop], key=lambda cell: cell.gid)
+        if not cells:
+            continue
+        gids = np.array([cell.gid for cell in cells], dtype=np.int64)
+        cellType = sim.net.params.popParams[pop]['cellType']
+        for label, params in pointps.items():
+            means = sim.net.params.cellParams[cellType]['secs']['soma']['pointps'][label]
+            for param, dist in params.items():
+                values = sample(dist, means[param], gids, seed, ruleStream('%s.%s.%s' % (pop, label, param)))
+                for cell, value in zip(cells, values.tolist()):
+                    pointp = cell.secs['soma']['pointps'][label]
+                    pointp[param] = value
+                    if 'hObj' in pointp:
+                        setattr(pointp['hObj'], param, value)
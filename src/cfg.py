@@ -3,14 +3,27 @@ from netpyne import specs
 cfg = specs.SimConfig()
 
 cfg.transient = 500
+cfg.scale = 1 # multiplies all population sizes (in-degree stays cfg.convergence)
+cfg.loadBalance = {'method': 'roundrobin', 'cellCost': 1.0, 'synCost': 0.1, # 'cost': distribute cells across ranks by estimated cost (see loadBalance.py)
+                   'groups': [['SenderE', 'SenderI'], ['ReceiverE', 'ReceiverI']]} # 'groups': also keep each group of populations on its own ranks
+cfg.replicas = [] # cfg overrides of independent network copies simulated together, e.g. replicas.seedReplicas(32) (see replicas.py)
+cfg.minCrossRankDelay = None # minimum delay (ms) of connections between cells on different ranks (see crossRankDelay.py)
 cfg.duration = 1000 # Duration of the simulation, in ms
 cfg.dt = 0.1
  # Internal integration timestep to use
+cfg.izhiMod = 'Izhi2007b' # 'Izhi2007bVS': recovery variable as a STATE, needed for variable time step (mod/izhi2007bVS.mod)
+cfg.cvode_active = False # variable time step (CVODE); cfg.dt is then only the initial step. Slower than the fixed step under the Poisson background (benchmark.py --integrators)
+cfg.use_local_dt = False # one variable time step per cell (with cvode_active)
+cfg.cvode_atol = 1e-3 # absolute error tolerance of the variable step integrator
 cfg.seeds = {'conn': 1, 'stim': 1, 'loc': 1} # Seeds for randomizers (connectivity, input stimulation and cell locations)
 cfg.createNEURONObj = True  # create HOC objects when instantiating network
 cfg.createPyStruct = True  # create Python structure (simulator-independent) when instantiating network
+cfg.leanMode = False  # after instantiation keep connections only as NEURON objects plus a compact array table (see leanNet.py)
+cfg.connCache = {'enabled': False, 'folder': 'data/connCache'}  # reuse generated connectivity across runs (see connCache.py)
 cfg.timing = True  # show timing  and save to file
+cfg.instrumentation = {'enabled': False, 'countEvents': True} # per-phase times, events per conn/stim rule and peak RSS in <simLabel>_instrumentation.json (see instrumentation.py)
 cfg.verbose = False # show detailed messages
+cfg.nThreads = 1 # NEURON threads per process (pc.nthread)
 
 # Recording
 cfg.recordCells = []  # list of cells to record from
@@ -19,6 +32,7 @@ cfg.recordTraces = {
 }
 cfg.recordStim = False  # record spikes of cell stims
 cfg.recordStep = 0.1 # Step size in ms to save data (eg. V traces, LFP, etc)
+cfg.recordProfile = {'cellsPerPop': None, 'step': None, 'envelope': False, 'popMean': False} # bounded recording (see recordingProfiles.py)
 cfg.printRunTime = 0.1
 
 # Saving
@@ -30,6 +44,8 @@ cfg.saveJson = True # Whether or not to write spikes etc. to a .mat file
 cfg.saveMat = False # Whether or not to write spikes etc. to a .mat file
 cfg.saveTxt = False # save spikes and conn to txt file
 cfg.saveDpk = False # save to a .dpk pickled file
+cfg.spikeStream = {'enabled': False, 'chunk': 100.0, 'gather': False} # append spikes to <simLabel>_spikes/ every chunk ms during the run; gather: always load them back into simData (done anyway for NetPyNE saving/plots; see spikeStream.py)
+cfg.saveBinary = False # save spikes, traces and metadata as memory-mappable .npy files (see binaryOutput.py)
 
 # Analysis and plotting
 timeRangePlotting = [cfg.transient, cfg.duration]
@@ -38,7 +54,14 @@ cfg.analysis['plotRaster'] = {'orderInverse': False, 'saveFig': True, 'timeRange
 cfg.analysis['plotTraces'] = {'include': [(pop, 0) for pop in ['SenderE', 'SenderI', 'ReceiverE', 'ReceiverI']], 'saveFig': True, 'timeRange': timeRangePlotting} # plot recorded traces for this list of cells
 cfg.analysis['plotSpikeHist'] = {'include': ['SenderE', 'SenderI', 'ReceiverE', 'ReceiverI'], 'saveFig': True, 'timeRange': timeRangePlotting} #True # Whether or not to plot a raster
 
+cfg.deferPlots = False # skip plotting; render the figures above later from the binary output (see deferredPlots.py)
+
+# Population lag (see popLag.py): SenderE -> ReceiverE cross-correlation peak, stored in simData['popLag']
+cfg.popLag = {'enabled': True, 'pre': 'SenderE', 'post': 'ReceiverE', 'binSize': 1.0, 'maxLag': 50.0, 'timeRange': timeRangePlotting}
+
 cfg.convergence = 50 # 5, 10, 20, 100
+cfg.cellParamMethod = 'string' # 'string': per-cell NetPyNE string functions; 'vectorized': one seeded draw per population (see cellDists.py)
+cfg.connMethod = 'netpyne' # 'netpyne': NetPyNE convergence rule; 'vectorized': NumPy generator, local rows only (see connectivity.py)
 # Synaptic weights
 cfg.bkgRate = 2000
 cfg.bkgNoise = 0.7
@@ -76,4 +99,10 @@ cfg.weightSESI = cfg.weightEI
 cfg.delaySESI = cfg.delay
 
 cfg.weightSISI = cfg.weightII
-cfg.delaySISI = cfg.delay
\ No newline at end of file
+cfg.delaySISI = cfg.delay
+
+# Transient checkpointing (see checkpoint.py): the transient is integrated once with transientValues,
+# saved to folder, and reused by every run that only differs in the postTransient parameters
+cfg.transientCheckpoint = {'enabled': False, 'folder': 'data/checkpoints',
+                           'postTransient': ['weightEE', 'weightEI', 'weightIE', 'weightII', 'bkgRate', 'bkgNoise']}
+cfg.transientCheckpoint['transientValues'] = {name: getattr(cfg, name) for name in cfg.transientCheckpoint['postTransient']}
@@ -0,0 +1,56 @@
+import os
+import runpy
+
+# Run, recording, saving and batch options of the Sender/Receiver cfg, then the DMSI motif (see dmsi.py)
+cfg = runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cfg.py'))['cfg']
+
+cfg.simLabel = 'DMSI'
+cfg.transient = 200
+cfg.duration = 1000 # Duration of the simulation, in ms
+cfg.dt = 0.01 # HH spikes of the Matias model need a finer step than the Izhikevich cells
+cfg.hParams['v_init'] = 0.0 # shifted HH convention, rest near 0 mV
+cfg.hParams['secondorder'] = 2 # Crank-Nicolson: spike times within ~0.03 ms of the SciPy reference (see dmsi.crossCheck)
+cfg.loadBalance['groups'] = [['Driver', 'Master'], ['Slave', 'Interneuron']]
+
+# Recording
+cfg.recordCells = [(pop, 0) for pop in ['Driver', 'Master', 'Slave', 'Interneuron']]
+cfg.recordTraces = {'V_soma': {'sec': 'soma', 'loc': 0.5, 'var': 'v'}}
+cfg.recordStep = 0.05
+
+# Analysis and plotting
+timeRangePlotting = [cfg.transient, cfg.duration]
+cfg.analysis['plotRaster'] = {'orderInverse': False, 'saveFig': True, 'timeRange': timeRangePlotting}
+cfg.analysis['plotTraces'] = {'include': [(pop, 0) for pop in ['Driver', 'Master', 'Slave', 'Interneuron']], 'saveFig': True, 'timeRange': timeRangePlotting}
+cfg.analysis['plotSpikeHist'] = {'include': ['Driver', 'Master', 'Slave', 'Interneuron'], 'saveFig': True, 'timeRange': timeRangePlotting}
+
+# Master -> Slave lag (AS < 0 < DS); the motif fires at ~70 Hz, so lags are searched within +-10 ms
+cfg.popLag = {'enabled': True, 'pre': 'Master', 'post': 'Slave', 'binSize': 0.5, 'maxLag': 10.0, 'timeRange': timeRangePlotting}
+
+# Motif
+cfg.motif = 'DMSI' # 'DMSI' or 'MSI' (no driver)
+cfg.popSize = 1 # cells per population: 1 is the single-neuron motif of the SciPy scripts
+cfg.convergence = 1 # presynaptic cells per synapse type and postsynaptic cell (capped at popSize); weights are divided by it
+
+# Constant input currents (pA)
+cfg.IDriver = 280.0
+cfg.IMaster = 280.0
+cfg.ISlave = 280.0
+cfg.IInterneuron = 280.0
+
+# Maximal synaptic conductances (nS), matias2011_ASDS_analisis_lechat.py
+cfg.gAMPA = 10.0
+cfg.gNMDA = 10.0
+cfg.gGABA = 40.0
+
+# Poisson background on an exp2 AMPA synapse, to make the cells of a population differ (off for the motif)
+cfg.bkgRate = 0
+cfg.bkgNoise = 1.0
+cfg.bkgWeight = 0.0005 # uS
+
+# Stochastic ensemble of the SciPy motif (see dmsi.ensemble): 'gaussian' white noise of intensity sigma (pA ms^1/2)
+# or 'poisson' pulses at rate (Hz) of charge (fC) on every neuron's current, Euler-Maruyama with step dt (ms)
+cfg.ensemble = {'trials': 1000, 'noise': 'gaussian', 'sigma': 20.0, 'rate': 2000.0, 'charge': 5.0, 'dt': 0.01, 'seed': 1}
+
+cfg.transientCheckpoint = {'enabled': False, 'folder': 'data/checkpoints',
+                           'postTransient': ['gAMPA', 'gNMDA', 'gGABA', 'bkgRate']}
+cfg.transientCheckpoint['transientValues'] = {name: getattr(cfg, name) for name in cfg.transientCheckpoint['postTransient']}
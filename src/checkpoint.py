@@ -0,0 +1,154 @@
+"""
+checkpoint.py
+
+Transient checkpointing: integrate the first cfg.transient ms once per network build, save the full
+NEURON state (SaveState plus the Random123 sequence of every NetStim) to disk, and let later runs
+that only change post-transient parameters restore it and simulate just [cfg.transient, cfg.duration].
+
+Runs sharing a checkpoint always integrate the transient with cfg.transientCheckpoint['transientValues']
+for the parameters listed in cfg.transientCheckpoint['postTransient']; the run's own values for those
+parameters are applied in place (see netUpdate.py) once the transient is over.
+
+NEURON's SaveState.fread crashes when a network built after a restored one, in the same process, restores
+a state with pending NetStim events; a process (an in-process batch, a worker) therefore restores into one
+network build only, and later builds integrate their transient again.
+"""
+
+import os
+import json
+import hashlib
+
+from neuron import h
+from netpyne import sim
+
+import netUpdate
+import recordingProfiles
+import spikeStream
+from instrumentation import phase
+
+_restored = False  # a network of this process was restored from a checkpoint
+
+
+def transientNetParams(cfg, filename=None):
+    """Rebuild netParams with the transient values; return it and the run's post-transient values"""
+    options = cfg.transientCheckpoint
+    runValues = {name: getattr(cfg, name) for name in options['postTransient']}
+    netUpdate.setCfgParams(cfg, options['transientValues'])
+    return netUpdate.loadNetParams(cfg, filename), runValues
+
+
+def _keyNetParams():
+    """sim.net.params without NetPyNE's internal entries (_cellParamStringFuncs, _synMechStringFuncs, _labelid):
+    compiled lambdas and label counters, whose text differs from process to process"""
+    return {key: value for key, value in sim.net.params.todict().items() if not key.startswith('_')}
+
+
+def checkpointKey():
+    """Hash of everything that determines the network state at the end of the transient"""
+    state = {'version': 2,  # version 1 checkpoints could hold Python cvode.event callbacks
+             'netParams': _keyNetParams(),
+             'seeds': sim.cfg.seeds,
+             'dt': sim.cfg.dt,
+             'integrator': [sim.cfg.cvode_active, getattr(sim.cfg, 'use_local_dt', False), sim.cfg.cvode_atol],
+             'transient': sim.cfg.transient,
+             'hParams': sim.cfg.hParams,
+             'recordProfile': sim.cfg.recordProfile,  # the popMean clock and envelopes are part of the state
+             'nhosts': sim.nhosts}
+    # no default=str: a value without a stable JSON form must not silently produce a per-process key
+    return hashlib.sha1(json.dumps(state, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def checkpointFiles(key):
+    folder = sim.cfg.transientCheckpoint['folder']
+    base = os.path.join(folder, '%s_rank%d' % (key, sim.rank))
+    return base + '.dat', base + '_rng.json'
+
+
+def _netStims():
+    for cell in sim.net.cells:
+        for i, stim in enumerate(cell.stims):
+            if 'hRandom' in stim:
+                yield '%s_%d' % (cell.gid, i), stim['hRandom']
+
+
+def saveState(key):
+    stateFile, rngFile = checkpointFiles(key)
+    os.makedirs(os.path.dirname(stateFile), exist_ok=True)
+    state = h.SaveState()
+    state.save()
+    f = h.File()
+    f.wopen(stateFile)
+    state.fwrite(f)
+    f.close()
+    with open(rngFile, 'w') as fileObj:
+        json.dump({label: rand.seq() for label, rand in _netStims()}, fileObj)
+
+
+def canRestore():
+    return not _restored or getattr(sim.net, 'checkpointRestored', False)
+
+
+def restoreState(key):
+    global _restored
+    stateFile, rngFile = checkpointFiles(key)
+    state = h.SaveState()
+    f = h.File()
+    f.ropen(stateFile)
+    state.fread(f)
+    f.close()
+    state.restore()
+    _restored = sim.net.checkpointRestored = True
+    with open(rngFile) as fileObj:
+        seqs = json.load(fileObj)
+    for label, rand in _netStims():
+        rand.seq(seqs[label])
+    h.frecord_init()  # restart recordings at the restored time
+    recordingProfiles.restart(sim)  # and the population-mean samples
+
+
+def psolve(tstop):
+    if sim.cfg.spikeStream['enabled']:
+        spikeStream.psolve(sim, tstop)  # flush spikes to disk in chunks
+    else:
+        sim.pc.psolve(tstop)
+
+
+def runSim(postTransient, filename=None):
+    """Replacement for sim.runSim() that reuses (or creates) the transient checkpoint; filename is the netParams
+    file that maps postTransient onto the network (see netUpdate.applyParams)"""
+    key = checkpointKey()
+    exists = all(os.path.exists(f) for f in checkpointFiles(key))
+    exists = sim.pc.allreduce(int(exists), 3) == 1  # every rank must have its part
+    restore = exists and canRestore()
+
+    # Python cvode.event callbacks cannot be saved by SaveState (a restored one breaks psolve), so the run-time
+    # printout is off; recordings use Vector.record and NetStim clocks (see recordingProfiles.py)
+    sim.cfg.printRunTime = False
+
+    sim.pc.barrier()
+    sim.timing('start', 'runTime')
+    with phase('init'):
+        sim.preRun()
+        h.finitialize(float(sim.cfg.hParams['v_init']))
+
+    with phase('transient'):
+        if restore:
+            restoreState(key)
+            if sim.rank == 0: print('  Restored transient checkpoint %s at t = %g ms' % (key, h.t))
+        else:
+            psolve(sim.cfg.transient)
+            if not exists:
+                saveState(key)
+                if sim.rank == 0: print('  Saved transient checkpoint %s at t = %g ms' % (key, h.t))
+            elif sim.rank == 0:
+                print('  Integrated the transient of checkpoint %s (restored into another network already)' % key)
+
+    netUpdate.applyParams(postTransient, filename)  # also clamps the cross-rank delays again (see crossRankDelay.py)
+    with phase('psolve'):
+        psolve(sim.cfg.duration)
+
+    sim.pc.barrier()
+    sim.timing('stop', 'runTime')
+    if sim.rank == 0 and sim.cfg.timing:
+        print('  Done; run time = %0.2f s; real-time ratio: %0.2f.' %
+              (sim.timingData['runTime'], sim.cfg.duration / 1000 / sim.timingData['runTime']))
@@ -0,0 +1,107 @@
+"""
+connCache.py
+
+Connectivity cache: the cell pairs generated by every connParams rule are saved to disk as compact
+integer arrays (one .npz file per rank), keyed on a hash of popParams, the connectivity-relevant part
+of connParams, the conn seed and the number of ranks. Later runs with the same key turn every rule
+into a NetPyNE 'connList' rule built from the cached pairs, so connectCells() goes straight to NEURON
+object creation instead of regenerating the connectivity.
+
+Weights and delays are not part of the key: numeric values are taken from the current connParams, and
+only rules with string (random) weights or delays reuse the cached values.
+"""
+
+import os
+import json
+import hashlib
+import numbers
+
+import numpy as np
+
+from netpyne import sim
+
+keyExclude = ['weight', 'delay']
+
+
+def _isNumber(value):
+    return isinstance(value, numbers.Number) and not isinstance(value, bool)
+
+
+def cacheKey():
+    netParams = sim.net.params
+    connParams = {label: {k: v for k, v in rule.items() if k not in keyExclude}
+                  for label, rule in netParams.connParams.items()}
+    state = {'popParams': netParams.popParams, 'connParams': connParams,
+             'seed': sim.cfg.seeds['conn'], 'nhosts': sim.nhosts}
+    return hashlib.sha1(json.dumps(state, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def cacheFile(key):
+    return os.path.join(sim.cfg.connCache['folder'], '%s_rank%d.npz' % (key, sim.rank))
+
+
+def popFirstGids():
+    """First gid of each population (NetPyNE numbers cells contiguously, population by population)"""
+    first, gid = {}, 0
+    for label, pop in sim.net.params.popParams.items():
+        first[label] = gid
+        gid += pop['numCells']
+    return first
+
+
+def _synMechs(rule):
+    return rule['synMech'] if isinstance(rule['synMech'], list) else [rule['synMech']]
+
+
+def save(key):
+    """Save the local connections created by connectCells() (call before addStims())"""
+    first = popFirstGids()
+    rules = sim.net.params.connParams
+    arrays = {label: [] for label in rules}
+    for cell in sim.net.cells:
+        for conn in cell.conns:
+            rule = rules.get(conn.get('label'))
+            if rule is None or conn['synMech'] != _synMechs(rule)[0]:
+                continue  # one entry per cell pair, not per synaptic mechanism
+            arrays[conn['label']].append((conn['preGid'] - first[rule['preConds']['pop']],
+                                          cell.gid - first[rule['postConds']['pop']],
+                                          conn['weight'], conn['delay']))
+
+    data = {}
+    for i, label in enumerate(rules):
+        conns = np.array(arrays[label], dtype=np.float64).reshape(-1, 4)
+        data['pairs%d' % i] = conns[:, :2].astype(np.int32)
+        data['weight%d' % i] = conns[:, 2]
+        data['delay%d' % i] = conns[:, 3]
+    filename = cacheFile(key)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    np.savez(filename, labels=np.array(list(rules)), **data)
+
+
+def load(key):
+    """Replace every convergence rule by a connList rule with the cached pairs; return False on a miss"""
+    exists = os.path.exists(cacheFile(key))
+    if sim.pc.allreduce(int(exists), 3) != 1:
+        return False
+    data = np.load(cacheFile(key))
+    for i, label in enumerate(data['labels']):
+        rule = sim.net.params.connParams[str(label)]
+        for k in ['convergence', 'divergence', 'probability']:
+            rule.pop(k, None)
+        rule['connList'] = data['pairs%d' % i].tolist()
+        if not _isNumber(rule['weight']):
+            rule['weight'] = data['weight%d' % i].tolist()
+        if not _isNumber(rule['delay']):
+            rule['delay'] = data['delay%d' % i].tolist()
+    return True
+
+
+def connectCells():
+    """sim.net.connectCells() using (and filling) the connectivity cache"""
+    key = cacheKey()
+    hit = load(key)
+    sim.net.connectCells()
+    if not hit:
+        save(key)
+    if sim.rank == 0:
+        print('  Connectivity cache %s: %s' % ('hit' if hit else 'saved', key))
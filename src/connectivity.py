@@ -0,0 +1,104 @@
+"""
+connectivity.py
+
+Vectorized generator for the 'convergence' connectivity rule used by every connParams entry in
+src/netParams.py. Presynaptic cells for all (local) postsynaptic cells are drawn at once with NumPy,
+and each rule is turned into a NetPyNE 'connList' rule containing only the rows of the cells owned by
+this MPI rank.
+
+Random numbers come from a counter-based hash of (conn seed, rule, postsynaptic cell, draw), so the
+connectivity of a cell does not depend on the number of ranks or on which other cells are generated.
+As in NetPyNE's convergence rule, each postsynaptic cell receives `convergence` distinct presynaptic
+cells (fewer if the presynaptic population is smaller) and no self-connections.
+"""
+
+import zlib
+
+import numpy as np
+
+_mask64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def _splitmix64(x):
+    x = (x + np.uint64(0x9E3779B97F4A7C15)) & _mask64
+    x = ((x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)) & _mask64
+    x = ((x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)) & _mask64
+    return x ^ (x >> np.uint64(31))
+
+
+def hashUniform(seed, stream, index, draw):
+    """Uniform [0, 1) numbers that depend only on (seed, stream, index, draw); arrays broadcast"""
+    with np.errstate(over='ignore'):
+        x = _splitmix64(np.uint64(seed) ^ _splitmix64(np.uint64(stream)))
+        x = _splitmix64(x ^ np.asarray(index, dtype=np.uint64))
+        x = _splitmix64(x ^ np.asarray(draw, dtype=np.uint64))
+    return (x >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+
+def ruleStream(label):
+    return zlib.crc32(label.encode())
+
+
+def convergencePairs(numPre, postIndices, convergence, seed, stream, samePop=False):
+    """
+    (numPost*convergence, 2) array of [preIndex, postIndex], with distinct presynaptic cells per row.
+
+    postIndices are the indices (within the postsynaptic population) of the rows to generate.
+    """
+    postIndices = np.asarray(postIndices, dtype=np.int64)
+    available = numPre - 1 if samePop else numPre
+    convergence = int(min(convergence, max(available, 0)))
+    if len(postIndices) == 0 or convergence == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+
+    draws = np.broadcast_to(np.arange(convergence, dtype=np.int64), (len(postIndices), convergence)).copy()
+    pre = np.floor(hashUniform(seed, stream, postIndices[:, None], draws) * numPre).astype(np.int64)
+    while True:
+        # invalid draws: self-connections, and repeats of a presynaptic cell within a row
+        order = np.argsort(pre, axis=1, kind='stable')
+        sortedPre = np.take_along_axis(pre, order, axis=1)
+        repeated = np.zeros_like(pre, dtype=bool)
+        repeated[:, 1:] = sortedPre[:, 1:] == sortedPre[:, :-1]
+        invalid = np.zeros_like(pre, dtype=bool)
+        np.put_along_axis(invalid, order, repeated, axis=1)
+        if samePop:
+            invalid |= pre == postIndices[:, None]
+        if not invalid.any():
+            break
+        draws[invalid] += convergence  # next draw number for this slot
+        rows = np.nonzero(invalid)[0]
+        pre[invalid] = np.floor(hashUniform(seed, stream, postIndices[rows], draws[invalid]) * numPre).astype(np.int64)
+
+    post = np.repeat(postIndices, convergence)
+    return np.stack((pre.ravel(), post), axis=1)
+
+
+def localIndices(firstGid, numCells, rank, nhosts=1, ranks=None):
+    """
+    Indices of the cells of a population owned by rank, given the rank of every gid (ranks, see
+    loadBalance.py) or, if ranks is None, NetPyNE's round-robin distribution over nhosts
+    """
+    gids = np.arange(firstGid, firstGid + numCells)
+    owner = gids % nhosts if ranks is None else np.asarray(ranks)[gids]
+    return gids[owner == rank] - firstGid
+
+
+def vectorizeConvergence(netParams, seed, rank=0, nhosts=1, ranks=None, seeds=None):
+    """
+    Turn every convergence rule of netParams into a connList rule with the rows local to rank;
+    seeds optionally gives a different conn seed for some rules ({label: seed})
+    """
+    first, gid = {}, 0
+    for label, pop in netParams.popParams.items():
+        first[label] = gid
+        gid += pop['numCells']
+
+    for label, rule in netParams.connParams.items():
+        if 'convergence' not in rule:
+            continue
+        prePop, postPop = rule['preConds']['pop'], rule['postConds']['pop']
+        postIndices = localIndices(first[postPop], netParams.popParams[postPop]['numCells'], rank, nhosts, ranks)
+        pairs = convergencePairs(netParams.popParams[prePop]['numCells'], postIndices, rule['convergence'],
+                                 (seeds or {}).get(label, seed), ruleStream(label), samePop=prePop == postPop)
+        rule['inDegree'] = rule.pop('convergence')  # kept for cost estimates (see loadBalance.py)
+        rule['connList'] = pairs.tolist()
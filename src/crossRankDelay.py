@@ -0,0 +1,68 @@
+"""
+crossRankDelay.py
+
+Parallel runs of this model are limited by the near-zero connection delays (cfg.delay = 1e-5 ms):
+NEURON exchanges spikes between ranks every min delay of the connections that cross ranks, i.e. every
+10 ns of simulated time. Two tools remove that bottleneck:
+
+- placement: cfg.loadBalance['method'] = 'groups' keeps tightly coupled populations (e.g. SenderE and
+  SenderI) on their own set of ranks (see loadBalance.py), so fewer connections cross ranks;
+- cfg.minCrossRankDelay: every connection whose presynaptic cell lives on another rank gets at least
+  this delay. The exchange interval becomes minCrossRankDelay, and the largest added latency (reported,
+  and stored in simData['crossRankDelay']) bounds the timing error of every clamped spike delivery.
+  Connections within a rank keep their exact delays.
+"""
+
+import numpy as np
+from netpyne import sim
+
+
+def _clampConnTable(minDelay):
+    """Lean mode (see leanNet.py): clamp the cross-rank NetCons listed in sim.net.connTable"""
+    table = sim.net.connTable
+    remote = (table['pre'] >= 0) & ~np.isin(table['pre'], list(sim.net.gid2lid))
+    clamp = np.flatnonzero(remote & (table['delay'] < minDelay))
+    for i in clamp:
+        sim.net.netcons[i].delay = minDelay
+    maxShift = float(np.max(minDelay - table['delay'][clamp])) if len(clamp) else 0.0
+    table['delay'][clamp] = minDelay
+    rules = set(table['rules'][rule] for rule in np.unique(table['rule'][clamp]) if rule >= 0)
+    return int(remote.sum()), len(clamp), maxShift, rules
+
+
+def enforce(minDelay, verbose=True):
+    """Clamp the delay of cross-rank connections to minDelay (call after sim.net.connectCells(), and again
+    whenever delays are reset, see netUpdate.applyParams())"""
+    numConns, numClamped, maxShift, rules = 0, 0, 0.0, set()
+    if hasattr(sim.net, 'connTable'):
+        numConns, numClamped, maxShift, rules = _clampConnTable(minDelay)
+    for cell in sim.net.cells:
+        for conn in cell.conns:
+            preGid = conn.get('preGid')
+            if not isinstance(preGid, int) or 'pointer' in conn:
+                continue  # NetStims are always local; pointer connections transfer V every step, without delay
+            numConns += 1
+            if preGid in sim.net.gid2lid or conn['hObj'].delay >= minDelay:
+                continue
+            maxShift = max(maxShift, minDelay - conn['hObj'].delay)
+            conn['delay'] = minDelay
+            conn['hObj'].delay = minDelay
+            numClamped += 1
+            rules.add(conn.get('label'))
+
+    totals = [sim.pc.allreduce(numConns, 1), sim.pc.allreduce(numClamped, 1), sim.pc.allreduce(maxShift, 2)]
+    report = {'minDelay': minDelay, 'numConns': int(totals[0]), 'numClamped': int(totals[1]),
+              'maxAddedLatency': totals[2], 'rules': sorted(str(rule) for rule in rules)}
+    sim.simData['crossRankDelay'] = report
+    if sim.rank == 0 and verbose:
+        print('  Cross-rank delay >= %g ms: %d of %d connections clamped, max added latency %.3g ms' %
+              (minDelay, report['numClamped'], report['numConns'], report['maxAddedLatency']))
+    return report
+
+
+def exchangeInterval():
+    """Spike exchange interval NEURON will use (global min delay of cross-rank connections)"""
+    interval = sim.pc.set_maxstep(10)
+    if sim.rank == 0:
+        print('  Spike exchange interval: %g ms' % interval)
+    return interval
@@ -0,0 +1,152 @@
+"""
+deferredPlots.py
+
+Deferred plotting: with cfg.deferPlots, src/init.py jobs skip sim.analysis.plotData() and only save
+the binary output (see binaryOutput.py), which already holds what the figures need (sorted spikes,
+population gids, sampled traces, population-mean V and the cfg.analysis options). Figures are then
+rendered on demand from that output, for selected jobs and in parallel worker processes:
+
+    raster      <label>_raster.png       spike raster of all populations (cfg.analysis['plotRaster'])
+    spikeHist   <label>_spikeHist.png    population rates (cfg.analysis['plotSpikeHist'])
+    traces      <label>_traces.png       recorded V traces, or the population-mean V (cfg.analysis['plotTraces'])
+
+Usage (from the repository root):
+    python src/deferredPlots.py ASDS_batch --jobs 'ASDS_3_*' --figures raster spikeHist --workers 8
+"""
+
+import os
+import fnmatch
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+
+from binaryOutput import SimOutput
+
+figuresDefault = ['raster', 'spikeHist', 'traces']
+popColors = {'SenderE': 'tab:blue', 'SenderI': 'tab:red', 'ReceiverE': 'tab:green', 'ReceiverI': 'tab:orange'}
+
+
+def _options(out, name):
+    cfg = out.meta['cfg']
+    options = dict((cfg.get('analysis') or {}).get(name) or {})
+    options.setdefault('timeRange', [cfg['transient'], cfg['duration']])
+    return options
+
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use('Agg')  # no display, and only imported by the processes that render
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def plotRaster(out, filename):
+    plt = _pyplot()
+    options = _options(out, 'plotRaster')
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for pop in out.pops:
+        spkt, spkid = out.spikes(options['timeRange'], [pop])
+        ax.scatter(spkt, spkid, s=2, marker='|', color=popColors.get(pop), label=pop)
+    if options.get('orderInverse'):
+        ax.invert_yaxis()
+    ax.set(xlabel='Time (ms)', ylabel='Cell gid', xlim=options['timeRange'])
+    ax.legend(loc='upper right', markerscale=4)
+    fig.savefig(filename, dpi=150)
+    plt.close(fig)
+
+
+def plotSpikeHist(out, filename, binSize=5.0):
+    plt = _pyplot()
+    options = _options(out, 'plotSpikeHist')
+    timeRange = options['timeRange']
+    binSize = options.get('binSize', binSize)
+    edges = np.arange(timeRange[0], timeRange[1] + binSize, binSize)
+    fig, ax = plt.subplots(figsize=(10, 4))
+    for pop in options.get('include') or list(out.pops):
+        if pop not in out.pops:
+            continue
+        spkt, _ = out.spikes(timeRange, [pop])
+        rate = np.histogram(spkt, edges)[0] * (1000.0 / binSize) / max(len(out.pops[pop]), 1)
+        ax.plot(edges[:-1], rate, color=popColors.get(pop), label=pop)
+    ax.set(xlabel='Time (ms)', ylabel='Rate (Hz per cell)', xlim=timeRange)
+    ax.legend(loc='upper right')
+    fig.savefig(filename, dpi=150)
+    plt.close(fig)
+
+
+def plotTraces(out, filename):
+    """Per-cell V traces if they were saved, otherwise the population-mean V; False if there is neither"""
+    options = _options(out, 'plotTraces')
+    timeRange = options['timeRange']
+    curves = []
+    if out.meta['traces']:
+        name = out.meta['traces'][0]
+        for pop in out.pops:
+            t, gids, data = out.trace(name, timeRange, [pop])
+            curves += [(t, row, '%s %d' % (pop, gid), popColors.get(pop)) for gid, row in zip(gids, data)]
+    elif out.meta['popMean']:
+        t, pops, data = out.popMean(timeRange)  # starts at cfg.transient in a restored checkpoint run
+        curves = [(t, row, pop + ' mean', popColors.get(pop)) for pop, row in zip(pops, data)]
+    if not curves:
+        return False
+
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for t, v, label, color in curves:
+        ax.plot(t, v, lw=0.8, label=label, color=color)
+    ax.set(xlabel='Time (ms)', ylabel='V (mV)', xlim=timeRange)
+    ax.legend(loc='upper right', fontsize='small')
+    fig.savefig(filename, dpi=150)
+    plt.close(fig)
+    return True
+
+
+plotFunctions = {'raster': plotRaster, 'spikeHist': plotSpikeHist, 'traces': plotTraces}
+
+
+def renderJob(args):
+    """Render the figures of one job output folder next to it; return the files written"""
+    folder, figures, outFolder = args
+    out = SimOutput(folder)
+    label = os.path.basename(folder.rstrip('/'))[:-len('_data')]
+    outFolder = outFolder or os.path.dirname(folder.rstrip('/'))
+    files = []
+    for figure in figures:
+        filename = os.path.join(outFolder, '%s_%s.png' % (label, figure))
+        if plotFunctions[figure](out, filename) is not False:
+            files.append(filename)
+    return files
+
+
+def renderBatch(folder, patterns=None, figures=None, workers=None, outFolder=None):
+    """Render figures for the jobs of a batch folder whose label matches any of patterns (all jobs if None)"""
+    figures = figures or figuresDefault
+    jobs = [os.path.join(folder, name) for name in sorted(os.listdir(folder))
+            if name.endswith('_data') and os.path.exists(os.path.join(folder, name, 'meta.json'))]
+    if patterns:
+        jobs = [job for job in jobs
+                if any(fnmatch.fnmatch(os.path.basename(job)[:-len('_data')], pattern) for pattern in patterns)]
+    if outFolder:
+        os.makedirs(outFolder, exist_ok=True)
+
+    files = []
+    with Pool(workers) as pool:
+        for jobFiles in pool.imap_unordered(renderJob, [(job, figures, outFolder) for job in jobs]):
+            files += jobFiles
+    print('Rendered %d figures for %d jobs' % (len(files), len(jobs)))
+    return files
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render figures from saved job output')
+    parser.add_argument('folder', nargs='?', default='ASDS_batch', help='batch folder, or one <label>_data folder')
+    parser.add_argument('--jobs', nargs='+', default=None, help='job label patterns, e.g. ASDS_3_* (default: all)')
+    parser.add_argument('--figures', nargs='+', choices=figuresDefault, default=figuresDefault)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--out', default=None, help='folder for the figures (default: next to the job output)')
+    args = parser.parse_args()
+    if os.path.exists(os.path.join(args.folder, 'meta.json')):
+        print('\n'.join(renderJob((args.folder, args.figures, args.out))))
+    else:
+        renderBatch(args.folder, args.jobs, args.figures, args.workers, args.out)
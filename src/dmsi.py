@@ -0,0 +1,318 @@
+"""
+dmsi.py
+
+Hodgkin-Huxley driver-master-slave-interneuron (DMSI) motif of Matias et al. (2011), with the constants of
+ASDS_matias2011/matias2011_ASDS_analisis_lechat.py. The same definitions drive the NEURON/NetPyNE variant
+(src/cfgDMSI.py, src/netParamsDMSI.py, mod/hhMatias.mod, mod/KinSynMatias.mod) and the SciPy reference
+integrated here:
+
+    neurons    HH in the shifted convention (rest near 0 mV), C = 9*pi pF, conductances in nS, currents in pA
+    synapses   kinetic r' = alpha T(Vpre) (1 - r) - beta r with graded release T = 1/(1 + exp(-(Vpre - 62)/5));
+               AMPA and NMDA (Mg2+ block) excitatory, GABA_A inhibitory, wired as in synapses below
+    motifs     'DMSI', or 'MSI' without the driver
+
+crossCheck() runs the single-neuron NetPyNE variant and the SciPy reference with the same currents and
+conductances, and compares their spike times and voltage traces. ensemble() integrates many realisations
+of the motif with noisy input currents at once (Euler-Maruyama) and returns the distribution of the
+Master->Slave lag; runEnsemble() does so with the currents, conductances and cfg.ensemble of a cfg file.
+
+Usage (from the repository root):
+    python src/dmsi.py                       # cross-check NEURON against the SciPy reference
+    python src/dmsi.py ensemble 1000         # lag distribution of 1000 noisy realisations
+    python src/init.py simConfig=src/cfgDMSI.py netParams=src/netParamsDMSI.py
+    python src/batch.py dmsi 1               # population grid over gAMPA x gGABA
+"""
+
+import os
+import json
+import runpy
+
+import numpy as np
+
+C = 9.0 * np.pi                                          # pF
+gNa, gK, gL = 1080.0 * np.pi, 324.0 * np.pi, 2.7 * np.pi  # nS
+eNa, eK, eL = 115.0, -12.0, 10.6                         # mV
+somaDiam = 30.0  # um; a 30 x 30 um soma with cm = 1 uF/cm2 has C = 9*pi pF
+
+receptors = {'AMPA': {'alpha': 1.1, 'beta': 0.19, 'e': 60.0, 'mg': 0.0},
+             'NMDA': {'alpha': 0.072, 'beta': 0.0066, 'e': 60.0, 'mg': 1.0},
+             'GABA': {'alpha': 5.0, 'beta': 0.30, 'e': -20.0, 'mg': 0.0}}
+release = {'Tmax': 1.0, 'Vp': 62.0, 'Kp': 5.0}
+
+neurons = ['Driver', 'Master', 'Slave', 'Interneuron']
+synapses = [('Driver', 'Master', 'AMPA'),      # (pre, post, receptor)
+            ('Driver', 'Master', 'NMDA'),
+            ('Driver', 'Slave', 'NMDA'),
+            ('Driver', 'Interneuron', 'NMDA'),
+            ('Master', 'Slave', 'AMPA'),
+            ('Slave', 'Interneuron', 'AMPA'),
+            ('Interneuron', 'Slave', 'GABA')]
+
+
+def motifNeurons(motif='DMSI'):
+    return neurons if motif == 'DMSI' else neurons[1:]
+
+
+def motifSynapses(motif='DMSI'):
+    return [syn for syn in synapses if syn[0] in motifNeurons(motif)]
+
+
+def density(g):
+    """Channel density (S/cm2) of a whole-cell conductance g (nS) for cm = 1 uF/cm2"""
+    return g / C * 1e-3
+
+
+def _vtrap(x, y):
+    """x/(exp(x/y) - 1), with its limit y at x = 0"""
+    x = np.asarray(x, dtype=float)
+    small = np.abs(x / y) < 1e-6
+    return np.where(small, y * (1 - x / y / 2), x / np.expm1(np.where(small, 1.0, x / y)))
+
+
+def gatingRates(V):
+    """(alpha, beta) of m, h and n at V (shifted convention), as in mod/hhMatias.mod"""
+    return ((0.1 * _vtrap(25 - V, 10), 4 * np.exp(-V / 18)),
+            (0.07 * np.exp(-V / 20), 1 / (np.exp((30 - V) / 10) + 1)),
+            (0.01 * _vtrap(10 - V, 10), 0.125 * np.exp(-V / 80)))
+
+
+def mgBlock(V, mg):
+    return 1 / (1 + np.exp(-0.062 * V) * mg / 3.57)
+
+
+def initialState(motif='DMSI', shape=()):
+    """V = 0 with the gating variables at steady state and all synapses closed; shape adds trailing axes"""
+    cell = [0.0] + [a / (a + b) for a, b in gatingRates(0.0)]
+    y = np.array(cell * len(motifNeurons(motif)) + [0.0] * len(motifSynapses(motif)))
+    return np.broadcast_to(y.reshape((-1,) + (1,) * len(shape)), y.shape + tuple(shape)).copy()
+
+
+def derivatives(y, currents, g, motif='DMSI'):
+    """
+    dy/dt of the motif. y holds [V, m, h, n] per neuron then r per synapse along axis 0; any trailing axes
+    are independent realisations. currents: pA per neuron (scalars or arrays broadcasting against y[0]);
+    g: maximal conductance per receptor (nS).
+    """
+    names, syns = motifNeurons(motif), motifSynapses(motif)
+    N = len(names)
+    V, m, h, n = y[0:4 * N:4], y[1:4 * N:4], y[2:4 * N:4], y[3:4 * N:4]
+    r = y[4 * N:]
+    dy = np.empty_like(y)
+
+    (am, bm), (ah, bh), (an, bn) = gatingRates(V)
+    dy[1:4 * N:4] = am * (1 - m) - bm * m
+    dy[2:4 * N:4] = ah * (1 - h) - bh * h
+    dy[3:4 * N:4] = an * (1 - n) - bn * n
+
+    I = [currents[name] + gNa * m[i] ** 3 * h[i] * (eNa - V[i]) + gK * n[i] ** 4 * (eK - V[i]) + gL * (eL - V[i])
+         for i, name in enumerate(names)]
+    for j, (pre, post, receptor) in enumerate(syns):
+        p, q = receptors[receptor], names.index(post)
+        T = release['Tmax'] / (1 + np.exp(-(V[names.index(pre)] - release['Vp']) / release['Kp']))
+        dy[4 * N + j] = p['alpha'] * T * (1 - r[j]) - p['beta'] * r[j]
+        I[q] = I[q] + g[receptor] * mgBlock(V[q], p['mg']) * r[j] * (p['e'] - V[q])
+    for i in range(N):
+        dy[4 * i] = I[i] / C
+    return dy
+
+
+def dmsi_network(t, y, I_driver, I_master, I_slave, I_interneuron, g=None, motif='DMSI'):
+    """Right-hand side for solve_ivp, with the argument order of the ASDS_matias2011 scripts"""
+    currents = dict(zip(neurons, [I_driver, I_master, I_slave, I_interneuron]))
+    return derivatives(np.asarray(y), currents, g or cfgConductances(), motif)
+
+
+def cfgCurrents(cfg=None):
+    if cfg is None:
+        return {'Driver': 280.0, 'Master': 280.0, 'Slave': 280.0, 'Interneuron': 280.0}
+    return {name: getattr(cfg, 'I' + name) for name in neurons}
+
+
+def cfgConductances(cfg=None):
+    if cfg is None:
+        return {'AMPA': 10.0, 'NMDA': 10.0, 'GABA': 40.0}
+    return {receptor: getattr(cfg, 'g' + receptor) for receptor in receptors}
+
+
+def simulate(currents=None, g=None, motif='DMSI', duration=1000.0, step=0.1, rtol=1e-8, atol=1e-8):
+    """SciPy reference: (t, {neuron: V trace}) sampled every step ms"""
+    from scipy.integrate import solve_ivp
+
+    currents, g = currents or cfgCurrents(), g or cfgConductances()
+    t = np.arange(0, duration + step / 2, step)
+    sol = solve_ivp(lambda t, y: derivatives(y, currents, g, motif), (0, duration), initialState(motif),
+                    t_eval=t, method='LSODA', rtol=rtol, atol=atol)
+    return sol.t, {name: sol.y[4 * i] for i, name in enumerate(motifNeurons(motif))}
+
+
+def spikeTimes(t, V, threshold=50.0):
+    """Upward threshold crossings, linearly interpolated between samples"""
+    V = np.asarray(V)
+    i = np.nonzero((V[:-1] < threshold) & (V[1:] >= threshold))[0]
+    return t[i] + (threshold - V[i]) * (t[i + 1] - t[i]) / (V[i + 1] - V[i])
+
+
+def spikeLag(masterSpikes, slaveSpikes):
+    """Mean time from each master spike to the nearest slave spike (ms): > 0 DS, < 0 AS; nan without spikes"""
+    if len(masterSpikes) == 0 or len(slaveSpikes) == 0:
+        return float('nan')
+    diffs = slaveSpikes[None, :] - np.asarray(masterSpikes)[:, None]
+    return float(np.mean(diffs[np.arange(len(diffs)), np.argmin(np.abs(diffs), axis=1)]))
+
+
+def _noiseIncrements(generators, shape, noise, dt, sigma, rate, charge):
+    """V increments (mV) of the input noise for the next shape = (steps, neurons), one generator per realisation"""
+    if noise == 'gaussian':
+        draws = [gen.standard_normal(shape) for gen in generators]
+        scale = sigma * np.sqrt(dt) / C
+    elif noise == 'poisson':
+        draws = [gen.poisson(rate * 1e-3 * dt, shape) for gen in generators]
+        scale = charge / C
+    else:
+        raise ValueError("noise must be 'gaussian' or 'poisson', not %r" % noise)
+    return scale * np.stack(draws, axis=-1)
+
+
+def ensemble(trials=1000, currents=None, g=None, motif='DMSI', duration=1000.0, transient=200.0, dt=0.01,
+             noise='gaussian', sigma=20.0, rate=2000.0, charge=5.0, seed=1, chunk=1000, threshold=50.0):
+    """
+    Stochastic ensemble: trials noisy realisations of the motif advanced together by Euler-Maruyama with
+    step dt (ms), the realisations along the trailing axis of derivatives(). Every neuron gets its own
+    input noise, added to its constant current:
+
+        'gaussian'  white noise of intensity sigma (pA ms^1/2), dV = f dt + sigma/C dW
+        'poisson'   shot noise, pulses at rate (Hz) each delivering charge (fC = pA ms); mean rate*charge/1000 pA
+
+    Realisation i draws from its own stream, SeedSequence(seed).spawn(trials)[i], so its trajectory does not
+    depend on the ensemble size. Noise is drawn chunk steps at a time. Returns, over [transient, duration],
+    {'lag': Master->Slave lag per realisation (ms, nan without spikes), 'rates': {neuron: rate per realisation (Hz)}}.
+    """
+    currents, g = currents or cfgCurrents(), g or cfgConductances()
+    names = motifNeurons(motif)
+    N = len(names)
+    generators = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(trials)]
+    y = initialState(motif, (trials,))
+    Vprev = y[0:4 * N:4].copy()
+
+    steps = int(round(duration / dt))
+    spikes = []  # (realisation, neuron, time) of the threshold crossings of every step
+    for start in range(0, steps, chunk):
+        dV = _noiseIncrements(generators, (min(chunk, steps - start), N), noise, dt, sigma, rate, charge)
+        for k in range(len(dV)):
+            y += dt * derivatives(y, currents, g, motif)
+            y[0:4 * N:4] += dV[k]
+            V = y[0:4 * N:4]
+            neuron, trial = np.nonzero((Vprev < threshold) & (V >= threshold))
+            if len(neuron):
+                Va, Vb = Vprev[neuron, trial], V[neuron, trial]
+                spikes.append((trial, neuron, (start + k + (threshold - Va) / (Vb - Va)) * dt))
+            Vprev[:] = V
+
+    trial, neuron, t = (np.concatenate(column) for column in zip(*spikes)) if spikes else (np.zeros(0, int),) * 3
+    keep = t >= transient
+    trial, neuron, t = trial[keep], neuron[keep], t[keep]
+    counts = np.zeros((N, trials))
+    np.add.at(counts, (neuron, trial), 1)
+    master, slave = names.index('Master'), names.index('Slave')
+    lag = np.array([spikeLag(np.sort(t[(trial == i) & (neuron == master)]), np.sort(t[(trial == i) & (neuron == slave)]))
+                    for i in range(trials)])
+    return {'lag': lag, 'rates': {name: counts[i] / ((duration - transient) / 1000.0) for i, name in enumerate(names)}}
+
+
+def lagSummary(lag):
+    """Distribution of ensemble lags: mean, sd and quartiles (ms) of the realisations with spikes, and the
+    fractions of AS (lag < 0), DS (lag > 0) and silent (nan) realisations"""
+    lag = np.asarray(lag)
+    valid = lag[~np.isnan(lag)]
+    quartiles = np.percentile(valid, [25, 50, 75]).tolist() if len(valid) else [float('nan')] * 3
+    return {'mean': float(np.mean(valid)) if len(valid) else float('nan'),
+            'sd': float(np.std(valid)) if len(valid) else float('nan'),
+            'quartiles': quartiles,
+            'AS': float(np.mean(lag < 0)), 'DS': float(np.mean(lag > 0)), 'silent': float(np.mean(np.isnan(lag)))}
+
+
+def runNetPyNE(cfg, netParamsFile='src/netParamsDMSI.py'):
+    """Single-neuron NetPyNE run of cfg: (t, {neuron: V trace})"""
+    from netpyne import sim
+
+    import build
+    import netUpdate
+
+    netParams = netUpdate.loadNetParams(cfg, netParamsFile)
+    build.createNetwork(cfg, netParams)
+    sim.runSim()
+    sim.gatherData()
+    traces = sim.allSimData['V_soma']
+    first = 0
+    V = {}
+    for pop, params in netParams.popParams.items():
+        V[pop] = np.array(traces['cell_%d' % first])
+        first += params['numCells']
+    t = np.arange(len(V[pop])) * cfg.recordStep
+    sim.clearAll()
+    return t, V
+
+
+def crossCheck(cfgFile='src/cfgDMSI.py', netParamsFile='src/netParamsDMSI.py', duration=500.0, tolerance=0.5):
+    """
+    Compare the NetPyNE motif (one cell per population, no background input) with the SciPy reference:
+    spike counts, the largest spike time difference (ms) and the RMS difference of V (mV) per neuron.
+    Saved as <saveFolder>/<simLabel>_crossCheck.json.
+    """
+    cfg = runpy.run_path(cfgFile)['cfg']
+    cfg.popSize, cfg.bkgRate, cfg.duration = 1, 0, duration
+    cfg.recordCells, cfg.recordStep = ['all'], cfg.dt
+    cfg.recordProfile = dict(cfg.recordProfile, cellsPerPop=None, step=None)
+    cfg.popLag = dict(cfg.popLag, enabled=False)
+    cfg.simLabel += '_crossCheck'
+
+    tN, VN = runNetPyNE(cfg, netParamsFile)
+    tS, VS = simulate(cfgCurrents(cfg), cfgConductances(cfg), cfg.motif, duration, cfg.recordStep)
+    n = min(len(tN), len(tS))
+
+    result = {'passed': True, 'neurons': {}}
+    for name in motifNeurons(cfg.motif):
+        spikesN, spikesS = spikeTimes(tN[:n], VN[name][:n]), spikeTimes(tS[:n], VS[name][:n])
+        k = min(len(spikesN), len(spikesS))
+        maxDiff = float(np.max(np.abs(spikesN[:k] - spikesS[:k]))) if k else 0.0
+        passed = len(spikesN) == len(spikesS) and maxDiff <= tolerance
+        result['neurons'][name] = {'spikesNEURON': len(spikesN), 'spikesSciPy': len(spikesS), 'maxSpikeDiff': maxDiff,
+                                   'rmsV': float(np.sqrt(np.mean((VN[name][:n] - VS[name][:n]) ** 2))), 'passed': passed}
+        result['passed'] = result['passed'] and passed
+        print('  %-12s spikes %3d NEURON / %3d SciPy, max spike time difference %.3f ms, V rms %.2f mV %s' %
+              (name, len(spikesN), len(spikesS), maxDiff, result['neurons'][name]['rmsV'], 'ok' if passed else 'MISMATCH'))
+    result['lag'] = {'NEURON': spikeLag(spikeTimes(tN[:n], VN['Master'][:n]), spikeTimes(tN[:n], VN['Slave'][:n])),
+                     'SciPy': spikeLag(spikeTimes(tS[:n], VS['Master'][:n]), spikeTimes(tS[:n], VS['Slave'][:n]))}
+    print('  Master->Slave lag: %.3f ms NEURON, %.3f ms SciPy' % (result['lag']['NEURON'], result['lag']['SciPy']))
+
+    os.makedirs(cfg.saveFolder, exist_ok=True)
+    with open(os.path.join(cfg.saveFolder, cfg.simLabel + '.json'), 'w') as fileObj:
+        json.dump(result, fileObj, indent=2)
+    return result
+
+
+def runEnsemble(cfgFile='src/cfgDMSI.py', trials=None):
+    """ensemble() of the motif of cfgFile with cfg.ensemble options, saved as <saveFolder>/<simLabel>_ensemble.json"""
+    cfg = runpy.run_path(cfgFile)['cfg']
+    options = dict(cfg.ensemble, trials=trials or cfg.ensemble['trials'])
+    result = ensemble(currents=cfgCurrents(cfg), g=cfgConductances(cfg), motif=cfg.motif, duration=cfg.duration,
+                      transient=cfg.transient, **options)
+    summary = lagSummary(result['lag'])
+    print('  %d realisations, %s noise: Master->Slave lag %.3f +- %.3f ms, AS %.1f%% DS %.1f%% silent %.1f%%' %
+          (options['trials'], options['noise'], summary['mean'], summary['sd'], 100 * summary['AS'],
+           100 * summary['DS'], 100 * summary['silent']))
+
+    os.makedirs(cfg.saveFolder, exist_ok=True)
+    with open(os.path.join(cfg.saveFolder, cfg.simLabel + '_ensemble.json'), 'w') as fileObj:
+        json.dump({'options': options, 'summary': summary, 'lag': result['lag'].tolist(),
+                   'rates': {name: rates.tolist() for name, rates in result['rates'].items()}}, fileObj)
+    return result
+
+
+if __name__ == '__main__':
+    import sys
+    if sys.argv[1:2] == ['ensemble']:
+        runEnsemble(trials=int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    else:
+        result = crossCheck()
+        sys.exit(0 if result['passed'] else 1)
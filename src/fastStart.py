@@ -0,0 +1,152 @@
+"""
+fastStart.py
+
+Fast startup driven by index.npjson (mod_folder, simConfig, netParams):
+
+    mechanisms  compiled once per content hash of the .mod files into <cache>/mech_<hash>/ and loaded
+                with nrn_load_dll, so runs and batch jobs share one build and only recompile when a
+                .mod file changes (skipped if the mechanisms were already loaded, e.g. from ./x86_64)
+    cfg         a cfg .py file is executed once and snapshotted as <cache>/cfg_<hash>.json, keyed on its
+                content and that of its sibling modules (cfgDMSI.py builds on cfg.py); a cfg .json (batch
+                jobs) is loaded directly
+    netParams   snapshotted as <cache>/netParams_<hash>_rank<r>.json, keyed on the netParams source (and
+                the sibling modules it imports), the cfg values and the MPI layout, and loaded from JSON
+                instead of executing netParams.py again
+
+simConfig=... and netParams=... on the command line override the index entries, as in readCmdLineArgs.
+
+Usage (from the repository root):
+    python src/init.py                      # uses index.npjson when it exists
+"""
+
+import os
+import re
+import sys
+import glob
+import json
+import runpy
+import shutil
+import hashlib
+import subprocess
+
+from netpyne import sim
+
+import netUpdate
+
+indexFileDefault = 'index.npjson'
+cacheFolder = 'data/fastStart'
+
+
+def _hash(*chunks):
+    sha = hashlib.sha1()
+    for chunk in chunks:
+        sha.update(chunk if isinstance(chunk, bytes) else chunk.encode())
+    return sha.hexdigest()[:16]
+
+
+def _read(filename):
+    with open(filename, 'rb') as fileObj:
+        return fileObj.read()
+
+
+def _ranks():
+    """(rank, nhosts) before sim.initialize() has set sim.rank and sim.nhosts"""
+    from neuron import h
+    pc = h.ParallelContext()
+    return int(pc.id()), int(pc.nhost())
+
+
+def cmdLineArg(name):
+    for arg in sys.argv[1:]:
+        if arg.startswith(name + '='):
+            return arg.split('=', 1)[1]
+
+
+def modHash(modFolder):
+    """Hash of the names and contents of all .mod files in modFolder"""
+    files = sorted(glob.glob(os.path.join(modFolder, '*.mod')))
+    return _hash(*[os.path.basename(f).encode() + _read(f) for f in files])
+
+
+def _mechNames(modFolder):
+    names = []
+    for filename in glob.glob(os.path.join(modFolder, '*.mod')):
+        names += re.findall(r'^\s*(?:POINT_PROCESS|ARTIFICIAL_CELL|SUFFIX)\s+(\w+)', _read(filename).decode(), re.M)
+    return names
+
+
+def _mechLibrary(folder):
+    libs = glob.glob(os.path.join(folder, '*', '.libs', 'libnrnmech.so')) + glob.glob(os.path.join(folder, '*', 'libnrnmech.so'))
+    return libs[0] if libs else None
+
+
+def loadMechanisms(modFolder, cache=cacheFolder):
+    """Load the mechanisms of modFolder from the cache, compiling them first if their hash is new"""
+    from neuron import h
+
+    names = _mechNames(modFolder)
+    if names and all(hasattr(h, name) for name in names):
+        return None  # already loaded (compiled in the working directory)
+
+    folder = os.path.join(cache, 'mech_' + modHash(modFolder))
+    if _mechLibrary(folder) is None:
+        # build in a private folder and rename it, so concurrent jobs never load a half-built library
+        tmp = '%s.tmp%d' % (folder, os.getpid())
+        shutil.rmtree(tmp, ignore_errors=True)
+        shutil.copytree(modFolder, tmp)
+        subprocess.check_call(['nrnivmodl'], cwd=tmp, stdout=subprocess.DEVNULL)
+        try:
+            os.rename(tmp, folder)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)  # another job finished first
+        if _ranks()[0] == 0:
+            print('  Compiled mechanisms %s into %s' % (modFolder, folder))
+    h.nrn_load_dll(_mechLibrary(folder))
+    return folder
+
+
+def _save(filename, data):
+    tmp = '%s.tmp%d' % (filename, os.getpid())
+    with open(tmp, 'w') as fileObj:
+        json.dump(data, fileObj, default=str)
+    os.replace(tmp, filename)
+
+
+def loadCfg(cfgFile, cache=cacheFolder):
+    if cfgFile.endswith('.json'):
+        return sim.loadSimCfg(cfgFile, setLoaded=False)
+    siblings = sorted(glob.glob(os.path.join(os.path.dirname(cfgFile) or '.', '*.py')))
+    snapshot = os.path.join(cache, 'cfg_%s.json' % _hash(_read(cfgFile), *[_read(f) for f in siblings]))
+    if os.path.exists(snapshot):
+        return sim.loadSimCfg(snapshot, setLoaded=False)
+    cfg = runpy.run_path(cfgFile)['cfg']
+    _save(snapshot, {'simConfig': cfg.__dict__})
+    return cfg
+
+
+def netParamsKey(cfg, netParamsFile):
+    folder = os.path.dirname(netParamsFile) or '.'
+    sources = [_read(f) for f in sorted(glob.glob(os.path.join(folder, '*.py')))]  # netParams imports its siblings
+    return _hash(_read(netParamsFile), *sources + [json.dumps(cfg.__dict__, sort_keys=True, default=str),
+                                                   str(_ranks()[1])])
+
+
+def loadNetParams(cfg, netParamsFile, cache=cacheFolder):
+    snapshot = os.path.join(cache, 'netParams_%s_rank%d.json' % (netParamsKey(cfg, netParamsFile), _ranks()[0]))
+    if os.path.exists(snapshot):
+        return sim.loadNetParams(snapshot, setLoaded=False)
+    netParams = netUpdate.loadNetParams(cfg, netParamsFile)
+    _save(snapshot, {'net': {'params': netParams.todict()}})
+    return netParams
+
+
+def load(indexFile=indexFileDefault, cache=cacheFolder):
+    """(cfg, netParams) for the model described by indexFile, using the mechanism and snapshot caches"""
+    with open(indexFile) as fileObj:
+        index = json.load(fileObj)
+    os.makedirs(cache, exist_ok=True)
+    if index.get('mod_folder'):
+        loadMechanisms(index['mod_folder'], cache)
+    cfg = loadCfg(cmdLineArg('simConfig') or index['simConfig'], cache)
+    netParams = loadNetParams(cfg, cmdLineArg('netParams') or index['netParams'], cache)
+    return cfg, netParams
@@ -1,6 +1,29 @@
+"""
+init.py
+
+Build, simulate and analyze the Sender/Receiver network.
+
+Usage (from the repository root):
+    python src/init.py                                       # uses src/cfg.py and src/netParams.py
+    python src/init.py simConfig=<cfg.json> netParams=<netParams.py>
+
+With index.npjson in the working directory, mechanisms, cfg and netParams are loaded through the caches
+of fastStart.py.
+"""
+
+import os
+
 from netpyne import sim  # import netpyne init module
 
-# cfg, netParams = sim.loadFromIndexFile('index.npjson')
-# read cfg and netParams from command line arguments if available; otherwise use default
-simConfig, netParams = sim.readCmdLineArgs(simConfigDefault='src/cfg.py', netParamsDefault='src/params.py')
-sim.createSimulateAnalyze(netParams = netParams, simConfig = cfg)  # create and simulate network
\ No newline at end of file
+import build
+import fastStart
+
+if os.path.exists(fastStart.indexFileDefault):
+    cfg, netParams = fastStart.load()  # cached mechanisms and cfg/netParams snapshots, driven by index.npjson
+else:
+    # read cfg and netParams from command line arguments if available; otherwise use default
+    cfg, netParams = sim.readCmdLineArgs(simConfigDefault='src/cfg.py', netParamsDefault='src/netParams.py')
+
+netParams, postTransient = build.prepareNetParams(cfg, netParams)  # transient values, replicas
+build.createNetwork(cfg, netParams)  # cells, connections, stims and recordings
+build.runNetwork(postTransient)      # run, gather, analyze, save and plot
@@ -0,0 +1,96 @@
+"""
+inprocessBatch.py
+
+In-process batch backend: the network is built once per group of grid points that share the same
+structure (convergence, seeds, recording and saving options, ...), and for every point in the group
+only weights, delays and NetStim parameters are changed in place (see netUpdate.py) before the network
+is re-initialised and simulated again in the same process, with the run steps of init.py (see build.py).
+Output files and labels match those of the NetPyNE and local backends. With cfg.replicas every point is
+built on its own.
+
+Usage (from the repository root):
+    python src/batch.py inprocess
+"""
+
+import json
+import time
+import runpy
+from collections import OrderedDict
+
+from neuron import h
+from netpyne import sim
+
+import build
+import fastStart
+import netUpdate
+import instrumentation
+from localBatch import gridJobs
+
+# Parameters that can be changed on an instantiated network; any other parameter defines a new build
+inPlaceParams = ['weightEE', 'weightEI', 'weightIE', 'weightII', 'delay', 'bkgRate', 'bkgNoise',
+                 'bkgSenderE', 'bkgSenderI', 'bkgReceiverE', 'bkgReceiverI']
+modFolder = 'mod'
+
+
+def groupJobs(params, batchLabel, inPlace=inPlaceParams):
+    """Group grid points by the values of their structural (not in-place) parameters"""
+    groups = OrderedDict()
+    for label, jobParams in gridJobs(params, batchLabel):
+        structural = {name: value for name, value in jobParams.items() if name not in inPlace}
+        key = json.dumps(structural, sort_keys=True, default=str)
+        groups.setdefault(key, (structural, []))[1].append((label, jobParams))
+    return list(groups.values())
+
+
+def buildNetwork(cfgFile, netParamsFile, structural, firstParams, saveFolder):
+    """Build the network of a group; returns the post-transient values of cfg (None without checkpointing)"""
+    cfg = runpy.run_path(cfgFile)['cfg']
+    netUpdate.setCfgParams(cfg, structural)
+    netUpdate.setCfgParams(cfg, firstParams)
+    cfg.saveFolder = saveFolder
+    netParams = netUpdate.loadNetParams(cfg, netParamsFile)
+    netParams, postTransient = build.prepareNetParams(cfg, netParams, netParamsFile)
+    build.createNetwork(cfg, netParams)
+    return postTransient
+
+
+def resetIzhiClocks():
+    """Izhi2007b steps u by delta = t - t0 and its INITIAL block leaves t0 alone: on a re-initialised network
+    the first step would see delta = -(end time of the previous run)"""
+    if hasattr(h, 'Izhi2007b'):
+        for izhi in h.List('Izhi2007b'):
+            izhi.t0 = 0
+
+
+def runPoint(label, jobParams, netParamsFile, postTransient=None):
+    sim.cfg.simLabel = label
+    params = {name: value for name, value in jobParams.items() if name in inPlaceParams}
+    if postTransient is not None:
+        # the transient is integrated with the transient values; the point's own ones are applied after it
+        postTransient = dict(postTransient, **{name: params.pop(name) for name in list(params) if name in postTransient})
+        params.update(sim.cfg.transientCheckpoint['transientValues'])
+    netParams = netUpdate.applyParams(params, netParamsFile)
+    if postTransient is not None:
+        sim.net.params = netParams  # the checkpoint key covers this point's transient parameters
+    for key in ['spkt', 'spkid']:
+        sim.simData[key].resize(0)  # spikes of the previous point
+    # preRun adds its FInitializeHandlers again; the previous point's would re-run on finitialize
+    sim.fih = [h.FInitializeHandler(0, resetIzhiClocks)]
+    build.runNetwork(postTransient, netParamsFile)
+
+
+def runBatch(params, cfgFile='src/cfg.py', netParamsFile='src/netParams.py', batchLabel='ASDS', saveFolder='ASDS_batch'):
+    fastStart.loadMechanisms(modFolder)  # no-op when ./x86_64 was loaded with netpyne
+    # replica rules carry suffixed labels that netUpdate.applyParams does not update: one build per point
+    inPlace = [] if runpy.run_path(cfgFile)['cfg'].replicas else inPlaceParams
+    groups = groupJobs(params, batchLabel, inPlace)
+    numJobs = sum(len(jobs) for _, jobs in groups)
+    print('Running %d jobs in %d network builds' % (numJobs, len(groups)))
+    start = time.time()
+    for structural, jobs in groups:
+        postTransient = buildNetwork(cfgFile, netParamsFile, structural, jobs[0][1], saveFolder)
+        for label, jobParams in jobs:
+            runPoint(label, jobParams, netParamsFile, postTransient)
+        sim.clearAll()  # free the NEURON objects of this build before the next one
+    print('Batch done in %.1f s' % (time.time() - start))
+    instrumentation.aggregate(saveFolder)
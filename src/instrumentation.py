@@ -0,0 +1,221 @@
+"""
+instrumentation.py
+
+Phase-level timing and event counts of src/init.py runs, beyond the coarse totals of cfg.timing.
+
+Every step of a run (network build steps in build.py, init, psolve, gather, save, plot) is timed on
+each rank with phase(); with cfg.instrumentation['enabled'] the run also counts:
+
+    conns   NetCon events delivered per connParams rule (presynaptic spikes x NetCons of the rule)
+    stims   NetStim events generated and delivered per stimTargetParams rule
+    rss     peak resident memory (MB) of the ranks
+
+The report (phase times as max and mean over ranks, counts summed over ranks) is saved by rank 0 as
+<saveFolder>/<simLabel>_instrumentation.json, and aggregate() collects the reports of a batch folder
+into one CSV.
+
+Usage (from the repository root):
+    python src/instrumentation.py ASDS_batch    # writes ASDS_batch/instrumentation.csv
+"""
+
+import os
+import csv
+import json
+import time
+import argparse
+import resource
+from contextlib import contextmanager
+from collections import OrderedDict
+
+import numpy as np
+
+import spikeStream
+
+phases = OrderedDict()  # phase name -> wall time (s) on this rank
+_stimCounters = []      # (stimTarget label, event time vector, NetCons driven, counting NetCon) per local NetStim
+
+
+@contextmanager
+def phase(name):
+    """Time the enclosed block as phase name (a phase run again, e.g. by a batch point, is overwritten)"""
+    start = time.time()
+    try:
+        yield
+    finally:
+        phases[name] = time.time() - start
+
+
+def reset():
+    """Forget the phases and NetStim counters of a previous run in this process (e.g. a worker's last job)"""
+    phases.clear()
+    del _stimCounters[:]  # their NetCons would keep the NetStims of a cleared network alive
+
+
+def _stimRule(netParams, cell):
+    for label, target in netParams.stimTargetParams.items():
+        if target['conds'].get('pop') == cell.tags['pop']:
+            return label
+
+
+def countStims(sim):
+    """Record the events of every local NetStim (call after sim.net.addStims(), before leanNet.compact())"""
+    from neuron import h
+
+    del _stimCounters[:]
+    for cell in sim.net.cells:
+        netStims = [stim for stim in cell.stims if stim.get('type') == 'NetStim' and 'hObj' in stim]
+        if not netStims:
+            continue
+        fanout = sum(conn.get('preGid') == 'NetStim' for conn in cell.conns) / float(len(netStims))
+        for stim in netStims:
+            netcon = h.NetCon(stim['hObj'], None)
+            times = h.Vector()
+            netcon.record(times)  # resized to 0 by finitialize, so each run starts from an empty count
+            _stimCounters.append((stim.get('label') or _stimRule(sim.net.params, cell), times, fanout, netcon))
+
+
+def _connPreGids(sim):
+    """{connParams label: presynaptic gid of every local NetCon of the rule}"""
+    netParams = sim.net.params
+    if hasattr(sim.net, 'connTable'):
+        table = sim.net.connTable
+        return {label: table['pre'][table['rule'] == i] for i, label in enumerate(table['rules'])
+                if label in netParams.connParams}
+    preGids = {label: [] for label in netParams.connParams}
+    for cell in sim.net.cells:
+        for conn in cell.conns:
+            if conn.get('preGid') != 'NetStim' and conn.get('label') in preGids:
+                preGids[conn['label']].append(conn['preGid'])
+    return {label: np.asarray(gids, dtype=np.int64) for label, gids in preGids.items()}
+
+
+def _allreduce(sim, values, op=1):
+    """Element-wise sum (op=1) or max (op=2) of a list of numbers over ranks"""
+    from neuron import h
+
+    vec = h.Vector(np.asarray(values, dtype=float))
+    if sim.nhosts > 1:
+        sim.pc.allreduce(vec, op)
+    return list(vec)
+
+
+def countEvents(sim):
+    """Event counts per connParams and stimTargetParams rule, summed over ranks (call before sim.gatherData())"""
+    numCells = sum(pop['numCells'] for pop in sim.net.params.popParams.values())
+    if sim.cfg.spikeStream['enabled']:
+        spikes = spikeStream.spikeCounts.astype(float)  # the spike vectors are emptied after every chunk
+    else:
+        spkid = sim.simData['spkid'].as_numpy().astype(np.int64)  # local spikes, before gathering
+        spikes = np.bincount(spkid, minlength=numCells).astype(float)
+    spikes = np.asarray(_allreduce(sim, spikes))  # spikes of every gid, from the ranks that own them
+
+    connLabels = list(sim.net.params.connParams)
+    stimLabels = list(sim.net.params.stimTargetParams)
+    preGids = _connPreGids(sim)
+    conns = [spikes[preGids.get(label, np.zeros(0, dtype=np.int64))].sum() for label in connLabels]
+    generated, delivered = np.zeros(len(stimLabels)), np.zeros(len(stimLabels))
+    for label, times, fanout, _ in _stimCounters:
+        if label in stimLabels:
+            generated[stimLabels.index(label)] += times.size()
+            delivered[stimLabels.index(label)] += times.size() * fanout
+
+    totals = _allreduce(sim, conns + list(generated) + list(delivered))
+    n, m = len(connLabels), len(stimLabels)
+    return {'spikes': int(spikes.sum()),
+            'conns': {label: int(value) for label, value in zip(connLabels, totals[:n])},
+            'stims': {label: {'generated': int(g), 'delivered': int(d)}
+                      for label, g, d in zip(stimLabels, totals[n:n + m], totals[n + m:])}}
+
+
+def peakRSS():
+    """Peak resident memory of this process, in MB (ru_maxrss is in kB on Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def reportFile(cfg):
+    return os.path.join(cfg.saveFolder, cfg.simLabel + '_instrumentation.json')
+
+
+def report(sim, events=None):
+    """Combine the phase times and memory of all ranks with the event counts; rank 0 saves and returns it"""
+    names = list(phases)
+    times = [phases[name] for name in names]
+    maxTimes, sumTimes = _allreduce(sim, times + [peakRSS()], 2), _allreduce(sim, times + [peakRSS()])
+    if sim.rank != 0:
+        return
+
+    cfg = sim.cfg
+    runTime = maxTimes[names.index('psolve')] if 'psolve' in names else float('nan')
+    data = {'simLabel': cfg.simLabel,
+            'nhosts': sim.nhosts,
+            'numCells': sum(pop['numCells'] for pop in sim.net.params.popParams.values()),
+            'duration': cfg.duration,
+            'params': {name: getattr(cfg, name, None) for name in ['convergence', 'bkgRate', 'bkgNoise', 'scale']},
+            'phases': OrderedDict((name, {'max': maxTimes[i], 'mean': sumTimes[i] / sim.nhosts})
+                                  for i, name in enumerate(names)),
+            'simMsPerSecond': cfg.duration / runTime if runTime > 0 else float('nan'),
+            'peakRSS': {'max': maxTimes[-1], 'total': sumTimes[-1]},
+            'events': events or {}}
+    filename = reportFile(cfg)
+    os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+    with open(filename, 'w') as fileObj:
+        json.dump(data, fileObj, indent=2)
+    print('  Instrumentation: %s (%s; peak RSS %.0f MB)' %
+          (filename, ', '.join('%s %.2fs' % (name, maxTimes[i]) for i, name in enumerate(names)), maxTimes[-1]))
+    return data
+
+
+def flatten(data):
+    """One CSV row from a report: params, phase max times, event totals and memory"""
+    row = OrderedDict([('simLabel', data['simLabel']), ('nhosts', data['nhosts']), ('numCells', data['numCells']),
+                       ('duration', data['duration'])])
+    row.update(data['params'])
+    for name, values in data['phases'].items():
+        row['t_' + name] = values['max']
+    row['simMsPerSecond'] = data['simMsPerSecond']
+    row['peakRSS'] = data['peakRSS']['max']
+    events = data.get('events') or {}
+    if events:
+        row['spikes'] = events['spikes']
+        row['connEvents'] = sum(events['conns'].values())
+        row['stimEvents'] = sum(stim['delivered'] for stim in events['stims'].values())
+        for label, value in events['conns'].items():
+            row['conn ' + label] = value
+        for label, value in events['stims'].items():
+            row['stim ' + label] = value['delivered']
+    return row
+
+
+def aggregate(folder, out=None):
+    """Collect every <label>_instrumentation.json of a batch folder into one CSV; return the rows"""
+    rows = []
+    for name in sorted(os.listdir(folder)):
+        if name.endswith('_instrumentation.json'):
+            with open(os.path.join(folder, name)) as fileObj:
+                rows.append(flatten(json.load(fileObj)))
+    if not rows:
+        print('No instrumentation reports found in %s' % folder)
+        return rows
+
+    columns = []
+    for row in rows:
+        columns += [key for key in row if key not in columns]
+    out = out or os.path.join(folder, 'instrumentation.csv')
+    with open(out, 'w', newline='') as fileObj:
+        writer = csv.DictWriter(fileObj, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print('%d jobs -> %s' % (len(rows), out))
+    for key in [column for column in columns if column.startswith('t_')] + ['simMsPerSecond', 'peakRSS']:
+        values = np.array([row.get(key, np.nan) for row in rows], dtype=float)
+        print('  %-20s mean %10.3f  max %10.3f' % (key, np.nanmean(values), np.nanmax(values)))
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Aggregate the instrumentation reports of a batch folder')
+    parser.add_argument('folder', nargs='?', default='ASDS_batch')
+    parser.add_argument('--out', default=None, help='output CSV (default: <folder>/instrumentation.csv)')
+    args = parser.parse_args()
+    aggregate(args.folder, args.out)
@@ -0,0 +1,73 @@
+"""
+leanNet.py
+
+Lean memory mode: once the NEURON objects exist, the per-connection Python dicts of every cell are
+replaced by one compact, array-backed connection table per rank, sim.net.connTable:
+
+    'pre'     int32    presynaptic gid (-1 for NetStim inputs)
+    'post'    int32    postsynaptic gid
+    'weight'  float32  NetCon weight
+    'delay'   float32  NetCon delay (ms)
+    'mech'    int16    index into connTable['mechs'] (synMechParams labels)
+    'rule'    int16    index into connTable['rules'] (connParams labels, then stimTargetParams labels)
+
+The NetCons themselves are kept alive in sim.net.netcons (same order as the table), so the network
+keeps running, spikes are still recorded, and netUpdate.applyParams() can still change weights and
+delays in place. Cell sections, point processes and NetStims are kept as they are, and so are the dicts
+of pointer connections (graded synapses without a NetCon, see netParamsDMSI.py).
+"""
+
+import numpy as np
+
+
+def _stimRule(netParams, cell):
+    for label, target in netParams.stimTargetParams.items():
+        if target['conds'].get('pop') == cell.tags['pop']:
+            return label
+
+
+def compact(sim):
+    """Build sim.net.connTable and drop the per-cell connection dicts (call after sim.setupRecording())"""
+    netParams = sim.net.params
+    mechs = list(netParams.synMechParams)
+    rules = list(netParams.connParams) + list(netParams.stimTargetParams)
+    ruleIds = {label: i for i, label in enumerate(rules)}
+
+    numConns = sum(1 for cell in sim.net.cells for conn in cell.conns if 'pointer' not in conn)
+    table = {'pre': np.empty(numConns, dtype=np.int32), 'post': np.empty(numConns, dtype=np.int32),
+             'weight': np.empty(numConns, dtype=np.float32), 'delay': np.empty(numConns, dtype=np.float32),
+             'mech': np.empty(numConns, dtype=np.int16), 'rule': np.empty(numConns, dtype=np.int16)}
+    netcons = []
+    i = 0
+    for cell in sim.net.cells:
+        stimRule = _stimRule(netParams, cell)
+        for conn in cell.conns:
+            if 'pointer' in conn:
+                continue
+            isStim = conn.get('preGid') == 'NetStim'
+            table['pre'][i] = -1 if isStim else conn['preGid']
+            table['post'][i] = cell.gid
+            table['weight'][i] = conn['weight']
+            table['delay'][i] = conn['delay']
+            table['mech'][i] = mechs.index(conn['synMech'])
+            table['rule'][i] = ruleIds.get(stimRule if isStim else conn.get('label'), -1)
+            netcons.append(conn['hObj'])
+            i += 1
+        cell.conns = [conn for conn in cell.conns if 'pointer' in conn]  # the NetCons are referenced from sim.net.netcons
+
+    for rule in netParams.connParams.values():
+        rule.pop('connList', None)  # vectorized/cached connectivity lists are no longer needed
+
+    table['mechs'], table['rules'] = mechs, rules
+    sim.net.connTable = table
+    sim.net.netcons = netcons
+
+    # cell dicts no longer describe the connectivity, so only gather and save simulation data. The section
+    # dicts stay: they hold the point processes and synapses that later runs of this network still simulate
+    sim.cfg.gatherOnlySimData = True
+    sim.cfg.saveCellConns = False
+    nbytes = sum(table[key].nbytes for key in ['pre', 'post', 'weight', 'delay', 'mech', 'rule'])
+    totalConns, totalBytes = sim.pc.allreduce(numConns, 1), sim.pc.allreduce(nbytes, 1)
+    if sim.rank == 0:
+        print('  Lean mode: %d connections moved to %.1f MB of tables over %d ranks' %
+              (totalConns, totalBytes / 1e6, sim.nhosts))
@@ -0,0 +1,124 @@
+"""
+loadBalance.py
+
+Distribution of cells across MPI ranks by estimated cost instead of NetPyNE's plain round-robin.
+
+The cost of a cell is cellCost plus synCost per synapse it receives (network connections times synaptic
+mechanisms, plus stim inputs). Cells are assigned longest-processing-time first: every cell goes to the
+currently least loaded rank. The partition is a deterministic function of netParams and the number of
+ranks, so every rank computes the same gid -> rank map without communication.
+
+Set cfg.loadBalance['method'] to 'cost' to use it; 'roundrobin' keeps NetPyNE's default. With 'groups',
+the populations in each entry of cfg.loadBalance['groups'] (e.g. the Sender and the Receiver populations)
+get their own contiguous set of ranks, sized by the group's share of the total cost, and are balanced by
+cost within it; only connections between groups, or within a group spread over several ranks, then cross
+ranks (see crossRankDelay.py).
+"""
+
+import heapq
+import contextlib
+
+import numpy as np
+
+
+def _numSynMechs(rule):
+    return len(rule['synMech']) if isinstance(rule.get('synMech'), list) else 1  # IClamp targets: one point process
+
+
+def cellCosts(netParams, options):
+    """Estimated cost of one cell of each population"""
+    costs = {}
+    for pop in netParams.popParams:
+        numSyns = 0
+        for rule in netParams.connParams.values():
+            if rule['postConds'].get('pop') == pop:
+                numSyns += rule.get('convergence', rule.get('inDegree', 0)) * _numSynMechs(rule)
+        for target in netParams.stimTargetParams.values():
+            if target['conds'].get('pop') == pop:
+                numSyns += _numSynMechs(target)
+        costs[pop] = options['cellCost'] + options['synCost'] * numSyns
+    return costs
+
+
+def _greedy(gids, cellCost, rankIds, ranks):
+    """Assign gids to rankIds, most expensive first, always to the least loaded rank"""
+    loads = [(0.0, rank) for rank in rankIds]
+    for gid in gids[np.argsort(-cellCost[gids], kind='stable')]:
+        load, rank = heapq.heappop(loads)
+        ranks[gid] = rank
+        heapq.heappush(loads, (load + cellCost[gid], rank))
+
+
+def _groupRanks(groupCosts, nhosts):
+    """Number of ranks per group, proportional to cost, at least one each (groups share ranks if nhosts is smaller)"""
+    if nhosts < len(groupCosts):
+        return None
+    shares = np.maximum(1, np.floor(nhosts * groupCosts / groupCosts.sum()).astype(int))
+    while shares.sum() > nhosts:
+        shares[np.argmax(shares)] -= 1
+    while shares.sum() < nhosts:
+        shares[np.argmax(groupCosts / shares)] += 1
+    return shares
+
+
+def partition(netParams, options, nhosts):
+    """Rank of every gid (gids numbered contiguously, population by population)"""
+    pops = list(netParams.popParams)
+    numCells = [netParams.popParams[pop]['numCells'] for pop in pops]
+    if options['method'] == 'roundrobin' or nhosts == 1:
+        return np.arange(sum(numCells)) % nhosts
+
+    costs = cellCosts(netParams, options)
+    cellCost = np.concatenate([np.full(n, costs[pop]) for pop, n in zip(pops, numCells)])
+    popOf = np.repeat(np.arange(len(pops)), numCells)
+    ranks = np.empty(len(cellCost), dtype=np.int64)
+
+    groups = options.get('groups') if options['method'] == 'groups' else None
+    shares = _groupRanks(np.array([sum(costs[pop] * netParams.popParams[pop]['numCells'] for pop in group)
+                                   for group in groups]), nhosts) if groups else None
+    if shares is None:
+        _greedy(np.arange(len(cellCost)), cellCost, range(nhosts), ranks)
+        return ranks
+
+    firstRank = 0
+    for group, share in zip(groups, shares):
+        gids = np.flatnonzero(np.isin(popOf, [pops.index(pop) for pop in group]))
+        _greedy(gids, cellCost, range(firstRank, firstRank + share), ranks)
+        firstRank += share
+    return ranks
+
+
+@contextlib.contextmanager
+def distribution(netParams, options):
+    """Within the block, NetPyNE's Pop._distributeCells follows the partition (wrap sim.net.createPops() and
+    createCells()); the original method is restored on exit, so later builds in the process are unaffected"""
+    from netpyne import sim
+    from netpyne.network.pop import Pop
+
+    if options['method'] == 'roundrobin':
+        yield
+        return
+
+    ranks = partition(netParams, options, sim.nhosts)
+    first, gid = {}, 0
+    for pop, params in netParams.popParams.items():
+        first[pop] = gid
+        gid += params['numCells']
+
+    def _distributeCells(self, numCellsPop):
+        start = first[self.tags['pop']]
+        popRanks = ranks[start:start + numCellsPop]
+        return {rank: np.flatnonzero(popRanks == rank).tolist() for rank in range(sim.nhosts)}
+
+    if sim.rank == 0:
+        costs = cellCosts(netParams, options)
+        cellCost = np.concatenate([np.full(p['numCells'], costs[pop]) for pop, p in netParams.popParams.items()])
+        loads = np.bincount(ranks, weights=cellCost, minlength=sim.nhosts)
+        print('  Load balance (%s): max/mean estimated load %.3f' % (options['method'], loads.max() / loads.mean()))
+
+    original = Pop._distributeCells
+    Pop._distributeCells = _distributeCells
+    try:
+        yield
+    finally:
+        Pop._distributeCells = original
@@ -0,0 +1,144 @@
+"""
+localBatch.py
+
+Local batch backend: runs the grid of src/batch.py as src/init.py jobs in a pool of processes sized to
+the machine, without an MPI launcher. Jobs are started longest-first, using a cost estimate of
+convergence x bkgRate x duration, so the slowest jobs do not end up in the wall-clock tail. Job status
+and retries are kept in <saveFolder>/<batchLabel>_status.json, so an interrupted batch can be resumed.
+With prescreen, the rate model of rateModel.py predicts every point first (stored in the status file);
+points predicted silent or runaway are skipped, or run after all the others.
+
+Usage (from the repository root):
+    python src/batch.py local
+    python src/batch.py local 1 skip        # 1 thread per job, skip points predicted trivial
+"""
+
+import os
+import sys
+import json
+import time
+import runpy
+import itertools
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import netUpdate
+import instrumentation
+
+
+def gridJobs(params, batchLabel):
+    """(label, {param: value}) for every combination, labelled like NetPyNE's grid (<batchLabel>_<i>_<j>...)"""
+    names = list(params.keys())
+    for indices in itertools.product(*[range(len(params[name])) for name in names]):
+        label = '_'.join([batchLabel] + [str(i) for i, name in zip(indices, names) if len(params[name]) > 1])
+        yield label, {name: params[name][i] for i, name in zip(indices, names)}
+
+
+def jobCost(cfg):
+    """Relative cost estimate: synaptic events scale with convergence and input rate, times duration"""
+    return (1.0 + cfg.convergence) * (1.0 + cfg.bkgRate) * cfg.duration
+
+
+class StatusFile(object):
+    """Thread-safe job status table stored as JSON"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.jobs = {}
+        if os.path.exists(filename):
+            with open(filename) as fileObj:
+                self.jobs = json.load(fileObj)
+
+    def update(self, label, **fields):
+        with self.lock:
+            self.jobs.setdefault(label, {}).update(fields)
+            tmp = self.filename + '.tmp'
+            with open(tmp, 'w') as fileObj:
+                json.dump(self.jobs, fileObj, indent=2)
+            os.replace(tmp, self.filename)
+
+    def get(self, label):
+        return self.jobs.get(label, {})
+
+
+def writeJobCfg(cfgFile, params, label, saveFolder, threads):
+    """Execute cfgFile, apply the job params (including derived per-connection values) and save it as JSON"""
+    from netpyne import sim
+
+    cfg = runpy.run_path(cfgFile)['cfg']
+    netUpdate.setCfgParams(cfg, params)
+    cfg.simLabel = label
+    cfg.saveFolder = saveFolder
+    cfg.nThreads = threads
+    filename = os.path.join(saveFolder, label + '_cfg.json')
+    os.makedirs(saveFolder, exist_ok=True)
+    # cfg.save() takes the extension after the first '.', which labels such as bench_scale0.1 contain
+    sim.saveJSON(filename, {'simConfig': cfg.__dict__})
+    return cfg, filename
+
+
+def runJob(job, status, netParamsFile, script, threads, retries):
+    label, cfgFilename = job['label'], job['cfgFile']
+    env = dict(os.environ, OMP_NUM_THREADS=str(threads))
+    command = [sys.executable, script, 'simConfig=' + cfgFilename, 'netParams=' + netParamsFile]
+    logFile = os.path.join(os.path.dirname(cfgFilename), label + '.run')
+
+    for attempt in range(retries + 1):
+        status.update(label, status='running', attempts=attempt + 1, start=time.time())
+        with open(logFile, 'w') as log:
+            returncode = subprocess.call(command, stdout=log, stderr=subprocess.STDOUT, env=env)
+        status.update(label, returncode=returncode, end=time.time())
+        if returncode == 0:
+            status.update(label, status='done')
+            return True
+    status.update(label, status='failed')
+    print('  Job %s failed after %d attempts (see %s)' % (label, retries + 1, logFile))
+    return False
+
+
+def runBatch(params, cfgFile='src/cfg.py', netParamsFile='src/netParams.py', batchLabel='ASDS',
+             saveFolder='ASDS_batch', script='src/init.py', processes=None, threads=1, retries=1, skip=True,
+             prescreen=None):
+    """
+    Run every grid point of params in a local process pool.
+
+    processes: concurrent jobs (default: number of cores // threads); threads: NEURON threads per job;
+    retries: extra attempts for failed jobs; skip: do not rerun jobs already marked done;
+    prescreen: 'skip' or 'deprioritize' points the rate model (rateModel.py) predicts silent or runaway.
+    """
+    os.makedirs(saveFolder, exist_ok=True)
+    processes = processes or max(1, (os.cpu_count() or 1) // threads)
+    status = StatusFile(os.path.join(saveFolder, batchLabel + '_status.json'))
+
+    jobs, cfgs = [], []
+    for label, jobParams in gridJobs(params, batchLabel):
+        if skip and status.get(label).get('status') == 'done':
+            continue
+        cfg, cfgFilename = writeJobCfg(cfgFile, jobParams, label, saveFolder, threads)
+        jobs.append({'label': label, 'cfgFile': cfgFilename, 'cost': jobCost(cfg), 'trivial': False})
+        cfgs.append(cfg)
+        status.update(label, status='pending', cost=jobs[-1]['cost'], params=jobParams)
+
+    if prescreen and jobs:
+        import rateModel
+        for job, prediction in zip(jobs, rateModel.predict(cfgs, netParamsFile)):
+            job['trivial'] = rateModel.isTrivial(prediction)
+            status.update(job['label'], prediction=prediction)
+        if prescreen == 'skip':
+            for job in jobs:
+                if job['trivial']:
+                    status.update(job['label'], status='skipped')
+            print('  Rate model: skipping %d of %d jobs predicted silent or runaway' %
+                  (sum(job['trivial'] for job in jobs), len(jobs)))
+            jobs = [job for job in jobs if not job['trivial']]
+    jobs.sort(key=lambda job: (not job['trivial'], job['cost']), reverse=True)  # longest-first, trivial points last
+
+    print('Running %d jobs on %d processes x %d threads' % (len(jobs), processes, threads))
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=processes) as pool:
+        results = list(pool.map(lambda job: runJob(job, status, netParamsFile, script, threads, retries), jobs))
+    print('Batch done in %.1f s: %d ok, %d failed' % (time.time() - start, sum(results), len(results) - sum(results)))
+    instrumentation.aggregate(saveFolder)  # per-job phase times and event counts in one CSV
+    return status.jobs
@@ -13,19 +13,28 @@ netParams.defaultThreshold = 0.0  # spike threshold, 10 mV is NetCon default, lo
 # NETWORK PARAMETERS
 ###############################################################################
 
-# Population parameters
-netParams.popParams['SenderE'] = {'cellType': 'SenderE_Izhi', 'numCells': 400} # add dict with params for this pop
-netParams.popParams['SenderI'] = {'cellType': 'SenderI_Izhi', 'numCells': 100} # add dict with params for this pop
-netParams.popParams['ReceiverE'] = {'cellType': 'ReceiverE_Izhi', 'numCells': 400} # add dict with params for this pop
-netParams.popParams['ReceiverI'] = {'cellType': 'ReceiverI_Izhi', 'numCells': 100} # add dict with params for this pop
+# Population parameters (cfg.scale multiplies all sizes; in-degree is set by cfg.convergence, so it stays constant)
+netParams.popParams['SenderE'] = {'cellType': 'SenderE_Izhi', 'numCells': int(round(400*cfg.scale))} # add dict with params for this pop
+netParams.popParams['SenderI'] = {'cellType': 'SenderI_Izhi', 'numCells': int(round(100*cfg.scale))} # add dict with params for this pop
+netParams.popParams['ReceiverE'] = {'cellType': 'ReceiverE_Izhi', 'numCells': int(round(400*cfg.scale))} # add dict with params for this pop
+netParams.popParams['ReceiverI'] = {'cellType': 'ReceiverI_Izhi', 'numCells': int(round(100*cfg.scale))} # add dict with params for this pop
 
 # Cell parameters list
+# Izhikevich a, b, c, d get a per-cell uniform jitter of +-10% around the mean: evaluated cell by cell by
+# NetPyNE from strings, or sampled for all cells of a population at once (cfg.cellParamMethod = 'vectorized')
+izhiJitter = ('uniform', 0.9, 1.1)
+
+def jittered(mean):
+    if cfg.cellParamMethod == 'vectorized':
+        return mean
+    return '%s*uniform(%s,%s)' % (mean, izhiJitter[1], izhiJitter[2])
+
 ## SenderE cell properties (Izhi)
 SenderE_Izhi = {'secs': {}}
 SenderE_Izhi['secs']['soma'] = {'geom': {}, 'pointps': {}}                        # soma params dict
 SenderE_Izhi['secs']['soma']['geom'] = {'diam': 10.0, 'L': 10.0, 'cm': 31.831}    # soma geometry
-SenderE_Izhi['secs']['soma']['pointps']['Izhi'] = {'mod':'Izhi2007b', 'C':1, 'k':0.7, 'vr':-60, 'vt':-40, 'vpeak':35, 
-                                                   'a':'0.03*uniform(0.9,1.1)', 'b':'-2*uniform(0.9,1.1)', 'c':'-50*uniform(0.9,1.1)', 'd':'100*uniform(0.9,1.1)', 
+SenderE_Izhi['secs']['soma']['pointps']['Izhi'] = {'mod':cfg.izhiMod, 'C':1, 'k':0.7, 'vr':-60, 'vt':-40, 'vpeak':35, 
+                                                   'a':jittered(0.03), 'b':jittered(-2), 'c':jittered(-50), 'd':jittered(100), 
                                                    'celltype':1}
 netParams.cellParams['SenderE_Izhi'] = SenderE_Izhi  # add dict to list of cell properties
 
@@ -33,8 +42,8 @@ netParams.cellParams['SenderE_Izhi'] = SenderE_Izhi  # add dict to list of cell
 SenderI_Izhi = {'secs': {}}
 SenderI_Izhi['secs']['soma'] = {'geom': {}, 'pointps': {}}                        # soma params dict
 SenderI_Izhi['secs']['soma']['geom'] = {'diam': 10.0, 'L': 10.0, 'cm': 31.831}    # soma geometry
-SenderI_Izhi['secs']['soma']['pointps']['Izhi'] = {'mod':'Izhi2007b', 'C':0.2, 'k':1.0, 'vr':-55, 'vt':-40, 'vpeak':25, 
-                                                   'a':'0.2*uniform(0.9,1.1)', 'b':'-2*uniform(0.9,1.1)', 'c':'-45*uniform(0.9,1.1)', 'd':'-55*uniform(0.9,1.1)', 'celltype':5}
+SenderI_Izhi['secs']['soma']['pointps']['Izhi'] = {'mod':cfg.izhiMod, 'C':0.2, 'k':1.0, 'vr':-55, 'vt':-40, 'vpeak':25, 
+                                                   'a':jittered(0.2), 'b':jittered(-2), 'c':jittered(-45), 'd':jittered(-55), 'celltype':5}
 netParams.cellParams['SenderI_Izhi'] = SenderI_Izhi  # add dict to list of cell properties
 
 ## ReceiverE cell properties (Izhi)
@@ -43,6 +52,11 @@ netParams.cellParams['ReceiverE_Izhi'] = SenderE_Izhi  # add dict to list of cel
 ## ReceiverI cell properties (Izhi)
 netParams.cellParams['ReceiverI_Izhi'] = SenderI_Izhi  # add dict to list of cell properties
 
+## Per-population distributions of point process parameters, sampled after the cells are created (see cellDists.py)
+if cfg.cellParamMethod == 'vectorized':
+    netParams.cellParamDists = {pop: {'Izhi': {param: izhiJitter for param in ['a', 'b', 'c', 'd']}}
+                                for pop in ['SenderE', 'SenderI', 'ReceiverE', 'ReceiverI']}
+
 ###############################################################################
 ## Synaptic mechs
 ###############################################################################
@@ -150,4 +164,13 @@ netParams.connParams['SenderE->ReceiverE'] = {
     'delay': cfg.delaySERE,
     'sec': 'soma',
     'loc': 0.5,
-    'synMech': ESynMech}
\ No newline at end of file
+    'synMech': ESynMech}
+
+# Draw the convergence connectivity of all rules at once with NumPy, keeping only this rank's rows
+if cfg.connMethod == 'vectorized':
+    from neuron import h
+    import connectivity
+    import loadBalance
+    pc = h.ParallelContext()
+    ranks = loadBalance.partition(netParams, cfg.loadBalance, int(pc.nhost()))
+    connectivity.vectorizeConvergence(netParams, cfg.seeds['conn'], rank=int(pc.id()), ranks=ranks)
@@ -0,0 +1,65 @@
+from netpyne import specs
+
+try:
+    from __main__ import cfg  # import SimConfig object with params from parent module
+except:
+    from cfgDMSI import cfg
+
+import dmsi
+
+netParams = specs.NetParams()   # object of class NetParams to store the network parameters
+netParams.version = 1
+
+netParams.defaultThreshold = 50.0  # shifted HH voltage: rest near 0 mV, spikes peak near 100 mV
+###############################################################################
+# NETWORK PARAMETERS
+###############################################################################
+
+# Population parameters: one population per motif neuron (cfg.popSize cells each)
+pops = dmsi.motifNeurons(cfg.motif)
+for pop in pops:
+    netParams.popParams[pop] = {'cellType': 'HH_Matias', 'numCells': cfg.popSize}
+
+# Cell parameters: single compartment with C = 9*pi pF and the Matias HH channels (mod/hhMatias.mod)
+netParams.cellParams['HH_Matias'] = {'secs': {'soma': {
+    'geom': {'diam': dmsi.somaDiam, 'L': dmsi.somaDiam, 'cm': 1.0},
+    'mechs': {'hhMatias': {'gNa': dmsi.density(dmsi.gNa), 'gK': dmsi.density(dmsi.gK), 'gL': dmsi.density(dmsi.gL),
+                           'eNa': dmsi.eNa, 'eK': dmsi.eK, 'eL': dmsi.eL}}}}}
+
+###############################################################################
+## Synaptic mechs
+###############################################################################
+# Kinetic synapses driven by the presynaptic V every time step (graded release, mod/KinSynMatias.mod)
+for receptor, params in dmsi.receptors.items():
+    netParams.synMechParams[receptor] = dict(params, mod='KinSynMatias', **dmsi.release)
+    netParams.synMechParams[receptor]['pointerParams'] = {'target_var': 'vpre', 'bidirectional': False}
+netParams.synMechParams['bkgAMPA'] = {'mod': 'MyExp2SynBB', 'tau1': 0.05, 'tau2': 5.3, 'e': dmsi.receptors['AMPA']['e']}
+
+# Stimulation parameters: constant currents (pA -> nA) and the optional Poisson background
+for pop in pops:
+    netParams.stimSourceParams['I_' + pop] = {'type': 'IClamp', 'del': 0, 'dur': 1e9, 'amp': getattr(cfg, 'I' + pop) * 1e-3}
+    netParams.stimTargetParams['I->' + pop] = {'source': 'I_' + pop, 'conds': {'pop': pop}, 'sec': 'soma', 'loc': 0.5}
+
+if cfg.bkgRate > 0:
+    netParams.stimSourceParams['bkg'] = {'type': 'NetStim', 'rate': cfg.bkgRate, 'noise': cfg.bkgNoise}
+    for pop in pops:
+        netParams.stimTargetParams['bg->' + pop] = {'source': 'bkg', 'conds': {'pop': pop},
+                                                    'weight': cfg.bkgWeight, 'delay': 1.0, 'synMech': 'bkgAMPA'}
+
+###############################################################################
+# Setting connections
+###############################################################################
+# One rule per motif synapse; the motif conductance (nS -> uS) is split over the convergent inputs.
+# NetPyNE caps convergence at the presynaptic size - 1, so convergence >= popSize (e.g. the single-neuron
+# motif) connects all to all
+gMax = dmsi.cfgConductances(cfg)
+convergence = min(cfg.convergence, cfg.popSize)
+rule = {'probability': 1.0} if convergence == cfg.popSize else {'convergence': convergence}
+for pre, post, receptor in dmsi.motifSynapses(cfg.motif):
+    netParams.connParams['%s->%s_%s' % (pre, post, receptor)] = dict(rule, **{
+        'preConds': {'pop': pre},
+        'postConds': {'pop': post},
+        'weight': gMax[receptor] * 1e-3 / convergence,
+        'sec': 'soma',
+        'loc': 0.5,
+        'synMech': receptor})
@@ -0,0 +1,137 @@
+"""
+netUpdate.py
+
+Change synaptic weights, delays and NetStim parameters of an already instantiated network,
+using src/netParams.py as the single source of truth for how cfg values map onto connections.
+"""
+
+import sys
+import runpy
+import pickle
+import numbers
+import __main__
+
+from netpyne import sim
+
+import crossRankDelay
+
+netParamsFileDefault = 'src/netParams.py'
+
+# cfg.py copies these generic values into the per-connection ones (weightSERE, delayRIRE, ...),
+# so overriding the generic value after cfg.py has run must also override the copies
+derivedParams = {
+    'weightEE': ['weightSERE'],
+    'weightEI': ['weightSERI', 'weightRERI', 'weightSESI'],
+    'weightIE': ['weightRIRE', 'weightSISE'],
+    'weightII': ['weightRIRI', 'weightSISI'],
+    'delay': ['delaySERE', 'delaySERI', 'delayRERI', 'delayRIRE', 'delayRIRI', 'delaySISE', 'delaySESI', 'delaySISI']}
+
+
+def netParamsFile():
+    """Return the netParams file given on the command line (netParams=...), or the default one"""
+    for arg in sys.argv[1:]:
+        if arg.startswith('netParams='):
+            return arg.split('=', 1)[1]
+    return netParamsFileDefault
+
+
+def setCfgParams(cfg, params):
+    """Set cfg parameters, propagating generic values to the derived per-connection ones"""
+    for name, value in params.items():
+        setattr(cfg, name, value)
+        for derived in derivedParams.get(name, []):
+            setattr(cfg, derived, value)
+
+
+def copyParams(params):
+    """Deep copy of a cfg or netParams object (copy.deepcopy fails on NetPyNE's Dict, whose __missing__
+    creates a '__deepcopy__' key)"""
+    return pickle.loads(pickle.dumps(params))
+
+
+def loadNetParams(cfg, filename=None):
+    """Execute the netParams file against cfg and return the resulting netParams object"""
+    filename = filename or netParamsFile()
+    previous = getattr(__main__, 'cfg', None)
+    __main__.cfg = cfg  # netParams.py does 'from __main__ import cfg'
+    try:
+        return runpy.run_path(filename)['netParams']
+    finally:
+        if previous is not None:
+            __main__.cfg = previous
+
+
+def _isNumber(value):
+    return isinstance(value, numbers.Number) and not isinstance(value, bool)
+
+
+def _stimTargetLabel(netParams, cell):
+    for label, target in netParams.stimTargetParams.items():
+        if target['conds'].get('pop') == cell.tags['pop']:
+            return label
+
+
+def _applyToConnTable(netParams):
+    """Lean mode (see leanNet.py): update the NetCons listed in sim.net.connTable"""
+    table = sim.net.connTable
+    targets = list(netParams.connParams.values()) + list(netParams.stimTargetParams.values())
+    for ruleId, target in enumerate(targets):
+        weight, delay = target.get('weight'), target.get('delay')
+        for i in (table['rule'] == ruleId).nonzero()[0]:
+            if _isNumber(weight):
+                table['weight'][i] = weight
+                sim.net.netcons[i].weight[0] = weight
+            if _isNumber(delay):
+                table['delay'][i] = delay
+                sim.net.netcons[i].delay = delay
+
+
+def applyParams(params, filename=None):
+    """
+    Set params in sim.cfg and update the live network to match them, without rebuilding it.
+
+    Only numeric weights and delays of connections and stims, and NetStim rate/noise, are updated;
+    parameters that change the network structure (convergence, seeds, population sizes) are not.
+    Cross-rank delays are clamped again to cfg.minCrossRankDelay (see crossRankDelay.py). Returns the
+    netParams matching the updated cfg.
+    """
+    setCfgParams(sim.cfg, params)
+    netParams = loadNetParams(sim.cfg, filename)
+
+    if hasattr(sim.net, 'connTable'):
+        _applyToConnTable(netParams)
+
+    for cell in sim.net.cells:
+        stimLabel = _stimTargetLabel(netParams, cell)
+        for conn in cell.conns:
+            if conn.get('preGid') == 'NetStim':
+                target = netParams.stimTargetParams.get(stimLabel, {})
+            else:
+                target = netParams.connParams.get(conn.get('label'), {})
+            weight, delay = target.get('weight'), target.get('delay')
+            if 'pointer' in conn:  # graded synapse (pointerParams): hObj is the point process itself, no NetCon
+                if _isNumber(weight):
+                    conn['weight'] = weight
+                    conn['hObj'].weight = weight
+                continue
+            if _isNumber(weight):
+                conn['weight'] = weight
+                conn['hObj'].weight[0] = weight
+            if _isNumber(delay):
+                conn['delay'] = delay
+                conn['hObj'].delay = delay
+
+        for stim in cell.stims:
+            source = netParams.stimSourceParams.get(stim.get('source'))
+            if stim.get('type') != 'NetStim' or source is None or 'hObj' not in stim:
+                continue
+            if _isNumber(source.get('rate')):
+                stim['rate'] = source['rate']
+                stim['hObj'].interval = 1000.0 / source['rate']
+            if _isNumber(source.get('noise')):
+                stim['noise'] = source['noise']
+                stim['hObj'].noise = source['noise']
+
+    if sim.cfg.minCrossRankDelay:
+        crossRankDelay.enforce(sim.cfg.minCrossRankDelay, verbose=False)  # delays were reset to their netParams values
+    return netParams
@@ -0,0 +1,243 @@
+"""
+rateModel.py
+
+Mean-field model of the four Sender/Receiver populations, for pre-screening batch points before running
+the spiking network. Every parameter is read from netParams as built by src/netParams.py for the point's
+cfg (population sizes, Izhikevich parameters, synaptic kinetics, convergence, weights, delays, background
+input and spike threshold), so it follows the same cfg values as the spiking model.
+
+    synapses     every synaptic mechanism is split into exp2 kinetic components (AMPA, the fast and NMDA
+                 parts of MyExp2SynNMDABB with its Mg block, GABAA), driven by the mean event rate of
+                 the presynaptic population times convergence (plus the background NetStim rate)
+    cells        each population is a seeded sample of cellsPerPop Izhikevich cells (same equations and
+                 reset as izhi2007b.mod) starting at rest, as in the spiking run; background NetStim
+                 events are drawn as Poisson counts with their own weights, recurrent input as Gaussian
+                 fluctuations around the mean event rates
+    spikes       counted as upward crossings of netParams.defaultThreshold, which is what NetPyNE's
+                 NetCons detect: under strong drive the soma sits near the synaptic reversal (0 mV,
+                 the threshold of src/netParams.py) and its fluctuations are detected as spikes, so a
+                 shunted population is not silent. Calibrated on the grid of src/batch.py against
+                 spiking runs at cfg.scale = 0.2: regimes match at all 16 points, rates within a factor ~3
+    dynamics     tau_r dr/dt = -r + (detected spikes per cell), integrated for all batch points at once
+
+The predicted regime is 'silent' (all populations below silentRate), 'runaway' (some population above
+runawayRate) or 'active', from the rates in [cfg.transient, cfg.duration]. The lag sign is approximated by
+driving the cfg.popLag 'pre' population with a small seeded fluctuation of its background rate and taking
+the peak of the pre/post rate cross-correlation (popLag.crossCorrelation), with the sign convention of
+popLag.py.
+
+Usage (from the repository root):
+    python src/rateModel.py                 # predictions for the grid of src/batch.py
+"""
+
+import re
+import numbers
+
+import numpy as np
+
+import popLag
+
+silentRate = 0.5     # Hz
+runawayRate = 250.0  # Hz
+rateTau = 5.0        # ms
+
+
+def _mean(value):
+    """Mean of a numeric cfg/netParams value or of a NetPyNE string such as '0.03*uniform(0.9,1.1)'"""
+    if isinstance(value, numbers.Number):
+        return float(value)
+    if isinstance(value, (list, tuple)):
+        return float(np.mean([_mean(v) for v in value]))
+    expr = re.sub(r'uniform\(([^,]+),([^)]+)\)', r'((\1+\2)/2.0)', value)
+    expr = re.sub(r'normal\(([^,]+),([^)]+)\)', r'(\1)', expr)
+    return float(eval(expr, {'__builtins__': {}}))
+
+
+def _factor(tau1, tau2):
+    """Peak normalization of the exp2 kernel, as in the INITIAL block of MyExp2SynBB.mod"""
+    tau1 = np.minimum(tau1, 0.9999 * tau2)
+    tp = tau1 * tau2 / (tau2 - tau1) * np.log(tau2 / tau1)
+    return 1.0 / (np.exp(-tp / tau2) - np.exp(-tp / tau1))
+
+
+def synComponents(synMech):
+    """[(tau1, tau2, e, mgBlock, weightScale)] exp2 kinetic components of a synMechParams entry"""
+    e = synMech.get('e', 0.0)
+    if synMech['mod'] == 'MyExp2SynNMDABB':
+        r = synMech.get('r', 1)
+        return [(synMech.get('tau1', 0.1), synMech.get('tau2', 10.0), e, False, 1.0),
+                (synMech.get('tau1NMDA', 15.0), synMech.get('tau2NMDA', 150.0), e, True, r)]
+    return [(synMech.get('tau1', 0.1), synMech.get('tau2', 10.0), e, False, 1.0)]
+
+
+def mgBlock(v):
+    return 1.0 / (1.0 + 0.28 * np.exp(-0.062 * v))
+
+
+def modelParams(netParams, cfg):
+    """Arrays of the rate model for one netParams: cells, synaptic components, coupling and inputs"""
+    pops = list(netParams.popParams)
+    P = len(pops)
+    comps = []
+    for label, mech in netParams.synMechParams.items():
+        comps += [(label,) + comp for comp in synComponents(mech)]
+    C = len(comps)
+
+    def mechList(synMech):
+        return synMech if isinstance(synMech, list) else [synMech]
+
+    W, W2 = np.zeros((C, P, P)), np.zeros((C, P, P))  # [component, pre, post]: convergence * w (and w^2)
+    D = np.zeros((P, P))
+    for rule in netParams.connParams.values():
+        q, p = pops.index(rule['preConds']['pop']), pops.index(rule['postConds']['pop'])
+        numPre = netParams.popParams[pops[q]]['numCells'] - (1 if p == q else 0)
+        K = min(rule.get('convergence', rule.get('inDegree', 0)), numPre)
+        w = _mean(rule['weight'])
+        D[q, p] = _mean(rule.get('delay', 1.0))
+        for i, comp in enumerate(comps):
+            if comp[0] in mechList(rule['synMech']):
+                W[i, q, p] += K * w * comp[5]
+                W2[i, q, p] += K * (w * comp[5]) ** 2
+
+    stimW, stimW2, stimRate = np.zeros((C, P)), np.zeros((C, P)), np.zeros(P)
+    for target in netParams.stimTargetParams.values():
+        p = pops.index(target['conds']['pop'])
+        source = netParams.stimSourceParams[target['source']]
+        stimRate[p] += _mean(source.get('rate', 0.0)) / 1000.0  # events/ms
+        w = _mean(target['weight'])
+        for i, comp in enumerate(comps):
+            if comp[0] in mechList(target['synMech']):
+                stimW[i, p] += w * comp[5]
+                stimW2[i, p] += (w * comp[5]) ** 2
+
+    cells = []
+    for pop in pops:
+        izhi = netParams.cellParams[netParams.popParams[pop]['cellType']]['secs']['soma']['pointps']['Izhi']
+        cells.append(tuple(_mean(izhi[name]) for name in ['celltype', 'C', 'k', 'vr', 'vt', 'vpeak', 'a', 'b', 'c', 'd']))
+
+    return {'pops': pops, 'comps': comps, 'W': W, 'W2': W2, 'D': D, 'stimW': stimW, 'stimW2': stimW2,
+            'stimRate': stimRate, 'cells': cells, 'threshold': netParams.defaultThreshold,
+            'window': (cfg.transient, cfg.duration),
+            'lagPops': (pops.index(cfg.popLag['pre']), pops.index(cfg.popLag['post']))}
+
+
+def simulate(models, dt=0.1, seed=1, cellsPerPop=20, perturbation=0.1, perturbationTau=5.0, maxLag=50.0):
+    """Integrate the model of every entry of models at once; return one prediction dict per entry"""
+    M, P, N = len(models), len(models[0]['pops']), cellsPerPop
+    stack = lambda key: np.array([model[key] for model in models])
+    W, W2, stimW, stimW2, stimRate = stack('W'), stack('W2'), stack('stimW'), stack('stimW2'), stack('stimRate')
+    comps = models[0]['comps']
+    tau2 = np.array([comp[2] for comp in comps])[None, :, None, None]
+    tau1 = np.minimum(np.array([comp[1] for comp in comps])[None, :, None, None], 0.9999 * tau2)
+    erev = np.array([comp[3] for comp in comps], dtype=float)
+    nmda = [i for i, comp in enumerate(comps) if comp[4]]
+    factor = _factor(tau1, tau2)
+    decay1, decay2 = np.exp(-dt / tau1), np.exp(-dt / tau2)
+    # background of each (component, population) as Poisson events of one weight with the same mean and variance
+    stimWeight = np.where(stimW2 > 0, stimW2 / np.maximum(stimW, 1e-12), 0.0)
+    stimSources = np.where(stimW2 > 0, stimW ** 2 / np.maximum(stimW2, 1e-12), 0.0)
+    stimmed = np.nonzero(stimSources * stimRate[:, None, :])
+
+    cells = np.array([model['cells'] for model in models], dtype=float)
+    celltype, C, k, vr, vt, vpeak, a, b, c, d = [cells[:, :, i, None] for i in range(cells.shape[2])]  # (M, P, 1)
+    isFS = celltype == 5
+    threshold = stack('threshold')[:, None, None]
+    windows = np.round(stack('window') / dt).astype(int)
+
+    delaySteps = np.round(stack('D') / dt).astype(int)  # (M, P, P)
+    history = delaySteps.max() + 2
+    R = np.zeros((history, M, P))  # rates (events/ms) of the last steps
+    mIdx, qIdx = np.arange(M)[:, None, None], np.arange(P)[None, :, None]
+
+    rng = np.random.default_rng(seed)
+    pre = np.array([model['lagPops'][0] for model in models])
+    v, u = np.repeat(vr, N, axis=2), np.zeros((M, P, N))
+    A, B = np.zeros((M, len(comps), P, N)), np.zeros((M, len(comps), P, N))
+    r, noise = np.zeros((M, P)), np.zeros(M)
+    numSteps = windows[:, 1].max()
+    trace, detections = np.zeros((numSteps, M, P)), np.zeros((numSteps, M, P))
+
+    for n in range(numSteps):
+        delayed = R[(n - 1 - delaySteps) % history, mIdx, qIdx]  # (M, pre, post)
+        noise += dt / perturbationTau * -noise + np.sqrt(2 * dt / perturbationTau) * perturbation * rng.standard_normal(M)
+        inputRate = stimRate.copy()
+        inputRate[np.arange(M), pre] *= np.maximum(1.0 + noise, 0.0)
+        mean = np.einsum('mcqp,mqp->mcp', W, delayed)[..., None] * dt
+        std = np.sqrt(np.einsum('mcqp,mqp->mcp', W2, delayed) * dt)[..., None]
+        events = np.maximum(mean + std * rng.standard_normal(A.shape), 0.0)  # summed weights of this step
+        stimEvents = (stimSources * inputRate[:, None, :] * dt)[stimmed]
+        events[stimmed] += rng.poisson(stimEvents[:, None], (len(stimEvents), N)) * stimWeight[stimmed][:, None]
+        A = A * decay1 + factor * events
+        B = B * decay2 + factor * events
+        g = np.maximum(B - A, 0.0)  # (M, comps, P, N)
+        g[:, nmda] *= mgBlock(v)[:, None]
+
+        above = np.maximum(v - d, 0.0)  # FS: U(v) = 0.025 (v - vb)^3 above vb = d, 0 below
+        du = a * (np.where(isFS, 0.025 * above * above * above, b * (v - vr)) - u)
+        f = (k * (v - vr) * (v - vt) - u) / (100.0 * C)
+        # implicit in the synaptic current, as in NEURON (conductance over the 0.1 nF soma capacitance)
+        vNew = (v + dt * (f + 10.0 * np.einsum('mcpn,c->mpn', g, erev))) / (1.0 + 10.0 * dt * g.sum(axis=1))
+        u = u + dt * du
+        detected = (v < threshold) & (vNew >= threshold)
+        fired = vNew >= vpeak
+        v = np.where(fired, c, vNew)
+        u = np.where(fired & ~isFS, u + d, u)
+        detections[n] = detected.mean(axis=2)
+        r = r + dt / rateTau * (detections[n] / dt - r)
+        R[n % history] = r
+        trace[n] = r
+
+    results = []
+    binSteps = max(1, int(round(1.0 / dt)))
+    for m, model in enumerate(models):
+        first, last = windows[m]
+        rates = detections[first:last, m].sum(axis=0) / ((last - first) * dt / 1000.0)
+        regime = 'silent' if rates.max() < silentRate else 'runaway' if rates.max() > runawayRate else 'active'
+        x, y = [trace[first:first + (last - first) // binSteps * binSteps, m, i].reshape(-1, binSteps).mean(axis=1)
+                for i in model['lagPops']]
+        lag, sign = float('nan'), 'none'
+        if regime == 'active' and np.std(x) > 0 and np.std(y) > 0:
+            lags, corr = popLag.crossCorrelation(x, y, min(int(maxLag), len(x) - 1))
+            lag = float(lags[np.argmax(corr)] * binSteps * dt)
+            sign = 'DS' if lag > 0 else 'AS' if lag < 0 else 'none'
+        results.append({'rates': dict(zip(model['pops'], rates.tolist())), 'regime': regime, 'lag': lag, 'sign': sign})
+    return results
+
+
+def predict(cfgs, netParamsFile=None, **options):
+    """Prediction ({'rates', 'regime', 'lag', 'sign'}) for every cfg, all integrated together"""
+    import netUpdate
+
+    models = []
+    for cfg in cfgs:
+        cfg = netUpdate.copyParams(cfg)  # NetPyNE Dict values do not survive copy.deepcopy
+        cfg.connMethod = 'netpyne'  # convergence rules, not generated connection lists
+        cfg.cellParamMethod = 'string'
+        models.append(modelParams(netUpdate.loadNetParams(cfg, netParamsFile), cfg))
+    return simulate(models, **options)
+
+
+def isTrivial(prediction):
+    return prediction['regime'] != 'active'
+
+
+if __name__ == '__main__':
+    import runpy
+    import time
+
+    import netUpdate
+    from batch import batchParams
+    from localBatch import gridJobs
+
+    cfgs, labels = [], []
+    for label, params in gridJobs(batchParams(), 'ASDS'):
+        cfg = runpy.run_path('src/cfg.py')['cfg']
+        netUpdate.setCfgParams(cfg, params)
+        cfgs.append(cfg)
+        labels.append('%s (convergence=%g, bkgRate=%g)' % (label, cfg.convergence, cfg.bkgRate))
+    start = time.time()
+    predictions = predict(cfgs)
+    for label, prediction in zip(labels, predictions):
+        print('%-44s %-8s lag %6.1f ms %-4s rates %s' % (label, prediction['regime'], prediction['lag'], prediction['sign'],
+              ' '.join('%s=%.1f' % item for item in prediction['rates'].items())))
+    print('%d points in %.2f s' % (len(cfgs), time.time() - start))
@@ -0,0 +1,122 @@
+"""
+recordingProfiles.py
+
+Bounded recording for the Sender/Receiver model, configured through cfg.recordProfile:
+
+    'cellsPerPop': K       record traces only from K cells of each population, drawn without replacement by
+                           a generator seeded with 'seed' (default cfg.seeds['loc'])
+    'step': ms             record traces every step ms instead of every cfg.recordStep
+    'envelope': True       also record the min/max of V over each step window (VEnvelope.mod),
+                           stored in simData['V_min'] and simData['V_max']
+    'popMean': True        record the mean soma voltage of each population every step ms, stored in
+                           simData['V_popMean'][pop]; needs no per-cell vectors
+
+With cellsPerPop and step set, recording memory grows with K x duration/step, not with population size.
+"""
+
+import numpy as np
+from neuron import h
+
+
+def applyToCfg(cfg, netParams):
+    """Adjust cfg.recordCells, cfg.recordStep and the traces plot before the network is created"""
+    profile = cfg.recordProfile
+    pops = list(netParams.popParams)
+    if profile.get('cellsPerPop') is not None:
+        rng = np.random.default_rng(profile.get('seed', cfg.seeds['loc']))
+        cfg.recordCells = []
+        for pop in pops:
+            numCells = netParams.popParams[pop]['numCells']
+            sample = rng.choice(numCells, min(profile['cellsPerPop'], numCells), replace=False)
+            cfg.recordCells.append((pop, sorted(int(i) for i in sample)))  # cell indices within the population
+        if 'plotTraces' in cfg.analysis:
+            cfg.analysis['plotTraces']['include'] = [(pop, cells[0]) for pop, cells in cfg.recordCells if cells]
+    if profile.get('step'):
+        cfg.recordStep = profile['step']
+
+
+def _somaSeg(cell):
+    return cell.secs['soma']['hObj'](0.5)
+
+
+def _recordEnvelope(sim, step):
+    sim.simData['V_min'], sim.simData['V_max'] = {}, {}
+    sim.net.envelopes = []
+    gids = set(cell.gid for cell in sim.getCellsList(sim.cfg.recordCells))
+    for cell in sim.net.cells:
+        if cell.gid not in gids:
+            continue
+        env = h.VEnvelope(_somaSeg(cell))
+        env.window = step
+        sim.net.envelopes.append(env)
+        sim.simData['V_min']['cell_%d' % cell.gid] = h.Vector().record(env._ref_lo, step)
+        sim.simData['V_max']['cell_%d' % cell.gid] = h.Vector().record(env._ref_hi, step)
+
+
+def _recordPopMean(sim, step):
+    """Per-rank sums of soma V per population, sampled every step ms with a PtrVector gather. The samples are
+    triggered by a NetStim clock, whose events (unlike Python cvode.event callbacks) SaveState saves and
+    restores, so sampling continues after a restored transient (see checkpoint.py)"""
+    sim.net.popMean = {}
+    for pop in sim.net.pops:
+        cells = [cell for cell in sim.net.cells if cell.tags['pop'] == pop]
+        ptrs = h.PtrVector(len(cells))
+        for i, cell in enumerate(cells):
+            ptrs.pset(i, _somaSeg(cell)._ref_v)
+        sim.net.popMean[pop] = {'ptrs': ptrs, 'buffer': h.Vector(len(cells)), 'sum': h.Vector(), 'count': len(cells)}
+
+    def sample():
+        for rec in sim.net.popMean.values():
+            rec['ptrs'].gather(rec['buffer'])
+            rec['sum'].append(rec['buffer'].sum() if rec['count'] else 0.0)
+
+    def start():
+        sim.net.popMeanStart = h.t
+        for rec in sim.net.popMean.values():
+            rec['sum'].resize(0)  # so repeated runs on the same network start empty
+
+    clock = h.NetStim()
+    clock.start, clock.interval, clock.noise = 0, step, 0
+    clock.number = 1e9  # one sample every step ms from t = 0 until psolve stops; independent of cfg.duration,
+                        # which a restored transient checkpoint does not cover
+    sim.net.popMeanStep, sim.net.popMeanStart = step, 0.0  # time of the first sample (see popMeanTimes())
+    sim.net.popMeanClock = (clock, h.NetCon(clock, None))
+    sim.net.popMeanClock[1].record(sample)
+    sim.net.popMeanHandler = h.FInitializeHandler(start)
+
+
+def setup(sim):
+    """Create the envelope and population-mean recordings after sim.setupRecording()"""
+    profile = sim.cfg.recordProfile
+    step = profile.get('step') or sim.cfg.recordStep
+    if profile.get('envelope'):
+        _recordEnvelope(sim, step)
+    if profile.get('popMean'):
+        _recordPopMean(sim, step)
+
+
+def restart(sim):
+    """Restart the population-mean samples at the current time, as h.frecord_init() does for the traces
+    (after a checkpoint restore; the restored clock event at that time takes the first sample)"""
+    if not getattr(sim.net, 'popMean', None):
+        return
+    sim.net.popMeanStart = h.t
+    for rec in sim.net.popMean.values():
+        rec['sum'].resize(0)
+
+
+def popMeanTimes(sim):
+    """(t0, step) of the population-mean samples: t0 is cfg.transient, not 0, after a checkpoint restore"""
+    step = float(sim.net.popMeanStep)
+    return round(sim.net.popMeanStart / step) * step, step  # the clock samples on the step grid; h.t has drifted
+
+
+def gatherPopMean(sim):
+    """Reduce the per-rank population sums into means in simData['V_popMean'] (call before sim.gatherData())"""
+    if not sim.cfg.recordProfile.get('popMean'):
+        return
+    sim.simData['V_popMean'] = {}
+    for pop, rec in sim.net.popMean.items():
+        sim.pc.allreduce(rec['sum'], 1)  # sums the vector in place across ranks
+        count = sim.pc.allreduce(rec['count'], 1)
+        sim.simData['V_popMean'][pop] = rec['sum'].div(count) if count else rec['sum']
@@ -0,0 +1,131 @@
+"""
+replicas.py
+
+Replica mode: K independent copies of the Sender/Receiver network in one NEURON instance, simulated
+in a single psolve. Each replica is src/netParams.py evaluated with its own cfg overrides (weights,
+bkgRate, seeds, ...); its populations, cell types, rules and stim sources get a '_r<k>' suffix, so
+replicas take consecutive gid ranges and never connect to each other.
+
+    cfg.replicas = [{'seeds': {'conn': 1, 'stim': 1, 'loc': 1}}, {'seeds': {'conn': 2, 'stim': 2, 'loc': 2}}, ...]
+    cfg.replicas = seedReplicas(32)
+
+Per-replica seeds are honoured for the connectivity when cfg.connMethod = 'vectorized' and for the
+background NetStims (stim seed); with NetPyNE's own convergence rule and string cell parameters,
+replicas differ through their gids. After the run, results are split per replica: simData['replicas']
+holds the overrides, population rates and population lag of each one, and with cfg.saveBinary each
+replica is saved to its own <simLabel>_r<k>_data folder, readable by binaryOutput.SimOutput and
+batchAnalysis.py like a separate job. Replicas cannot be combined with transient checkpointing.
+"""
+
+import os
+
+import numpy as np
+
+import netUpdate
+import popLag
+import binaryOutput
+import connectivity
+import loadBalance
+import spikeStream
+
+
+def seedReplicas(numReplicas, firstSeed=1):
+    """Overrides for numReplicas copies that differ only in their seeds"""
+    return [{'seeds': {'conn': firstSeed + k, 'stim': firstSeed + k, 'loc': firstSeed + k}} for k in range(numReplicas)]
+
+
+def suffix(k):
+    return '_r%d' % k
+
+
+def _renamePops(conds, k):
+    for key in ['pop', 'cellType']:
+        if key in conds:
+            conds = dict(conds, **{key: conds[key] + suffix(k)})
+    return conds
+
+
+def replicaNetParams(cfg, filename=None):
+    """Merge one netParams per entry of cfg.replicas into a single netParams"""
+    if cfg.transientCheckpoint['enabled']:
+        # netUpdate.applyParams() updates rules by their netParams labels, which carry the replica suffix here
+        raise ValueError('cfg.replicas cannot be combined with cfg.transientCheckpoint')
+    merged, connSeeds = None, {}
+    for k, overrides in enumerate(cfg.replicas):
+        replicaCfg = netUpdate.copyParams(cfg)
+        netUpdate.setCfgParams(replicaCfg, overrides)
+        replicaCfg.connMethod = 'netpyne'  # connectivity is vectorized on the merged network below
+        netParams = netUpdate.loadNetParams(replicaCfg, filename)
+        if merged is None:
+            merged = netUpdate.copyParams(netParams)
+            for params in [merged.cellParams, merged.popParams, merged.connParams, merged.stimSourceParams,
+                           merged.stimTargetParams]:
+                params.clear()
+            merged.cellParamDists = {}
+
+        merged.synMechParams.update(netParams.synMechParams)
+        for label, params in netParams.cellParams.items():
+            merged.cellParams[label + suffix(k)] = params  # per-replica cell parameter overrides
+        for pop, params in netParams.popParams.items():
+            merged.popParams[pop + suffix(k)] = _renamePops(dict(params), k)
+        for pop, dists in getattr(netParams, 'cellParamDists', {}).items():
+            merged.cellParamDists[pop + suffix(k)] = dists
+        for label, rule in netParams.connParams.items():
+            merged.connParams[label + suffix(k)] = dict(rule, preConds=_renamePops(rule['preConds'], k),
+                                                       postConds=_renamePops(rule['postConds'], k))
+            connSeeds[label + suffix(k)] = replicaCfg.seeds['conn']
+        for label, source in netParams.stimSourceParams.items():
+            if source.get('type') == 'NetStim':
+                source = dict(source, seed=replicaCfg.seeds['stim'])  # per-replica background spike trains
+            merged.stimSourceParams[label + suffix(k)] = dict(source)
+        for label, target in netParams.stimTargetParams.items():
+            merged.stimTargetParams[label + suffix(k)] = dict(target, source=target['source'] + suffix(k),
+                                                             conds=_renamePops(target['conds'], k))
+
+    if cfg.connMethod == 'vectorized':
+        from neuron import h
+        pc = h.ParallelContext()
+        ranks = loadBalance.partition(merged, cfg.loadBalance, int(pc.nhost()))
+        connectivity.vectorizeConvergence(merged, cfg.seeds['conn'], rank=int(pc.id()), ranks=ranks, seeds=connSeeds)
+    return merged
+
+
+def replicaPops(sim, k):
+    """{base population label: gids} of replica k"""
+    return {pop[:-len(suffix(k))]: list(popLag.popGids(sim, pop))
+            for pop in sim.net.params.popParams if pop.endswith(suffix(k))}
+
+
+def splitResults(sim):
+    """Per-replica rates, lag and (with cfg.saveBinary) output folders, from the gathered data (rank 0 only)"""
+    if sim.rank != 0:
+        return
+    spkt, spkid = spikeStream.simSpikes(sim)
+    options = sim.cfg.popLag
+    timeRange = options.get('timeRange') or [sim.cfg.transient, sim.cfg.duration]
+    window = (timeRange[1] - timeRange[0]) / 1000.0
+    inWindow = (spkt >= timeRange[0]) & (spkt < timeRange[1])
+
+    results = []
+    for k, overrides in enumerate(sim.cfg.replicas):
+        pops = replicaPops(sim, k)
+        gids = np.concatenate([np.asarray(g, dtype=int) for g in pops.values()])
+        mask = np.isin(spkid, gids)
+        rates = {pop: np.count_nonzero(np.isin(spkid[inWindow], g)) / max(len(g), 1) / window for pop, g in pops.items()}
+        result = {'overrides': overrides, 'popRates': rates}
+        if options['enabled']:
+            result['popLag'] = popLag.computeLag(spkt[mask], spkid[mask], pops[options['pre']], pops[options['post']],
+                                                 timeRange, options['binSize'], options['maxLag'])
+        results.append(result)
+
+        if sim.cfg.saveBinary:
+            folder = os.path.join(sim.cfg.saveFolder, sim.cfg.simLabel + suffix(k) + '_data')
+            binaryOutput.saveSpikes(folder, spkt[mask], spkid[mask])
+            replicaCfg = netUpdate.copyParams(sim.cfg)
+            netUpdate.setCfgParams(replicaCfg, overrides)
+            binaryOutput.saveMeta(folder, {'cfg': replicaCfg.__dict__, 'pops': pops, 'traces': [], 'popMean': [],
+                                           'simData': {key: value for key, value in result.items() if key != 'overrides'}})
+
+    sim.allSimData['replicas'] = results
+    print('  Split results of %d replicas' % len(results))
+    return results
@@ -0,0 +1,111 @@
+"""
+scaling.py
+
+Strong and weak scaling benchmark of the Sender/Receiver model over MPI ranks on one node.
+
+    strong: fixed cfg.scale, 1..N ranks;       efficiency(n) = T(1) / (n * T(n))
+    weak:   cfg.scale proportional to ranks;   efficiency(n) = T(1) / T(n)
+    delay:  fixed cfg.scale, for every number of ranks compare cost-based placement, population-group
+            placement, and group placement with cfg.minCrossRankDelay (see crossRankDelay.py)
+
+Each run is headless (no plots, traces or saved output) and uses cost-based load balancing and the
+vectorized connectivity generator. Build and run times are read from NetPyNE's timing output.
+
+Usage (from the repository root):
+    python src/scaling.py --mode strong --scale 10 --ranks 1 2 4 8 16 32 64
+    python src/scaling.py --mode weak --scale 1 --ranks 1 2 4 8 16 32 64 --mpiexec "srun -n {n}"
+    python src/scaling.py --mode delay --scale 10 --ranks 2 4 8 --minCrossRankDelay 0.5
+"""
+
+import os
+import re
+import json
+import time
+import argparse
+import subprocess
+
+from localBatch import writeJobCfg
+
+headless = {'analysis': {}, 'recordTraces': {}, 'saveJson': False, 'saveBinary': False, 'popLag': {'enabled': False},
+            'connMethod': 'vectorized', 'loadBalance': {'method': 'cost', 'cellCost': 1.0, 'synCost': 0.1}}
+
+# NetPyNE's build timing lines: createCells, connectCells, addStims
+timingPatterns = {'build': r'Done; cell (?:creation|connection|stims creation) time = ([\d.]+) s',
+                  'run': r'Done; run time = ([\d.]+) s',
+                  'exchangeInterval': r'Spike exchange interval: ([\d.eE+-]+) ms'}
+
+delayConfigs = {'cost': {'loadBalance': dict(headless['loadBalance'], method='cost')},
+                'groups': {'loadBalance': dict(headless['loadBalance'], method='groups',
+                                               groups=[['SenderE', 'SenderI'], ['ReceiverE', 'ReceiverI']])}}
+
+
+def runOnce(ranks, params, label, folder, mpiexec, script):
+    _, cfgFile = writeJobCfg('src/cfg.py', dict(headless, **params), label, folder, 1)
+    command = mpiexec.format(n=ranks).split() + ['nrniv', '-python', '-mpi', script, 'simConfig=' + cfgFile,
+                                                 'netParams=src/netParams.py']
+    start = time.time()
+    output = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True).stdout
+    result = {'ranks': ranks, 'wall': time.time() - start, 'params': params}
+    for key, pattern in timingPatterns.items():
+        result[key] = sum(float(t) for t in re.findall(pattern, output))
+    return result
+
+
+def delayBenchmark(scale, ranksList, mpiexec, minCrossRankDelay, script='src/init.py', folder='data/scaling', duration=None):
+    """Run time per placement / minimum cross-rank delay configuration, for every number of ranks"""
+    os.makedirs(folder, exist_ok=True)
+    configs = dict(delayConfigs)
+    configs['groups+minDelay'] = dict(delayConfigs['groups'], minCrossRankDelay=minCrossRankDelay)
+    results = []
+    for ranks in ranksList:
+        for name, config in configs.items():
+            params = dict(config, scale=scale)
+            if duration is not None:
+                params['duration'] = duration
+            result = runOnce(ranks, params, 'delay_%s_%d' % (name.replace('+', '_'), ranks), folder, mpiexec, script)
+            result['config'] = name
+            results.append(result)
+            print('delay ranks=%3d %-16s exchange=%8g ms run=%7.2f s' % (ranks, name, result['exchangeInterval'], result['run']))
+
+    filename = os.path.join(folder, 'delay_scaling.json')
+    with open(filename, 'w') as fileObj:
+        json.dump(results, fileObj, indent=2)
+    print('Results saved to %s' % filename)
+    return results
+
+
+def benchmark(mode, scale, ranksList, mpiexec, script='src/init.py', folder='data/scaling', duration=None):
+    os.makedirs(folder, exist_ok=True)
+    results = []
+    for ranks in ranksList:
+        params = {'scale': scale * ranks if mode == 'weak' else scale}
+        if duration is not None:
+            params['duration'] = duration
+        result = runOnce(ranks, params, '%s_%d' % (mode, ranks), folder, mpiexec, script)
+        base = results[0]['run'] if results else result['run']
+        if result['run'] > 0:
+            result['efficiency'] = base / result['run'] / (ranks / ranksList[0]) if mode == 'strong' else base / result['run']
+        results.append(result)
+        print('%s ranks=%3d scale=%6g build=%7.2f s run=%7.2f s efficiency=%.2f' %
+              (mode, ranks, params['scale'], result['build'], result['run'], result.get('efficiency', float('nan'))))
+
+    filename = os.path.join(folder, '%s_scaling.json' % mode)
+    with open(filename, 'w') as fileObj:
+        json.dump(results, fileObj, indent=2)
+    print('Results saved to %s' % filename)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Strong/weak MPI scaling benchmark of the Sender/Receiver model')
+    parser.add_argument('--mode', choices=['strong', 'weak', 'delay'], default='strong')
+    parser.add_argument('--scale', type=float, default=1.0, help='cfg.scale (per rank in weak mode)')
+    parser.add_argument('--ranks', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument('--duration', type=float, default=None, help='simulated ms (default: cfg.duration)')
+    parser.add_argument('--mpiexec', default='mpiexec -n {n}', help='launcher command, {n} = number of ranks')
+    parser.add_argument('--minCrossRankDelay', type=float, default=0.5, help='delay mode: minimum cross-rank delay (ms)')
+    args = parser.parse_args()
+    if args.mode == 'delay':
+        delayBenchmark(args.scale, args.ranks, args.mpiexec, args.minCrossRankDelay, duration=args.duration)
+    else:
+        benchmark(args.mode, args.scale, args.ranks, args.mpiexec, duration=args.duration)
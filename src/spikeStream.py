@@ -0,0 +1,184 @@
+"""
+spikeStream.py
+
+Streaming spike output: psolve runs in chunks of cfg.spikeStream['chunk'] simulated ms, and after every
+chunk each rank appends its new (t, gid) pairs to an append-only binary file and empties its spike
+vectors, so resident memory stays bounded however long the run is, and the spikes of every finished
+chunk are on disk if the run is interrupted.
+
+    <saveFolder>/<simLabel>_spikes/rank<r>.bin      records of float64 t (ms) + int32 gid, in chunk order
+    <saveFolder>/<simLabel>_spikes/rank<r>.chunks   float64 pairs (chunk end time, records written so far)
+
+A chunk is complete once its entry is in the .chunks file of every rank; SpikeStream reads the complete
+chunks of a running or finished simulation. popLag, replicas and binaryOutput read them back as numpy
+arrays (simSpikes). With cfg.spikeStream['gather'], or whenever NetPyNE's own saving (saveJson, ...) or
+plots need them, they are also put back into sim.allSimData after the run (rank 0, as Python lists);
+otherwise they stay on disk. Either way addRates replaces the spike count, avgRate and popRates NetPyNE
+computed from the emptied spike vectors.
+
+Usage:
+    from spikeStream import SpikeStream
+    stream = SpikeStream('data/TwoPops_sync_spikes')
+    spkt, spkid = stream.spikes(timeRange=[500, 1000])
+"""
+
+import os
+import glob
+
+import numpy as np
+
+recordType = np.dtype([('t', '<f8'), ('gid', '<i4')])
+
+spikeCounts = None  # spikes per gid streamed by this rank (see instrumentation.countEvents)
+
+
+def streamFolder(cfg):
+    return os.path.join(cfg.saveFolder, cfg.simLabel + '_spikes')
+
+
+def _files(sim):
+    base = os.path.join(streamFolder(sim.cfg), 'rank%d' % sim.rank)
+    return base + '.bin', base + '.chunks'
+
+
+def start(sim):
+    """Create (or truncate) this rank's stream files, after rank 0 removed those of an earlier run"""
+    global spikeCounts
+    folder = streamFolder(sim.cfg)
+    if sim.rank == 0:
+        os.makedirs(folder, exist_ok=True)
+        for filename in glob.glob(os.path.join(folder, 'rank*.bin')) + glob.glob(os.path.join(folder, 'rank*.chunks')):
+            os.remove(filename)  # e.g. the ranks beyond sim.nhosts of a larger earlier run
+    sim.pc.barrier()
+    for filename in _files(sim):
+        open(filename, 'wb').close()
+    spikeCounts = np.zeros(sum(pop['numCells'] for pop in sim.net.params.popParams.values()), dtype=np.int64)
+
+
+def flush(sim, tEnd):
+    """Append the spikes recorded since the last flush, then empty the spike vectors"""
+    spkt, spkid = sim.simData['spkt'], sim.simData['spkid']
+    records = np.empty(int(spkt.size()), dtype=recordType)
+    records['t'] = spkt.as_numpy()
+    records['gid'] = spkid.as_numpy()
+    spikeCounts[:] += np.bincount(records['gid'], minlength=len(spikeCounts))
+    dataFile, chunkFile = _files(sim)
+    with open(dataFile, 'ab') as fileObj:
+        records.tofile(fileObj)
+        total = fileObj.tell() // recordType.itemsize
+    with open(chunkFile, 'ab') as fileObj:  # written after the data, so an indexed chunk is always complete
+        np.array([tEnd, total], dtype=np.float64).tofile(fileObj)
+    spkt.resize(0)
+    spkid.resize(0)
+
+
+def psolve(sim, tstop):
+    """sim.pc.psolve(tstop) in chunks of cfg.spikeStream['chunk'] ms, flushing spikes after each one"""
+    from neuron import h
+
+    chunk = sim.cfg.spikeStream['chunk']
+    while h.t < tstop - 0.5 * sim.cfg.dt:
+        tEnd = min(tstop, (np.floor(h.t / chunk + 1e-9) + 1) * chunk)
+        sim.pc.psolve(tEnd)
+        flush(sim, tEnd)
+
+
+def runSim(sim):
+    """Replacement for sim.runSim(skipPreRun=True) that streams spikes to disk"""
+    from neuron import h
+
+    sim.pc.barrier()
+    sim.timing('start', 'runTime')
+    h.finitialize(float(sim.cfg.hParams['v_init']))
+    psolve(sim, sim.cfg.duration)
+    sim.pc.barrier()
+    sim.timing('stop', 'runTime')
+    if sim.rank == 0 and sim.cfg.timing:
+        print('  Done; run time = %0.2f s; real-time ratio: %0.2f.' %
+              (sim.timingData['runTime'], sim.cfg.duration / 1000 / sim.timingData['runTime']))
+
+
+def gathered(cfg):
+    """Whether the streamed spikes go back into sim.allSimData: requested, or read by NetPyNE's saving or plots"""
+    netpyneFiles = any(getattr(cfg, flag, False) for flag in
+                       ('saveJson', 'savePickle', 'saveMat', 'saveHDF5', 'saveCSV', 'saveDat', 'saveDpk'))
+    return cfg.spikeStream['gather'] or netpyneFiles or (not cfg.deferPlots and bool(cfg.analysis))
+
+
+def gatherToSimData(sim):
+    """Load the streamed spikes of all ranks into sim.allSimData (rank 0, after sim.gatherData())"""
+    sim.pc.barrier()  # every rank has closed its files
+    if sim.rank != 0:
+        return
+    spkt, spkid = SpikeStream(streamFolder(sim.cfg)).spikes()
+    sim.allSimData['spkt'], sim.allSimData['spkid'] = spkt.tolist(), spkid.tolist()
+
+
+def simSpikes(sim, timeRange=None):
+    """(spkt, spkid) arrays of the run (rank 0, after gathering): from the stream files when the streamed
+    spikes were not gathered into sim.allSimData, otherwise from sim.allSimData"""
+    if sim.cfg.spikeStream['enabled'] and not gathered(sim.cfg):
+        return SpikeStream(streamFolder(sim.cfg)).spikes(timeRange)
+    spkt = np.asarray(sim.allSimData.get('spkt', []), dtype=float)
+    spkid = np.asarray(sim.allSimData.get('spkid', []), dtype=int)
+    if timeRange is not None:
+        inRange = (spkt >= timeRange[0]) & (spkt < timeRange[1])
+        spkt, spkid = spkt[inRange], spkid[inRange]
+    return spkt, spkid
+
+
+def addRates(sim):
+    """Spike count, avgRate and popRates of the streamed spikes in sim.allSimData (rank 0, after gathering):
+    sim.gatherData() computed them from the spike vectors, which flush() empties after every chunk"""
+    if sim.rank != 0:
+        return
+    import popLag
+
+    _, spkid = simSpikes(sim)
+    counts = np.bincount(spkid, minlength=sum(pop['numCells'] for pop in sim.net.params.popParams.values()))
+    seconds = sim.cfg.duration / 1000.0
+    sim.totalSpikes = len(spkid)
+    sim.firingRate = sim.totalSpikes / float(max(1, len(counts))) / seconds
+    sim.allSimData['avgRate'] = sim.firingRate
+    popRates = {}
+    for pop in sim.net.params.popParams:
+        gids = list(popLag.popGids(sim, pop))
+        popRates[pop] = float(counts[gids].sum()) / max(1, len(gids)) / seconds
+    sim.allSimData['popRates'] = popRates
+    print('  Streamed spikes: %i (%0.2f Hz)' % (sim.totalSpikes, sim.firingRate))
+
+
+class SpikeStream(object):
+    """Reader for the complete chunks of a spike stream folder"""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.ranks = sorted(glob.glob(os.path.join(folder, 'rank*.chunks')))
+
+    def chunks(self):
+        """(chunk end times, records written per rank) of the chunks complete on every rank"""
+        index = [np.fromfile(filename, dtype=np.float64).reshape(-1, 2) for filename in self.ranks]
+        numChunks = min([len(rankIndex) for rankIndex in index] or [0])
+        if numChunks == 0:
+            return np.zeros(0), [0] * len(index)
+        return index[0][:numChunks, 0], [int(rankIndex[numChunks - 1, 1]) for rankIndex in index]
+
+    def completed(self):
+        """Simulated time (ms) up to which spikes are complete"""
+        ends, _ = self.chunks()
+        return float(ends[-1]) if len(ends) else 0.0
+
+    def spikes(self, timeRange=None):
+        """(spkt, spkid) of the complete chunks, sorted by time and optionally restricted to timeRange"""
+        _, counts = self.chunks()
+        parts = []
+        for filename, count in zip(self.ranks, counts):
+            if count == 0:
+                continue
+            records = np.memmap(filename[:-len('.chunks')] + '.bin', dtype=recordType, mode='r', shape=(count,))
+            if timeRange is not None:
+                records = records[(records['t'] >= timeRange[0]) & (records['t'] < timeRange[1])]
+            parts.append(np.array(records))
+        records = np.concatenate(parts) if parts else np.zeros(0, dtype=recordType)
+        records = records[np.argsort(records['t'], kind='stable')]
+        return records['t'].astype(np.float64), records['gid'].astype(np.int32)
@@ -0,0 +1,232 @@
+"""
+transitionSearch.py
+
+Adaptive search for the AS/DS transition: instead of a dense grid, jobs are placed where the measured
+SenderE->ReceiverE lag (simData['popLag'], see popLag.py) changes sign.
+
+    1 parameter   multisection: every wave runs one job per process at evenly spaced points inside the
+                  bracket where the lag changes sign, shrinking it by (processes + 1) per wave; the
+                  transition is the zero of the lag interpolated linearly inside the final bracket
+    2 parameters  boundary refinement: the 1-parameter search runs along x for several values of y at
+                  once (the processes of a wave are shared between them), and new y rows are inserted
+                  between neighbouring rows whose transitions differ by more than xTol, up to maxRows
+
+Jobs run as src/init.py subprocesses with the cfg files, status file and retries of localBatch.py.
+The result (transition points and every evaluated job) is saved as <saveFolder>/<batchLabel>_transition.json.
+
+Usage (from the repository root):
+    python src/batch.py search weightEE 0.005 0.06
+    python src/batch.py search weightEE 0.005 0.06 delay 0.1 5
+"""
+
+import os
+import json
+import math
+import time
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import localBatch
+
+
+def lagSign(lag):
+    """+1 for DS, -1 for AS, 0 if there is no lag (silent or uncorrelated populations)"""
+    if lag is None or lag['sign'] == 'none' or not np.isfinite(lag['lag']):
+        return 0
+    return 1 if lag['lag'] > 0 else -1
+
+
+class Evaluator(object):
+    """Runs waves of jobs and returns their popLag; points already evaluated are not run again"""
+
+    def __init__(self, baseParams, cfgFile='src/cfg.py', netParamsFile='src/netParams.py', batchLabel='ASDS_search',
+                 saveFolder='ASDS_search', script='src/init.py', processes=None, threads=1, retries=1):
+        os.makedirs(saveFolder, exist_ok=True)
+        self.baseParams = dict(baseParams, saveBinary=True)  # the lag is read back from meta.json
+        self.cfgFile, self.netParamsFile, self.script = cfgFile, netParamsFile, script
+        self.batchLabel, self.saveFolder = batchLabel, saveFolder
+        self.processes = processes or max(1, (os.cpu_count() or 1) // threads)
+        self.threads, self.retries = threads, retries
+        self.status = localBatch.StatusFile(os.path.join(saveFolder, batchLabel + '_status.json'))
+        self.results = {}  # json(point) -> {'label', 'point', 'lag'}
+        self.waves = 0
+
+    def _readLag(self, label):
+        metaFile = os.path.join(self.saveFolder, label + '_data', 'meta.json')
+        if not os.path.exists(metaFile):
+            return None
+        with open(metaFile) as fileObj:
+            return json.load(fileObj)['simData'].get('popLag')
+
+    def evaluate(self, points):
+        """popLag of every point (dict of params), running the new ones as one wave"""
+        keys = [json.dumps(point, sort_keys=True) for point in points]
+        new = [(key, point) for key, point in zip(keys, points) if key not in self.results]
+        new = list(dict(new).items())  # without repeated points
+        if new:
+            jobs = []
+            for i, (key, point) in enumerate(new):
+                label = '%s_w%d_%d' % (self.batchLabel, self.waves, i)
+                # labels repeat across searches in the same folder: never read the output of an earlier one
+                shutil.rmtree(os.path.join(self.saveFolder, label + '_data'), ignore_errors=True)
+                _, cfgFilename = localBatch.writeJobCfg(self.cfgFile, dict(self.baseParams, **point), label,
+                                                        self.saveFolder, self.threads)
+                self.status.update(label, status='pending', params=point, wave=self.waves)
+                jobs.append({'label': label, 'cfgFile': cfgFilename, 'key': key, 'point': point})
+            with ThreadPoolExecutor(max_workers=self.processes) as pool:
+                done = list(pool.map(lambda job: localBatch.runJob(job, self.status, self.netParamsFile, self.script,
+                                                                   self.threads, self.retries), jobs))
+            for job, ok in zip(jobs, done):
+                lag = self._readLag(job['label']) if ok else None  # a failed job has no lag
+                self.results[job['key']] = {'label': job['label'], 'point': job['point'], 'lag': lag}
+                self.status.update(job['label'], popLag=lag)
+            self.waves += 1
+        return [self.results[key]['lag'] for key in keys]
+
+    @property
+    def numJobs(self):
+        return len(self.results)
+
+
+class LineSearch(object):
+    """Sign change of the lag along x, with the other parameters fixed"""
+
+    def __init__(self, name, lo, hi, fixed, tol):
+        self.name, self.fixed, self.tol = name, fixed, tol
+        self.xs, self.lags = [], []
+        self.pending = [lo, hi]
+
+    def point(self, x):
+        return dict(self.fixed, **{self.name: float(x)})
+
+    def bracket(self):
+        """Index i of the pair (xs[i], xs[i+1]) bracketing the transition, AS<->DS preferred; None if no change"""
+        signs = [lagSign(lag) for lag in self.lags]
+        pairs = list(range(len(signs) - 1))
+        for i in pairs:
+            if signs[i] * signs[i + 1] < 0:
+                return i
+        for i in pairs:
+            if signs[i] != signs[i + 1]:
+                return i
+
+    @property
+    def done(self):
+        if self.pending:
+            return False
+        i = self.bracket()
+        return i is None or self.xs[i + 1] - self.xs[i] <= self.tol
+
+    def nextPoints(self, n):
+        """Up to n new x values: the initial ends first, then evenly spaced points inside the bracket"""
+        if self.pending:
+            points, self.pending = self.pending, []
+            return points
+        if self.done:
+            return []
+        i = self.bracket()
+        return list(np.linspace(self.xs[i], self.xs[i + 1], n + 2)[1:-1])
+
+    def update(self, xs, lags):
+        for x, lag in zip(xs, lags):
+            j = int(np.searchsorted(self.xs, x))
+            self.xs.insert(j, x)
+            self.lags.insert(j, lag)
+
+    def transition(self):
+        """Zero of the lag interpolated inside the bracket (midpoint if the lags cannot be interpolated)"""
+        i = self.bracket()
+        if i is None:
+            return None
+        (a, b), (la, lb) = self.xs[i:i + 2], self.lags[i:i + 2]
+        if lagSign(la) * lagSign(lb) < 0 and la['lag'] != lb['lag']:
+            return a - la['lag'] * (b - a) / (lb['lag'] - la['lag'])
+        return 0.5 * (a + b)
+
+    def todict(self):
+        i = self.bracket()
+        return dict(self.fixed, transition=self.transition(), bracket=None if i is None else self.xs[i:i + 2],
+                    points=[{self.name: x, 'lag': None if lag is None else lag['lag'], 'sign': lagSign(lag)}
+                            for x, lag in zip(self.xs, self.lags)])
+
+
+def runSearches(evaluator, searches, maxWaves):
+    """Advance all line searches together, sharing the processes of every wave between the active ones"""
+    for _ in range(maxWaves):
+        active = [search for search in searches if not search.done]
+        if not active:
+            break
+        share = max(1, evaluator.processes // len(active))
+        wave = [(search, search.nextPoints(share)) for search in active]
+        lags = evaluator.evaluate([search.point(x) for search, xs in wave for x in xs])
+        for search, xs in wave:
+            search.update(xs, lags[:len(xs)])
+            lags = lags[len(xs):]
+
+
+def search1D(evaluator, name, lo, hi, fixed=None, tol=None, maxWaves=20):
+    """Transition along one parameter; tol defaults to 1% of the range"""
+    search = LineSearch(name, lo, hi, fixed or {}, tol or 0.01 * (hi - lo))
+    runSearches(evaluator, [search], maxWaves)
+    return search
+
+
+def search2D(evaluator, xName, xRange, yName, yRange, fixed=None, xTol=None, numRows=5, maxRows=17, maxWaves=20):
+    """Transition line x(y): line searches along x for rows of y, refined where the line moves more than xTol"""
+    xTol = xTol or 0.02 * (xRange[1] - xRange[0])
+    fixed = fixed or {}
+
+    def row(y):
+        return LineSearch(xName, xRange[0], xRange[1], dict(fixed, **{yName: float(y)}), xTol)
+
+    rows = [row(y) for y in np.linspace(yRange[0], yRange[1], numRows)]
+    yMin = (yRange[1] - yRange[0]) / (maxRows - 1)
+    while True:
+        runSearches(evaluator, rows, maxWaves)
+        rows.sort(key=lambda search: search.fixed[yName])
+        new = []
+        for a, b in zip(rows[:-1], rows[1:]):
+            ta, tb = a.transition(), b.transition()
+            if b.fixed[yName] - a.fixed[yName] <= 1.5 * yMin:
+                continue  # rows already at the finest spacing
+            if (ta is None) != (tb is None) or (ta is not None and abs(ta - tb) > xTol):
+                new.append(row(0.5 * (a.fixed[yName] + b.fixed[yName])))
+        if not new or len(rows) + len(new) > maxRows:
+            return rows
+        rows += new
+
+
+def gridJobsNeeded(ranges, tols):
+    """Jobs a grid with the same resolution would need (for the summary)"""
+    return int(np.prod([math.ceil((hi - lo) / tol) + 1 for (lo, hi), tol in zip(ranges, tols)]))
+
+
+def runSearch(baseParams, xName, xRange, yName=None, yRange=None, batchLabel='ASDS_search', saveFolder='ASDS_search',
+              xTol=None, **options):
+    """Adaptive AS/DS transition search along xName (and yName); saves and returns the transition points"""
+    evaluator = Evaluator(baseParams, batchLabel=batchLabel, saveFolder=saveFolder, **options)
+    start = time.time()
+    if yName is None:
+        searches = [search1D(evaluator, xName, xRange[0], xRange[1], tol=xTol)]
+        tols = [searches[0].tol]
+        ranges = [xRange]
+    else:
+        searches = search2D(evaluator, xName, xRange, yName, yRange, xTol=xTol)
+        tols = [searches[0].tol, (yRange[1] - yRange[0]) / max(len(searches) - 1, 1)]
+        ranges = [xRange, yRange]
+
+    result = {'x': xName, 'y': yName, 'rows': [search.todict() for search in searches],
+              'jobs': evaluator.numJobs, 'waves': evaluator.waves, 'gridJobs': gridJobsNeeded(ranges, tols)}
+    filename = os.path.join(saveFolder, batchLabel + '_transition.json')
+    with open(filename, 'w') as fileObj:
+        json.dump(result, fileObj, indent=2)
+
+    for row in result['rows']:
+        prefix = '%s=%g: ' % (yName, row[yName]) if yName else ''
+        print('  %stransition at %s' % (prefix, 'none found' if row['transition'] is None
+                                        else '%s=%g' % (xName, row['transition'])))
+    print('Search done in %.1f s: %d jobs in %d waves (a grid at the same resolution needs %d) -> %s' %
+          (time.time() - start, evaluator.numJobs, evaluator.waves, result['gridJobs'], filename))
+    return result
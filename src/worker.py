@@ -0,0 +1,230 @@
+"""
+worker.py
+
+Persistent simulation workers: a worker process imports netpyne and NEURON, loads the compiled mod/
+mechanisms and executes the cfg file once, then serves jobs over a local socket. Each job is a set of
+cfg parameters; the worker builds the network from a copy of the cached cfg, runs it with the same
+steps as init.py (see build.py), replies with the job's scalar results, and clears the network
+(sim.clearAll) before the next job, without restarting the process.
+
+runBatch() is the matching batch backend: it starts a pool of workers and dispatches the grid of
+src/batch.py to them longest-first, with the status file and retries of localBatch.py. A worker that
+dies is restarted.
+
+multiprocessing.connection unpickles what it receives, so workers only accept clients holding the
+batch's authentication key: a random key generated per batch and handed to the workers in the
+environment (never on the command line). Workers listen on a free port, which they report back to the
+batch through an inherited pipe.
+
+Usage (from the repository root):
+    python src/batch.py workers 8                     # batch on 8 warm workers
+    ASDS_WORKER_AUTHKEY=<hex> python src/worker.py --port 6001  # a single worker, for use with submit()
+"""
+
+import os
+import sys
+import time
+import queue
+import runpy
+import secrets
+import argparse
+import traceback
+import threading
+import subprocess
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+import netUpdate
+from localBatch import StatusFile, gridJobs, jobCost, writeJobCfg
+
+authkeyEnv = 'ASDS_WORKER_AUTHKEY'  # hex authentication key shared by a worker and its clients
+portFdEnv = 'ASDS_WORKER_PORT_FD'   # pipe on which a worker started by startWorker() reports its port
+modFolderDefault = 'mod'
+resultKeys = ['popLag', 'popRates', 'avgRate', 'replicas']
+
+
+class Worker(object):
+    """Runs jobs in this process; the cfg of every cfg file is executed only once"""
+
+    def __init__(self, modFolder=modFolderDefault):
+        import fastStart
+        from netpyne import sim  # imports NEURON and loads the compiled mechanisms of ./x86_64, if any
+        fastStart.loadMechanisms(modFolder)  # otherwise from the fastStart cache
+        self.sim = sim
+        self.cfgs = {}
+
+    def baseCfg(self, cfgFile):
+        if cfgFile not in self.cfgs:
+            self.cfgs[cfgFile] = runpy.run_path(cfgFile)['cfg']
+        return netUpdate.copyParams(self.cfgs[cfgFile])
+
+    def run(self, job):
+        import build
+        import instrumentation
+
+        sim = self.sim
+        start = time.time()
+        instrumentation.reset()  # phases and counters of the previous job
+        try:
+            cfg = self.baseCfg(job['cfgFile'])
+            netUpdate.setCfgParams(cfg, job['params'])
+            cfg.simLabel, cfg.saveFolder = job['label'], job['saveFolder']
+            netParams = netUpdate.loadNetParams(cfg, job['netParamsFile'])
+            netParams, postTransient = build.prepareNetParams(cfg, netParams, job['netParamsFile'])
+            build.createNetwork(cfg, netParams)
+            build.runNetwork(postTransient, job['netParamsFile'])  # the run steps of init.py
+            results = {key: sim.allSimData[key] for key in resultKeys if key in sim.allSimData}
+            reply = {'label': job['label'], 'status': 'done', 'time': time.time() - start, 'results': results}
+        except Exception:
+            reply = {'label': job['label'], 'status': 'failed', 'time': time.time() - start,
+                     'error': traceback.format_exc()}
+        try:
+            sim.clearAll()  # NEURON objects, recordings and simData of this job
+        except Exception:  # e.g. the build failed before sim.net existed
+            reply.update(status='failed', error=reply.get('error', '') + traceback.format_exc())
+        return reply
+
+
+def envAuthkey():
+    """Authentication key from the environment"""
+    if not os.environ.get(authkeyEnv):
+        raise RuntimeError('%s is not set: export a random hex key, e.g. python -c "import secrets; '
+                           'print(secrets.token_hex(32))"' % authkeyEnv)
+    return bytes.fromhex(os.environ[authkeyEnv])
+
+
+def serve(port=0, authkey=None):
+    """Serve jobs until a 'stop' message is received (port 0: a free port)"""
+    authkey = authkey or envAuthkey()
+    worker = Worker()
+    with Listener(('localhost', port), authkey=authkey) as listener:
+        port = listener.address[1]
+        print('Worker ready on port %d' % port)
+        sys.stdout.flush()
+        if os.environ.get(portFdEnv):
+            with os.fdopen(int(os.environ[portFdEnv]), 'w') as pipe:
+                pipe.write('%d\n' % port)
+        while True:
+            try:
+                conn = listener.accept()
+            except AuthenticationError:
+                continue  # a client without the key; keep serving
+            with conn:
+                while True:
+                    try:
+                        job = conn.recv()
+                    except EOFError:
+                        break  # client closed the connection; wait for the next one
+                    if job == 'stop':
+                        return
+                    conn.send(worker.run(job))
+
+
+def connect(port, authkey=None, timeout=120.0):
+    """Client connection to the worker on port, waiting for it to start"""
+    authkey = authkey or envAuthkey()
+    deadline = time.time() + timeout
+    while True:
+        try:
+            return Client(('localhost', port), authkey=authkey)
+        except (ConnectionRefusedError, FileNotFoundError):
+            if time.time() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+def submit(conn, label, params, cfgFile='src/cfg.py', netParamsFile='src/netParams.py', saveFolder='data/'):
+    """Run one job on a connected worker and return its reply"""
+    conn.send({'label': label, 'params': params, 'cfgFile': cfgFile, 'netParamsFile': netParamsFile,
+               'saveFolder': saveFolder})
+    return conn.recv()
+
+
+def startWorker(logFile, authkey, threads=1):
+    """Start a worker on a free port; returns its process and port once it accepts connections"""
+    readFd, writeFd = os.pipe()
+    env = dict(os.environ, OMP_NUM_THREADS=str(threads))
+    env.update({authkeyEnv: authkey.hex(), portFdEnv: str(writeFd)})
+    with open(logFile, 'a') as log:
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__)], stdout=log, stderr=subprocess.STDOUT,
+                                   env=env, pass_fds=[writeFd])
+    os.close(writeFd)
+    with os.fdopen(readFd) as pipe:
+        line = pipe.readline()  # empty if the worker exited before listening
+    if not line:
+        process.wait()
+        raise RuntimeError('worker failed to start, see %s' % logFile)
+    return process, int(line)
+
+
+def runBatch(params, cfgFile='src/cfg.py', netParamsFile='src/netParams.py', batchLabel='ASDS',
+             saveFolder='ASDS_batch', workers=None, retries=1, skip=True):
+    """Run every grid point of params on a pool of persistent workers, longest jobs first"""
+    import instrumentation
+
+    os.makedirs(saveFolder, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    authkey = secrets.token_bytes(32)  # this batch's workers accept no other client
+    status = StatusFile(os.path.join(saveFolder, batchLabel + '_status.json'))
+
+    jobs = []
+    for label, jobParams in gridJobs(params, batchLabel):
+        if skip and status.get(label).get('status') == 'done':
+            continue
+        cfg, _ = writeJobCfg(cfgFile, jobParams, label, saveFolder, 1)  # same <label>_cfg.json as other backends
+        jobs.append({'label': label, 'params': jobParams, 'cfgFile': cfgFile, 'netParamsFile': netParamsFile,
+                     'saveFolder': saveFolder, 'cost': jobCost(cfg), 'attempts': 0})
+        status.update(label, status='pending', cost=jobs[-1]['cost'], params=jobParams)
+    pending = queue.Queue()
+    for job in sorted(jobs, key=lambda job: job['cost'], reverse=True):
+        pending.put(job)
+
+    def dispatch(slot):
+        logFile = os.path.join(saveFolder, '%s_worker%d.log' % (batchLabel, slot))
+        (process, port), conn = startWorker(logFile, authkey), None
+        try:
+            while True:
+                try:
+                    job = pending.get_nowait()
+                except queue.Empty:
+                    break
+                job['attempts'] += 1
+                status.update(job['label'], status='running', attempts=job['attempts'], start=time.time(), worker=slot)
+                try:
+                    conn = conn or connect(port, authkey)
+                    reply = submit(conn, job['label'], job['params'], job['cfgFile'], job['netParamsFile'],
+                                   job['saveFolder'])
+                except (EOFError, OSError):
+                    reply = {'status': 'failed', 'error': 'worker %d died' % slot}
+                    process.kill()
+                    (process, port), conn = startWorker(logFile, authkey), None
+                status.update(job['label'], end=time.time(), **{key: value for key, value in reply.items()
+                                                                if key in ['status', 'error', 'results']})
+                if reply['status'] != 'done' and job['attempts'] <= retries:
+                    pending.put(job)
+        finally:
+            if conn is not None:
+                conn.send('stop')
+                conn.close()
+                process.wait()
+            else:
+                process.kill()  # never connected (no jobs left for this slot)
+
+    print('Running %d jobs on %d warm workers' % (len(jobs), workers))
+    start = time.time()
+    threads = [threading.Thread(target=dispatch, args=(slot,)) for slot in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done = sum(status.get(job['label']).get('status') == 'done' for job in jobs)
+    print('Batch done in %.1f s: %d ok, %d failed' % (time.time() - start, done, len(jobs) - done))
+    instrumentation.aggregate(saveFolder)
+    return status.jobs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Persistent NetPyNE simulation worker')
+    parser.add_argument('--port', type=int, default=0, help='port to listen on (default: a free port)')
+    args = parser.parse_args()
+    serve(args.port)
@@ -0,0 +1,46 @@
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+repoRoot = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+srcFolder = os.path.join(repoRoot, 'src')
+sys.path.insert(0, srcFolder)
+
+# prepended to every script run by runScript: mechanisms from the shared cache, and a small, short network
+scriptHeader = '''
+import sys, json
+sys.path.insert(0, %(src)r)
+import fastStart
+fastStart.loadMechanisms('mod', cache=%(cache)r)
+from cfg import cfg
+cfg.scale = 0.1; cfg.convergence = 10; cfg.transient = 50; cfg.duration = 150
+cfg.saveFolder = %(out)r; cfg.saveJson = False; cfg.deferPlots = True; cfg.printRunTime = False
+cfg.recordTraces = {}
+'''
+
+
+@pytest.fixture(scope='session')
+def mechCache(tmp_path_factory):
+    """Compiled mechanisms of mod/, shared by all scripts of the session"""
+    pytest.importorskip('netpyne')
+    cache = str(tmp_path_factory.mktemp('fastStart'))
+    runScript('pass', cache, cache)
+    return cache
+
+
+def runScript(code, cache, out):
+    """Run code after scriptHeader in a new process (NEURON state never leaks between tests); return the
+    value of the last line printed as 'RESULT <json>'"""
+    script = scriptHeader % {'src': srcFolder, 'cache': cache, 'out': out} + code
+    proc = subprocess.run([sys.executable, '-c', script], cwd=repoRoot, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+    results = [line[len('RESULT '):] for line in proc.stdout.splitlines() if line.startswith('RESULT ')]
+    return json.loads(results[-1]) if results else None
+
+
+@pytest.fixture
+def run(mechCache, tmp_path):
+    return lambda code: runScript(code, mechCache, str(tmp_path))
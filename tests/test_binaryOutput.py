@@ -0,0 +1,57 @@
+import os
+import json
+
+import numpy as np
+
+from conftest import srcFolder  # noqa: F401 (src on sys.path)
+
+runScript = '''
+import netUpdate, build
+%s
+netParams, postTransient = build.prepareNetParams(cfg, netUpdate.loadNetParams(cfg))
+build.createNetwork(cfg, netParams)
+build.runNetwork(postTransient)
+print('RESULT', json.dumps(cfg.saveFolder))
+'''
+
+
+def load(folder, simLabel='TwoPops_sync'):
+    from binaryOutput import SimOutput
+
+    out = SimOutput(os.path.join(folder, simLabel + '_data'))
+    return out, tuple(np.array(values) for values in out.spikes())
+
+
+def test_streamedRunSameOutput(run):
+    plain, (spkt, spkid) = load(run(runScript % "cfg.saveFolder += '/plain'"))
+    streamed, (streamedSpkt, streamedSpkid) = load(run(runScript % "cfg.spikeStream['enabled'] = True"))
+    assert len(spkt) > 0
+    assert np.array_equal(spkt, streamedSpkt) and np.array_equal(spkid, streamedSpkid)
+    # NetPyNE's summary only counts the spike vectors, which the stream empties after every chunk
+    assert streamed.meta['simData']['avgRate'] == plain.meta['simData']['avgRate'] > 0
+    rates = streamed.meta['simData']['popRates']
+    seconds = streamed.meta['cfg']['duration'] / 1000.0
+    for pop, gids in streamed.pops.items():
+        assert np.isclose(rates[pop], np.isin(spkid, gids).sum() / len(gids) / seconds)
+
+
+def test_streamedSpikesInJson(run):
+    folder = run(runScript % "cfg.spikeStream['enabled'] = True; cfg.saveJson = True")
+    with open(os.path.join(folder, 'TwoPops_sync_data.json')) as fileObj:
+        simData = json.load(fileObj)['simData']
+    _, (spkt, _) = load(folder)
+    assert len(simData['spkt']) == len(spkt) > 0
+
+
+def test_popMeanTimesAfterRestore(run):
+    setup = ("cfg.recordProfile = {'cellsPerPop': 0, 'step': 1.0, 'envelope': False, 'popMean': True}; "
+             "cfg.transientCheckpoint['enabled'] = True; cfg.transientCheckpoint['folder'] = cfg.saveFolder + '/ck'")
+    saved, _ = load(run(runScript % setup))
+    restored, _ = load(run(runScript % (setup + "; cfg.saveFolder += '/restored'")))
+    t, pops, data = saved.popMean()
+    restoredT, restoredPops, restoredData = restored.popMean()
+    assert t[0] == 0 and restoredT[0] == saved.meta['cfg']['transient'] and t[-1] == restoredT[-1]
+    assert restoredPops == pops
+    assert np.allclose(restoredData, data[:, len(t) - len(restoredT):], atol=0.01)  # mV, within float32 noise
+    # the time window selects the same samples from both runs
+    assert np.array_equal(saved.popMean([100, 120])[0], restored.popMean([100, 120])[0])
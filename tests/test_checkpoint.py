@@ -0,0 +1,17 @@
+keyScript = '''
+from netpyne import sim
+import netUpdate, checkpoint
+netParams = netUpdate.loadNetParams(cfg)
+sim.initialize(simConfig=cfg, netParams=netParams)
+sim.net.createPops()
+sim.net.createCells()  # compiles the string functions of the cell parameters
+print('RESULT', json.dumps(checkpoint.checkpointKey()))
+'''
+
+
+def test_keyStableAcrossProcesses(run):
+    assert run(keyScript) == run(keyScript)
+
+
+def test_keyDependsOnTransientParams(run):
+    assert run(keyScript) != run('cfg.convergence = 5\n' + keyScript)
@@ -0,0 +1,44 @@
+import copy
+from types import SimpleNamespace
+
+import numpy as np
+
+import connectivity
+
+
+def makeNetParams():
+    popParams = {'E': {'numCells': 40}, 'I': {'numCells': 10}}
+    connParams = {'E->E': {'preConds': {'pop': 'E'}, 'postConds': {'pop': 'E'}, 'convergence': 8},
+                  'E->I': {'preConds': {'pop': 'E'}, 'postConds': {'pop': 'I'}, 'convergence': 8},
+                  'I->E': {'preConds': {'pop': 'I'}, 'postConds': {'pop': 'E'}, 'convergence': 12}}  # > numPre
+    return SimpleNamespace(popParams=popParams, connParams=copy.deepcopy(connParams))
+
+
+def connLists(nhosts=1, ranks=None):
+    """connList of every rule, merged over the ranks"""
+    merged = {}
+    for rank in range(nhosts if ranks is None else max(ranks) + 1):
+        netParams = makeNetParams()
+        connectivity.vectorizeConvergence(netParams, 1, rank=rank, nhosts=nhosts, ranks=ranks)
+        for label, rule in netParams.connParams.items():
+            merged.setdefault(label, []).extend(map(tuple, rule['connList']))
+    return {label: sorted(pairs) for label, pairs in merged.items()}
+
+
+def test_rankIndependent():
+    serial = connLists()
+    for nhosts in (2, 3, 7):
+        assert connLists(nhosts) == serial
+    ranks = np.random.default_rng(1).integers(0, 4, 50)  # a load-balanced distribution (see loadBalance.py)
+    assert connLists(ranks=ranks) == serial
+
+
+def test_convergencePairs():
+    pairs = connectivity.convergencePairs(40, np.arange(40), 8, 1, connectivity.ruleStream('E->E'), samePop=True)
+    for post in range(40):
+        pre = pairs[pairs[:, 1] == post, 0]
+        assert len(pre) == len(set(pre)) == 8 and post not in pre
+    assert len(connectivity.convergencePairs(10, np.arange(40), 12, 1, 0)) == 40 * 10  # capped at numPre
+    # a cell's row does not depend on the other cells generated with it
+    subset = connectivity.convergencePairs(40, [5, 17], 8, 1, connectivity.ruleStream('E->E'), samePop=True)
+    assert np.array_equal(subset, pairs[np.isin(pairs[:, 1], [5, 17])])
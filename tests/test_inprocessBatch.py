@@ -0,0 +1,23 @@
+pointScript = '''
+from netpyne import sim
+import netUpdate, build, inprocessBatch
+netParams, postTransient = build.prepareNetParams(cfg, netUpdate.loadNetParams(cfg))
+build.createNetwork(cfg, netParams)
+spikes = []
+for label, params in %r:
+    inprocessBatch.runPoint(label, params, 'src/netParams.py', postTransient)
+    spikes.append(sorted(zip([round(t, 6) for t in sim.allSimData['spkt']], sim.allSimData['spkid'])))
+print('RESULT', json.dumps(spikes))
+'''
+
+pointA = ('T_0', {'weightEE': 0.03, 'bkgRate': 2000})
+pointB = ('T_1', {'weightEE': 0.06, 'bkgRate': 1000})
+
+
+def test_repeatedPointMatchesFreshProcess(run):
+    fresh, = run(pointScript % [pointA])
+    first, other, repeat = run(pointScript % [pointA, pointB, pointA])
+    assert len(fresh) > 0
+    assert first == fresh
+    assert repeat == fresh
+    assert other != fresh
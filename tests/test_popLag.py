@@ -0,0 +1,24 @@
+import math
+
+import numpy as np
+
+import popLag
+
+
+def test_knownLag():
+    rng = np.random.default_rng(1)
+    x = rng.standard_normal(500)
+    lags, corr = popLag.crossCorrelation(x, np.roll(x, 3), 10)
+    assert len(lags) == len(corr) == 21
+    assert lags[np.argmax(corr)] == 3
+
+
+def test_shortSeries():
+    lags, corr = popLag.crossCorrelation([1.0], [2.0], 50)
+    assert len(lags) == len(corr) == 1
+    lags, corr = popLag.crossCorrelation([1.0, 0.0, 2.0], [0.0, 1.0, 0.0], 50)
+    assert list(lags) == [-2, -1, 0, 1, 2] and len(corr) == 5
+    # windows of a single bin, or empty, have no lag
+    for timeRange in ([100, 101], [100, 100]):
+        result = popLag.computeLag([100.5], [0], [0], [1], timeRange)
+        assert math.isnan(result['lag']) and result['sign'] == 'none'
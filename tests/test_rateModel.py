@@ -0,0 +1,34 @@
+import os
+import runpy
+
+import pytest
+
+from conftest import srcFolder
+
+pytest.importorskip('netpyne')
+netParamsFile = os.path.join(srcFolder, 'netParams.py')
+
+
+def loadCfg(**values):
+    cfg = runpy.run_path(os.path.join(srcFolder, 'cfg.py'))['cfg']
+    for name, value in values.items():
+        setattr(cfg, name, value)
+    return cfg
+
+
+def test_defaultPointActive():
+    import rateModel
+
+    default, silent = rateModel.predict([loadCfg(), loadCfg(bkgRate=1e-5)], netParamsFile)
+    assert default['regime'] == 'active'  # the spiking network fires at the cfg defaults
+    assert not rateModel.isTrivial(default)
+    assert silent['regime'] == 'silent'
+
+
+def test_strongBackgroundNotSilent():
+    import rateModel
+
+    # shunted SenderE cells sit at the spike threshold: the spiking network is active at these points
+    predictions = rateModel.predict([loadCfg(convergence=5, bkgRate=2000), loadCfg(convergence=10, bkgRate=200)],
+                                    netParamsFile)
+    assert [prediction['regime'] for prediction in predictions] == ['active', 'active']
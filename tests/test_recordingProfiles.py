@@ -0,0 +1,28 @@
+import os
+import runpy
+
+import pytest
+
+from conftest import srcFolder
+
+pytest.importorskip('netpyne')
+
+
+def sampledCells(**profile):
+    import netUpdate
+    import recordingProfiles
+
+    cfg = runpy.run_path(os.path.join(srcFolder, 'cfg.py'))['cfg']
+    cfg.recordProfile = dict(cfg.recordProfile, **profile)
+    netParams = netUpdate.loadNetParams(cfg, os.path.join(srcFolder, 'netParams.py'))
+    recordingProfiles.applyToCfg(cfg, netParams)
+    return dict(cfg.recordCells), netParams
+
+
+def test_cellsPerPopSeededSample():
+    cells, netParams = sampledCells(cellsPerPop=5)
+    assert sampledCells(cellsPerPop=5)[0] == cells
+    assert sampledCells(cellsPerPop=5, seed=2)[0] != cells
+    for pop, indices in cells.items():
+        assert len(set(indices)) == 5 and all(0 <= i < netParams.popParams[pop]['numCells'] for i in indices)
+    assert any(indices != list(range(5)) for indices in cells.values())  # not the first K cells